@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de VIBE (sin Ollama: usa un servidor falso local)
+Ejecuta: python bench_vibe.py [--sizes 1000,10000,100000] [--out bench.json] [--compare base.json]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import vibe
+from vibe import ToolCallParser, parse_tool_calls
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SERVIDOR OLLAMA FALSO
+# ═══════════════════════════════════════════════════════════════════════════
+
+class FakeOllama:
+    """Servidor HTTP que imita la API de Ollama con respuestas guionadas y latencia configurable"""
+
+    def __init__(self, script: Optional[List[Dict]] = None, first_token_ms: float = 0.0,
+                 token_ms: float = 0.0, model: str = "bench"):
+        self.script = script or [{"content": "Listo."}]
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.model = model
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload: Dict, status: int = 200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": fake.model, "model": fake.model, "size": 0}]})
+                elif self.path == "/api/ps":
+                    self._json({"models": [{"name": fake.model, "model": fake.model, "size": 0}]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.requests.append({"path": self.path, **request})
+                if self.path == "/api/chat":
+                    fake._chat(self, request)
+                elif self.path == "/api/generate":
+                    self._json({"model": request.get("model"), "response": "", "done": True})
+                elif self.path == "/api/embed":
+                    inputs = request.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._json({"model": request.get("model"), "embeddings": [fake.embed(t) for t in inputs]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @staticmethod
+    def embed(text: str, dims: int = 64) -> List[float]:
+        """Vector determinista a partir del texto: palabras iguales suman en la misma dimensión"""
+        vector = [0.0] * dims
+        for word in re.findall(r'\w+', text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dims] += 1.0
+        return vector
+
+    def _next_reply(self) -> Dict:
+        with self._lock:
+            chats = sum(1 for r in self.requests if r["path"] == "/api/chat")
+        return self.script[(chats - 1) % len(self.script)]
+
+    def _chat(self, handler: BaseHTTPRequestHandler, request: Dict):
+        reply = self._next_reply()
+        tokens = re.findall(r'\S+\s*|\s+', reply.get("content", "")) or [""]
+        prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+        start = time.perf_counter()
+        time.sleep(self.first_token_ms / 1000)
+
+        def final() -> Dict:
+            elapsed = int((time.perf_counter() - start) * 1e9)
+            return {"model": self.model, "created_at": "", "done": True, "done_reason": "stop",
+                    "total_duration": elapsed, "load_duration": 0,
+                    "prompt_eval_count": prompt_chars // 4, "prompt_eval_duration": 0,
+                    "eval_count": len(tokens), "eval_duration": elapsed}
+
+        message = {"role": "assistant", "content": ""}
+        if request.get("stream", True):
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/x-ndjson")
+            handler.end_headers()
+            for token in tokens:
+                chunk = {"model": self.model, "created_at": "", "done": False,
+                         "message": {**message, "content": token}}
+                handler.wfile.write(json.dumps(chunk).encode() + b"\n")
+                handler.wfile.flush()
+                time.sleep(self.token_ms / 1000)
+            if reply.get("tool_calls"):
+                chunk = {"model": self.model, "created_at": "", "done": False,
+                         "message": {**message, "tool_calls": reply["tool_calls"]}}
+                handler.wfile.write(json.dumps(chunk).encode() + b"\n")
+            handler.wfile.write(json.dumps({**final(), "message": message}).encode() + b"\n")
+            handler.close_connection = True
+        else:
+            time.sleep(self.token_ms * len(tokens) / 1000)
+            message = {**message, "content": reply.get("content", "")}
+            if reply.get("tool_calls"):
+                message["tool_calls"] = reply["tool_calls"]
+            handler._json({**final(), "message": message})
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PROYECTOS LARAVEL SINTÉTICOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+_PHP_CLASS = """<?php
+
+namespace App\\{namespace};
+
+use App\\Models\\User;
+use Illuminate\\Support\\Facades\\DB;
+
+class {name}
+{{
+    protected $table = '{table}';
+
+    public function handle(User $user): array
+    {{
+        return DB::table($this->table)->where('user_id', $user->id)->get()->toArray();
+    }}
+
+    public function total{name}(): int
+    {{
+        return DB::table($this->table)->count();
+    }}
+}}
+"""
+
+_BLADE = """@extends('layouts.app')
+
+@section('content')
+    <h1>{{{{ __('{name}') }}}}</h1>
+    @foreach ($items as $item)
+        <p>{{{{ $item->name }}}}</p>
+    @endforeach
+@endsection
+"""
+
+def make_laravel_tree(root: Path, files: int) -> Path:
+    """Genera un proyecto Laravel con ~files archivos (un 10% en vendor/, que se ignora)"""
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "composer.json").write_text(json.dumps({
+        "require": {"php": "^8.2", "laravel/framework": "^11.0"},
+        "autoload": {"psr-4": {"App\\": "app/"}},
+    }, indent=4))
+    (root / "artisan").write_text("#!/usr/bin/env php\n<?php\n")
+    (root / "routes").mkdir(exist_ok=True)
+    (root / "routes" / "web.php").write_text(
+        "<?php\n\nuse Illuminate\\Support\\Facades\\Route;\n\n"
+        "Route::get('/', fn () => view('welcome'));\n"
+    )
+
+    kinds = [("app/Models", "Models", ".php"), ("app/Http/Controllers", "Http\\Controllers", ".php"),
+             ("app/Services", "Services", ".php"), ("resources/views", None, ".blade.php")]
+    vendor = files // 10
+    for i in range(files - vendor):
+        folder, namespace, ext = kinds[i % len(kinds)]
+        # Carpetas de 500 archivos como mucho, como los módulos de un proyecto grande
+        directory = root / folder / f"Module{i // (500 * len(kinds))}"
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"Item{i}"
+        if namespace is None:
+            (directory / f"item{i}{ext}").write_text(_BLADE.format(name=name))
+        else:
+            (directory / f"{name}{ext}").write_text(
+                _PHP_CLASS.format(namespace=namespace, name=name, table=f"items_{i}"))
+    for i in range(vendor):
+        directory = root / "vendor" / "acme" / f"package{i // 500}" / "src"
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"Vendor{i}.php").write_text(
+            _PHP_CLASS.format(namespace="Vendor", name=f"Vendor{i}", table="vendor"))
+    return root
+
+# ═══════════════════════════════════════════════════════════════════════════
+# MEDICIONES
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _best_of(fn: Callable[[], object], repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _timed(fn: Callable[[], object]) -> float:
+    """Milisegundos de una sola ejecución"""
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+def _peak_kb(fn: Callable[[], object]) -> float:
+    """Pico de memoria de Python (KB) durante fn; se mide aparte porque tracemalloc la hace más lenta"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def _write_payload(size: int) -> str:
+    """Respuesta del modelo con un write de ~size bytes de PHP con paréntesis y comillas"""
+    line = 'echo strlen("(x)") . \'$y\';  // (comentario)\n'
+    body = line * (size // len(line) + 1)
+    escaped = body.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'Voy a crear el archivo.\n\nTOOL:write(file_path="app/Big.php", content="{escaped}")\n\nListo.'
+
+def bench_parser(sizes=(10_000, 100_000, 1_000_000), chunk_size: int = 16) -> Dict[str, float]:
+    """Mide el parser sobre la respuesta completa y en fragmentos del tamaño de un token"""
+    print(f"\n🔍 Parser de herramientas (fragmentos de {chunk_size} caracteres)")
+    print(f"  {'tamaño':>10} {'completo':>12} {'streaming':>12} {'MB/s':>8}")
+    metrics = {}
+
+    for size in sizes:
+        text = _write_payload(size)
+        calls = parse_tool_calls(text)
+        assert len(calls) == 1 and len(calls[0]['params']['content']) >= size
+
+        def streamed():
+            parser = ToolCallParser()
+            for i in range(0, len(text), chunk_size):
+                parser.feed(text[i:i + chunk_size])
+
+        whole = _best_of(lambda: parse_tool_calls(text))
+        chunked = _best_of(streamed, repeat=3)
+        print(f"  {len(text):>10} {whole * 1000:>10.2f}ms {chunked * 1000:>10.2f}ms "
+              f"{len(text) / whole / 1e6:>8.1f}")
+        metrics[f"parser.{size}.whole_ms"] = whole * 1000
+        metrics[f"parser.{size}.stream_ms"] = chunked * 1000
+        metrics[f"parser.{size}.mb_per_s"] = len(text) / whole / 1e6
+        metrics[f"parser.{size}.peak_kb"] = _peak_kb(streamed)
+    return metrics
+
+def bench_tools(root: Path, files: int) -> Dict[str, float]:
+    """Latencia de glob, grep, read y edit sobre un proyecto sintético, en frío y con caché"""
+    print(f"\n🔍 Herramientas sobre {files} archivos")
+    prefix = f"tools.{files}"
+    metrics = {}
+    cwd = os.getcwd()
+    os.chdir(root)
+    vibe.tool_cache.clear()
+    try:
+        target = next(Path("app/Models").rglob("*.php")).as_posix()
+        calls = {
+            "glob": ("glob", {"pattern": "**/*.php"}),
+            "grep": ("grep", {"pattern": r"function total\w+", "glob_pattern": "*.php", "output_mode": "count"}),
+            "read": ("read", {"file_path": target}),
+        }
+
+        # La primera búsqueda construye el índice de trigramas de .vibe/
+        metrics[f"{prefix}.grep_index_build_ms"] = _timed(lambda: vibe.execute_tool(*calls["grep"]))
+
+        # El índice de símbolos se construye en la primera consulta; después solo se revalida
+        lookup = ("symbol", {"name": Path(target).stem})
+        metrics[f"{prefix}.symbol_index_build_ms"] = _timed(lambda: vibe.execute_tool(*lookup))
+        metrics[f"{prefix}.symbol_ms"] = _best_of(lambda: vibe.execute_tool(*lookup), repeat=3) * 1000
+
+        for name, (tool, params) in calls.items():
+            def cold():
+                vibe.tool_cache.clear()
+                vibe.execute_tool(tool, params)
+            metrics[f"{prefix}.{name}_cold_ms"] = _best_of(cold, repeat=3) * 1000
+            metrics[f"{prefix}.{name}_warm_ms"] = _best_of(lambda: vibe.execute_tool(tool, params)) * 1000
+            metrics[f"{prefix}.{name}_peak_kb"] = _peak_kb(cold)
+
+        def edit_roundtrip():
+            vibe.execute_tool("edit", {"file_path": target, "old_string": "protected $table",
+                                       "new_string": "protected $tabla"})
+            vibe.execute_tool("edit", {"file_path": target, "old_string": "protected $tabla",
+                                       "new_string": "protected $table"})
+        metrics[f"{prefix}.edit_ms"] = _best_of(edit_roundtrip) * 1000 / 2
+
+        def multi_edit_roundtrip():
+            for old, new in (("protected", "private"), ("private", "protected")):
+                vibe.execute_tool("multi_edit", {"edits": [
+                    {"file_path": target, "old_string": old, "new_string": new, "replace_all": True}]})
+        metrics[f"{prefix}.multi_edit_ms"] = _best_of(multi_edit_roundtrip) * 1000 / 2
+    finally:
+        vibe.tool_cache.clear()
+        os.chdir(cwd)
+
+    for key, value in metrics.items():
+        print(f"  {key.split('.', 2)[2]:<22} {value:>10.3f}")
+    return metrics
+
+def bench_turns(root: Path, first_token_ms: float, token_ms: float, turns: int = 5) -> Dict[str, float]:
+    """Latencia de un turno completo (modelo → read → modelo) contra el servidor falso"""
+    print(f"\n🔍 Turnos de chat (primer token {first_token_ms:.0f}ms, {token_ms:.1f}ms por token)")
+    script = [
+        {"content": "Voy a revisar las rutas.\nTOOL:read(file_path=\"routes/web.php\")\n"},
+        {"content": "Las rutas definen una sola página de bienvenida. " * 5},
+    ]
+    server = FakeOllama(script, first_token_ms=first_token_ms, token_ms=token_ms)
+    server.start()
+    cwd = os.getcwd()
+    os.chdir(root)
+    quiet = vibe.console.quiet
+    vibe.console.quiet = True
+    metrics = {}
+    try:
+        for stream in (True, False):
+            engine = vibe.ChatEngine("Eres VIBE.", model=server.model, client=vibe.ollama.AsyncClient(host=server.url),
+                                     stream=stream, native_tools=False)
+            timings = []
+            for _ in range(turns):
+                start = time.perf_counter()
+                asyncio.run(engine.run_turn("¿Qué rutas hay?"))
+                timings.append((time.perf_counter() - start) * 1000)
+            mode = "stream" if stream else "blocking"
+            timings.sort()
+            metrics[f"turn.{mode}.median_ms"] = timings[len(timings) // 2]
+            metrics[f"turn.{mode}.max_ms"] = timings[-1]
+        chats = [r for r in server.requests if r["path"] == "/api/chat"]
+        assert len(chats) == 2 * 2 * turns, "cada turno debe pedir la herramienta y luego responder"
+    finally:
+        vibe.console.quiet = quiet
+        os.chdir(cwd)
+        server.stop()
+
+    for key, value in metrics.items():
+        print(f"  {key[5:]:<22} {value:>10.2f}")
+    return metrics
+
+STARTUP_TARGET_MS = 200
+
+def _import_times() -> Dict[str, int]:
+    """Tiempo acumulado (µs) de vibe y de cada módulo que importa directamente (-X importtime)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import vibe"],
+                            cwd=Path(__file__).parent, capture_output=True, text=True, timeout=60)
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            # Cada módulo de primer nivel cierra su árbol: solo interesa el de vibe (el último)
+            if name.strip() == "vibe":
+                times["vibe"] = int(parts[1])
+                break
+            times = {}
+        elif depth == 1:
+            times[name.strip()] = int(parts[1])
+    return times
+
+def _interpreter_ms(runs: int) -> float:
+    """Mediana del arranque de un intérprete vacío: la parte del tiempo que no depende de VIBE"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+def _time_to_prompt(root: Path, env: Dict[str, str], timeout: float = 10.0) -> float:
+    """Milisegundos desde lanzar VIBE hasta que aparece el prompt interactivo"""
+    start = time.perf_counter()
+    # Con -m el módulo se carga desde __pycache__; "python vibe.py" recompila el script en cada arranque
+    process = subprocess.Popen([sys.executable, "-m", "vibe"], cwd=root, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    seen = threading.Event()
+    elapsed = []
+
+    def reader():
+        output = b""
+        for chunk in iter(lambda: process.stdout.read1(4096), b""):
+            output += chunk
+            if not seen.is_set() and "Tú:".encode() in output:
+                elapsed.append((time.perf_counter() - start) * 1000)
+                seen.set()
+
+    threading.Thread(target=reader, daemon=True).start()
+    try:
+        if not seen.wait(timeout):
+            raise RuntimeError("vibe.py no mostró el prompt")
+        process.stdin.write(b"exit\n")
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return elapsed[0]
+
+def bench_startup(root: Path, runs: int = 5) -> Dict[str, float]:
+    """Importación de vibe (-X importtime) y tiempo hasta el prompt con el servidor falso"""
+    print(f"\n🔍 Arranque (objetivo: prompt en menos de {STARTUP_TARGET_MS}ms)")
+    if sys.dont_write_bytecode:
+        print("  ⚠️  PYTHONDONTWRITEBYTECODE activo: si vibe.py cambió, se recompila en cada arranque")
+    interpreter = _interpreter_ms(runs)
+    print(f"  python -c pass           {interpreter:>10.2f}")
+    samples = [_import_times() for _ in range(runs)]
+    metrics = {"startup.python_ms": interpreter,
+               "startup.import_ms": min(times.get("vibe", 0) for times in samples) / 1000}
+    slowest = sorted(((name, micros) for name, micros in samples[-1].items() if name != "vibe"),
+                     key=lambda item: -item[1])[:5]
+    print(f"  import vibe              {metrics['startup.import_ms']:>10.2f}")
+    for name, micros in slowest:
+        print(f"    {name:<22} {micros / 1000:>10.2f}")
+
+    server = FakeOllama()
+    env = {**os.environ, "OLLAMA_HOST": server.start(), "PYTHONUNBUFFERED": "1",
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(Path(__file__).parent), os.environ.get("PYTHONPATH")]))}
+    try:
+        # El primer arranque construye el perfil del proyecto; los siguientes lo leen de .vibe/
+        metrics["startup.prompt_cold_ms"] = _time_to_prompt(root, env)
+        warm = sorted(_time_to_prompt(root, env) for _ in range(runs))
+        metrics["startup.prompt_ms"] = warm[len(warm) // 2]
+    finally:
+        server.stop()
+
+    mark = "✅" if metrics["startup.prompt_ms"] < STARTUP_TARGET_MS else "❌"
+    print(f"  prompt (primer arranque) {metrics['startup.prompt_cold_ms']:>10.2f}")
+    print(f"  prompt (mediana)         {metrics['startup.prompt_ms']:>10.2f} {mark}")
+    return metrics
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RESULTADOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float,
+            noise: float = 0.5) -> int:
+    """Imprime las diferencias con una ejecución anterior; devuelve cuántas métricas empeoraron.
+
+    Diferencias absolutas menores que noise (ms o KB) no cuentan: en tiempos de microsegundos
+    el porcentaje es puro ruido.
+    """
+    print(f"\n🔍 Comparación (regresión si empeora más de {threshold:.0%})")
+    regressions = 0
+    for key in sorted(set(current) & set(baseline)):
+        before, after = baseline[key], current[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        # En mb_per_s más es mejor; en el resto (ms, KB) más es peor
+        worse = -change if key.endswith("mb_per_s") else change
+        regressed = worse > threshold and abs(after - before) > noise
+        mark = "❌" if regressed else "✅"
+        regressions += regressed
+        print(f"  {mark} {key:<40} {before:>10.2f} → {after:>10.2f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de VIBE sin Ollama")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Tamaños de los proyectos sintéticos")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia hasta el primer token")
+    parser.add_argument("--token-ms", type=float, default=1.0, help="Latencia entre tokens")
+    parser.add_argument("--out", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="Resultados JSON anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    print("═" * 60)
+    print("VIBE - Benchmarks")
+    print("═" * 60)
+
+    metrics = bench_parser()
+    workdir = Path(tempfile.mkdtemp(prefix="vibe-bench-"))
+    try:
+        for files in (int(size) for size in args.sizes.split(",") if size):
+            print(f"\n⏳ Generando proyecto de {files} archivos...")
+            root = make_laravel_tree(workdir / f"laravel-{files}", files)
+            metrics.update(bench_tools(root, files))
+        project = make_laravel_tree(workdir / "turns", 100)
+        metrics.update(bench_turns(project, args.latency_ms, args.token_ms))
+        metrics.update(bench_startup(project))
+    finally:
+        vibe._reset_search_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "metrics": metrics,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Resultados guardados en {args.out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(metrics, baseline.get("metrics", {}), args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,6 +28,12 @@ def test_imports():
         print("  ❌ rich - Instala con: pip install rich")
         return False
 
+    try:
+        import numpy  # noqa: F401
+        print("  ✅ numpy (opcional)")
+    except ImportError:
+        print("  ⚠️  numpy (opcional, índice semántico) - Instala con: pip install numpy")
+
     return True
 
 def test_ollama_connection():
@@ -209,6 +215,1220 @@ def test_tool_parser():
         print(f"  ❌ Error en parser: {e}")
         return False
 
+def test_incremental_parser():
+    """Verifica el parser incremental y sensible a comillas"""
+    print("\n🔍 Verificando parser incremental...")
+
+    try:
+        from vibe import ToolCallParser, parse_tool_calls
+
+        text = ('Ejemplo: `TOOL:read(file_path="no")`\n'
+                '```\nTOOL:bash(command="no")\n```\n'
+                '| TOOL:glob(pattern="no") |\n'
+                'TOOL:write(file_path="a.php", content="<?php strlen(\\"x)\\");\\n```")\n')
+        expected = [{"tool": "write", "params": {"file_path": "a.php", "content": '<?php strlen("x)");\n```'}}]
+
+        if parse_tool_calls(text) != expected:
+            print(f"  ❌ Resultado inesperado: {parse_tool_calls(text)}")
+            return False
+
+        parser = ToolCallParser()
+        calls = []
+        for i in range(0, len(text), 3):
+            calls += parser.feed(text[i:i + 3])
+        if calls != expected:
+            print(f"  ❌ El parseo por fragmentos difiere: {calls}")
+            return False
+
+        print("  ✅ Paréntesis entre comillas y fragmentos parciales manejados")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en parser incremental: {e}")
+        return False
+
+def test_streaming():
+    """Verifica el streaming con despacho temprano de herramientas"""
+    print("\n🔍 Verificando streaming...")
+
+    try:
+        import asyncio
+        import vibe
+
+        test_file = Path("test_vibe_stream.txt")
+        seen_during_stream = []
+
+        class FakeClient:
+            async def chat(self, **kwargs):
+                chunks = ['Voy a escribir.\n', 'TOOL:write(file_path=', f'"{test_file}", content="hola")',
+                          '\nY luego', ' termino.']
+
+                async def stream():
+                    for chunk in chunks:
+                        yield {'message': {'content': chunk}}
+                        await asyncio.sleep(0.1)
+                        seen_during_stream.append(test_file.exists())
+                return stream() if kwargs.get('stream') else {'message': {'content': ''.join(chunks)}}
+
+        engine = vibe.ChatEngine("sistema", client=FakeClient(), stream=True)
+
+        async def run():
+            dispatcher = vibe.EarlyToolDispatcher()
+            text, calls = await engine._chat(dispatcher)
+            return text, await dispatcher.results(calls)
+
+        text, results = asyncio.run(run())
+        test_file.unlink(missing_ok=True)
+
+        if not text.endswith("termino."):
+            print("  ❌ El texto acumulado no coincide con los tokens recibidos")
+            return False
+
+        if not any(seen_during_stream[:-1]):
+            print("  ❌ La herramienta no se ejecutó antes de terminar la generación")
+            return False
+
+        if len(results) == 1 and results[0].success:
+            print("  ✅ Herramienta despachada durante el streaming")
+            return True
+
+        print("  ❌ Resultado de la herramienta despachada incorrecto")
+        return False
+
+    except Exception as e:
+        print(f"  ❌ Error en streaming: {e}")
+        return False
+
+def test_native_tools():
+    """Verifica las llamadas estructuradas y la vuelta al protocolo de texto"""
+    print("\n🔍 Verificando tools nativas...")
+
+    try:
+        import asyncio
+        import ollama
+        import vibe
+
+        test_file = Path("test_vibe_native.txt")
+
+        class FakeClient:
+            def __init__(self, supports_tools: bool):
+                self.supports_tools = supports_tools
+                self.answered = 0
+
+            async def chat(self, **kwargs):
+                if 'tools' in kwargs and not self.supports_tools:
+                    raise ollama.ResponseError("model does not support tools", 400)
+                self.answered += 1
+                if self.answered > 1:
+                    message = {'content': 'Listo.'}
+                elif 'tools' in kwargs:
+                    message = {'content': '', 'tool_calls': [{'function': {
+                        'name': 'write', 'arguments': {'file_path': str(test_file), 'content': 'nativo)'}}}]}
+                else:
+                    message = {'content': f'TOOL:write(file_path="{test_file}", content="texto")'}
+
+                async def stream():
+                    yield {'message': message}
+                return stream()
+
+        engine = vibe.ChatEngine("nativo", client=FakeClient(True), native_tools=True, text_prompt="texto")
+        asyncio.run(engine.run_turn("crea el archivo"))
+        roles = [m['role'] for m in engine.context.messages]
+        if test_file.read_text() != "nativo)" or roles != ["system", "user", "assistant", "tool", "assistant"]:
+            print(f"  ❌ La llamada estructurada no se ejecutó bien: {roles}")
+            return False
+
+        engine = vibe.ChatEngine("nativo", client=FakeClient(False), native_tools=True, text_prompt="texto")
+        asyncio.run(engine.run_turn("crea el archivo"))
+        if test_file.read_text() != "texto" or engine.native_tools or engine.context.messages[0]['content'] != "texto":
+            print("  ❌ No se volvió al protocolo de texto")
+            return False
+
+        print("  ✅ Llamadas estructuradas y vuelta al protocolo TOOL:...")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en tools nativas: {e}")
+        return False
+    finally:
+        Path("test_vibe_native.txt").unlink(missing_ok=True)
+
+def test_tool_scheduler():
+    """Verifica la ejecución concurrente de herramientas"""
+    print("\n🔍 Verificando planificador de herramientas...")
+
+    try:
+        import asyncio
+        from vibe import ToolScheduler
+
+        test_file = "test_vibe_sched.txt"
+        calls = [
+            {"tool": "write", "params": {"file_path": test_file, "content": "uno"}},
+            {"tool": "glob", "params": {"pattern": "*.py"}},
+            {"tool": "read", "params": {"file_path": test_file}},
+            {"tool": "edit", "params": {"file_path": test_file, "old_string": "uno", "new_string": "dos"}},
+            {"tool": "read", "params": {"file_path": test_file}},
+            {"tool": "bash", "params": {"command": f"cat {test_file}"}},
+        ]
+
+        results = asyncio.run(ToolScheduler().run(calls))
+        Path(test_file).unlink()
+
+        if [r.tool for r in results] != [c["tool"] for c in calls]:
+            print("  ❌ Los resultados no respetan el orden original")
+            return False
+
+        if "uno" in results[2].output and "dos" in results[4].output and results[5].output == "dos":
+            print("  ✅ Lecturas y escrituras sobre la misma ruta se ejecutan en orden")
+            return True
+
+        print("  ❌ Una lectura no vio la escritura anterior")
+        return False
+
+    except Exception as e:
+        print(f"  ❌ Error en planificador: {e}")
+        return False
+
+def test_grep_index():
+    """Verifica el índice de trigramas de grep"""
+    print("\n🔍 Verificando índice de trigramas...")
+
+    try:
+        import tempfile
+        from vibe import TrigramIndex
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "app").mkdir()
+            (root / "app" / "User.php").write_text("<?php class User extends Model {}")
+            (root / "app" / "Post.php").write_text("<?php class Post extends Model {}")
+            (root / "vendor").mkdir()
+            (root / "vendor" / "User.php").write_text("<?php class User {}")
+
+            index = TrigramIndex(str(root))
+            found = index.candidates(r"class\s+User", root, "*.php")
+            if [p.name for p in found] != ["User.php"] or "vendor" in str(found[0]):
+                print(f"  ❌ Candidatos incorrectos: {found}")
+                return False
+
+            # Actualización incremental y persistencia en disco
+            (root / "app" / "Post.php").write_text("<?php class User2 extends Model {}")
+            reloaded = TrigramIndex(str(root))
+            found = reloaded.candidates(r"class\s+User", root, "*.php")
+            if sorted(p.name for p in found) != ["Post.php", "User.php"]:
+                print(f"  ❌ El índice no detectó el archivo modificado: {found}")
+                return False
+
+            if reloaded.candidates(r"\w+", root) is not None:
+                print("  ❌ Una regex sin literales debería usar el recorrido completo")
+                return False
+
+            # Un índice preparado (por ejemplo un pickle en un repositorio clonado) no ejecuta nada
+            import pickle
+
+            class Payload:
+                def __reduce__(self):
+                    return (open, (str(root / "pwned"), "w"))
+            Path(reloaded.index_path).write_bytes(pickle.dumps(Payload()))
+            found = TrigramIndex(str(root)).candidates(r"class\s+User", root, "*.php")
+            if (root / "pwned").exists() or sorted(p.name for p in found) != ["Post.php", "User.php"]:
+                print("  ❌ El archivo del índice se deserializó de forma insegura")
+                return False
+
+        print("  ✅ Índice de trigramas acota candidatos y se actualiza por mtime")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en índice de trigramas: {e}")
+        return False
+
+def test_search_engine():
+    """Verifica el motor de búsqueda de grep"""
+    print("\n🔍 Verificando motor de búsqueda...")
+
+    try:
+        import tempfile
+        from vibe import search_files
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "a.php").write_text("\n".join(f"echo {i};" for i in range(300)))
+            (root / "b.bin").write_bytes(b"echo\0\0binario")
+            (root / "c.php").write_bytes("echo 'ñ';".encode("latin-1"))
+
+            result = search_files(sorted(root.iterdir()), "echo", output_mode="content")
+            if len(result.matches) != 100 or not result.truncated:
+                print(f"  ❌ Se esperaban 100 coincidencias truncadas, hubo {len(result.matches)}")
+                return False
+            if not result.matches[1].endswith("a.php:2: echo 1;"):
+                print(f"  ❌ Formato de coincidencia inesperado: {result.matches[1]}")
+                return False
+
+            result = search_files([root / "a.php"], "echo 1", output_mode="count")
+            if len(result.matches) != 1 or not result.matches[0].endswith("a.php:111"):
+                print(f"  ❌ Conteo por archivo incorrecto: {result.matches}")
+                return False
+
+            result = search_files(sorted(root.iterdir()), "echo '", output_mode="files_with_matches")
+            if result.binary != 1 or len(result.matches) != 1 or not result.matches[0].endswith("c.php"):
+                print(f"  ❌ Binarios o archivos no UTF-8 mal manejados: {result}")
+                return False
+
+            # Mayúsculas, \w, \b y escapes \u con texto no ASCII, como con una regex sobre str
+            import re
+            (root / "d.php").write_text("<?php\n// CANCIÓN nueva\n$x = 'aéb';\n", encoding="utf-8")
+            files = [root / "d.php"]
+            checks = [("canción", re.IGNORECASE, "d.php:2: // CANCIÓN nueva"),
+                      ("(?i)canción", 0, "d.php:2: // CANCIÓN nueva"),
+                      ("(?i)NUEVA", 0, "d.php:2: // CANCIÓN nueva"),
+                      (r"a\wb", 0, "d.php:3: $x = 'aéb';"),
+                      (r"\bCANCIÓN\b", 0, "d.php:2: // CANCIÓN nueva"),
+                      (r"CANCI\u00d3N", 0, "d.php:2: // CANCIÓN nueva")]
+            for pattern, flags, expected in checks:
+                result = search_files(files, pattern, flags, output_mode="content")
+                if len(result.matches) != 1 or not result.matches[0].endswith(expected):
+                    print(f"  ❌ Búsqueda Unicode incorrecta para {pattern!r}: {result.matches}")
+                    return False
+
+        print("  ✅ Motor de búsqueda acotado, seguro con binarios y con Unicode")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en motor de búsqueda: {e}")
+        return False
+
+def test_walker():
+    """Verifica el recorrido compartido por glob y grep"""
+    print("\n🔍 Verificando recorrido del proyecto...")
+
+    try:
+        import tempfile
+        from vibe import walk_files, Tools
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for rel in ["app/Models/User.php", "app/Http/Kernel.php", "vendor/pkg/Lib.php",
+                        "logs/app.php", "index.php", "app/cache.tmp", "app/Http/Controllers/Api/C.php",
+                        "app/Http/Controllers/Web.php"]:
+                (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                (root / rel).write_text("<?php")
+            (root / ".gitignore").write_text("logs/\n*.tmp\n/app/Http/Controllers/Api/\n")
+
+            found = sorted(walk_files(tmp, "*.php", recursive=True))
+            expected = ["app/Http/Controllers/Web.php", "app/Http/Kernel.php", "app/Models/User.php", "index.php"]
+            if found != expected:
+                print(f"  ❌ Recorrido incorrecto: {found}")
+                return False
+
+            if list(walk_files(tmp, "app/Models/*.php")) != ["app/Models/User.php"]:
+                print("  ❌ El patrón con prefijo literal no se respetó")
+                return False
+
+            glob_result = Tools.glob("**/*.php", tmp)
+            if len(glob_result.output.splitlines()) != 4 or "vendor" in glob_result.output:
+                print(f"  ❌ glob no usa el recorrido compartido: {glob_result.output}")
+                return False
+
+            # Las reglas del .gitignore raíz aplican aunque el recorrido empiece más abajo
+            import os
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                below = [sorted(walk_files(".", "app/**/*.php")), sorted(walk_files(".", "app/Http/**")),
+                         sorted(walk_files("app", "*.php", recursive=True)),
+                         list(walk_files(".", "app/Http/Controllers/Api/*.php"))]
+            finally:
+                os.chdir(cwd)
+            if any("Api/C.php" in rel for rels in below for rel in rels) or len(below[2]) != 3:
+                print(f"  ❌ .gitignore de los ancestros ignorado: {below}")
+                return False
+
+        print("  ✅ Directorios ignorados y .gitignore respetados")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en recorrido: {e}")
+        return False
+
+def test_line_index():
+    """Verifica la lectura por ventanas de archivos grandes"""
+    print("\n🔍 Verificando índice de líneas...")
+
+    try:
+        import vibe
+
+        test_file = Path("test_vibe_log.txt")
+        test_file.write_text("".join(f"linea {i}\n" for i in range(1000)))
+
+        original_min = vibe.READ_INDEX_MIN_BYTES
+        vibe.READ_INDEX_MIN_BYTES = 0
+        try:
+            result = vibe.Tools.read(str(test_file), offset=500, limit=2)
+            test_file.write_text("cambiado\n")
+            changed = vibe.Tools.read(str(test_file))
+        finally:
+            vibe.READ_INDEX_MIN_BYTES = original_min
+            test_file.unlink()
+
+        if not result.output.startswith("   501\tlinea 500\n   502\tlinea 501"):
+            print(f"  ❌ Ventana incorrecta: {result.output[:60]}")
+            return False
+        if "cambiado" not in changed.output:
+            print("  ❌ El índice no se invalidó al cambiar el archivo")
+            return False
+
+        print("  ✅ Lectura por ventanas con índice de líneas")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en índice de líneas: {e}")
+        return False
+
+def test_context_manager():
+    """Verifica la compactación del historial de mensajes"""
+    print("\n🔍 Verificando presupuesto de contexto...")
+
+    try:
+        from vibe import ContextManager, ToolResult
+
+        context = ContextManager("sistema", budget=2000, keep_recent=2)
+        for i in range(5):
+            call = {"tool": "read", "params": {"file_path": f"archivo{i}.php"}}
+            context.add("assistant", f"TOOL:read(file_path=\"archivo{i}.php\")")
+            context.add_tool_results([call], [ToolResult(tool="read", success=True, output="x" * 4000)])
+
+        if context.total_tokens > 2000:
+            print(f"  ❌ Presupuesto superado: {context.total_tokens} tokens")
+            return False
+        if context.messages[0]["content"] != "sistema" or len(context.messages[-1]["content"]) < 4000:
+            print("  ❌ El prompt del sistema o el último resultado fueron modificados")
+            return False
+        if "archivo0.php" not in context.messages[2]["content"]:
+            print(f"  ❌ Resumen compacto inesperado: {context.messages[2]['content'][:80]}")
+            return False
+
+        # Modo nativo: al descartar una llamada también se descartan sus resultados "tool"
+        native = ContextManager("sistema", budget=600, keep_recent=2)
+        for i in range(4):
+            calls = [{"tool": "read", "params": {"file_path": f"a{i}.php"}},
+                     {"tool": "read", "params": {"file_path": f"b{i}.php"}}]
+            native.add("assistant", "y" * 800, tool_calls=[
+                {"function": {"name": "read", "arguments": call["params"]}} for call in calls])
+            native.add_tool_results(calls, [ToolResult(tool="read", success=True, output="x" * 2000)] * 2,
+                                    native=True)
+        roles = [m["role"] for m in native.messages]
+        orphan = any(role == "tool" and roles[i - 1] not in ("assistant", "tool") for i, role in enumerate(roles))
+        if orphan or roles[1] != "assistant" or "tool_calls" not in native.messages[1]:
+            print(f"  ❌ Resultados de herramientas sin su llamada: {roles}")
+            return False
+
+        print(f"  ✅ Historial compactado a {context.total_tokens} tokens estimados")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en presupuesto de contexto: {e}")
+        return False
+
+def test_tool_cache():
+    """Verifica la caché de resultados de herramientas"""
+    print("\n🔍 Verificando caché de herramientas...")
+
+    try:
+        from vibe import execute_tool, tool_cache
+
+        test_file = "test_vibe_cache.txt"
+        Path(test_file).write_text("original")
+        tool_cache.clear()
+        before = tool_cache.stats()
+
+        execute_tool("read", {"file_path": test_file})
+        execute_tool("read", {"file_path": test_file})
+        after_hit = tool_cache.stats()
+
+        execute_tool("edit", {"file_path": test_file, "old_string": "original", "new_string": "editado"})
+        result = execute_tool("read", {"file_path": test_file})
+        Path(test_file).unlink()
+
+        if after_hit["hits"] - before["hits"] != 1:
+            print("  ❌ La segunda lectura no salió de la caché")
+            return False
+        if "editado" not in result.output:
+            print("  ❌ edit no invalidó la entrada de la caché")
+            return False
+
+        # Un cambio externo (editor, git) invalida grep y glob aunque no pase por VIBE
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "a.php").write_text("<?php // marcador")
+            grep = {"pattern": "marcador", "path": tmp}
+            glob = {"pattern": "*.php", "path": tmp}
+            execute_tool("grep", grep)
+            execute_tool("glob", glob)
+            hits = tool_cache.stats()["hits"]
+            if "a.php" not in execute_tool("grep", grep).output or tool_cache.stats()["hits"] != hits + 1:
+                print("  ❌ grep repetido sin cambios no salió de la caché")
+                return False
+            (Path(tmp) / "b.php").write_text("<?php // marcador")
+            if "b.php" not in execute_tool("grep", grep).output or "b.php" not in execute_tool("glob", glob).output:
+                print("  ❌ Un archivo nuevo no invalidó grep/glob")
+                return False
+
+            # Dentro del proyecto el sello sale del recorrido del índice de trigramas
+            import os
+            import vibe
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                grep = {"pattern": "marcador"}
+                stamp = tool_cache.stamp("grep", grep)
+                first = execute_tool("grep", grep).output
+                hits = tool_cache.stats()["hits"]
+                repeated = execute_tool("grep", grep).output
+                (Path(tmp) / "a.php").write_text("<?php // otro texto")
+                changed = execute_tool("grep", grep).output
+                index = vibe.get_grep_index()
+                after = tool_cache.stamp("grep", grep)
+            finally:
+                os.chdir(cwd)
+            if stamp is None or after != index.token or after == stamp or tool_cache.stats()["hits"] != hits + 1 or \
+                    repeated != first or "a.php" in changed or "b.php" not in changed:
+                print(f"  ❌ Sello del índice incorrecto: {first!r} / {changed!r}")
+                return False
+
+        print(f"  ✅ Caché con invalidación (aciertos: {after_hit['hits']}, fallos: {after_hit['misses']})")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en caché de herramientas: {e}")
+        return False
+
+def test_model_warmer():
+    """Verifica la precarga de modelos en segundo plano"""
+    print("\n🔍 Verificando precarga de modelos...")
+
+    try:
+        import vibe
+
+        loaded = []
+        original_generate = vibe.ollama.generate
+        vibe.ollama.generate = lambda **kwargs: loaded.append(kwargs)
+        try:
+            warmer = vibe.ModelWarmer()
+            warmer.warm("modelo-prueba").result(timeout=5)
+            warmer.warm("modelo-prueba").result(timeout=5)
+        finally:
+            vibe.ollama.generate = original_generate
+
+        if len(loaded) != 1 or loaded[0]["keep_alive"] != vibe.KEEP_ALIVE:
+            print(f"  ❌ Precarga inesperada: {loaded}")
+            return False
+        if not warmer.is_ready("modelo-prueba"):
+            print("  ❌ El modelo precargado no figura como listo")
+            return False
+
+        print("  ✅ Modelo precargado una sola vez con keep_alive")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en precarga de modelos: {e}")
+        return False
+
+def test_bash_output():
+    """Verifica la captura acotada de la salida de bash"""
+    print("\n🔍 Verificando salida acotada de bash...")
+
+    try:
+        import vibe
+
+        result = vibe.Tools.bash("echo uno; echo dos >&2; echo tres")
+        if result.output != "uno\ndos\ntres":
+            print(f"  ❌ stdout y stderr no quedaron intercalados: {result.output!r}")
+            return False
+
+        buffer = vibe.OutputBuffer(max_bytes=100)
+        for i in range(1000):
+            buffer.write(f"linea {i}\n".encode())
+
+        text = buffer.text()
+        if not text.startswith("linea 0") or not text.endswith("linea 999\n") or "omitidos" not in text:
+            print(f"  ❌ El buffer no conservó principio y final: {text[:80]!r}")
+            return False
+
+        print(f"  ✅ Salida acotada ({buffer.dropped_bytes} bytes omitidos de {buffer.total_bytes})")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en salida de bash: {e}")
+        return False
+
+def test_shell_session():
+    """Verifica la sesión de shell persistente"""
+    print("\n🔍 Verificando sesión de shell persistente...")
+
+    if sys.platform == "win32":
+        print("  ⚠️  Solo disponible en sistemas POSIX")
+        return True
+
+    import vibe
+    session = vibe.ShellSession()
+    try:
+        session.run("cd / && export VIBE_TEST=ok")
+        result = session.run("pwd; echo $VIBE_TEST")
+        if result.output != "/\nok":
+            print(f"  ❌ No se conservó el estado entre comandos: {result.output!r}")
+            return False
+
+        # Una comilla sin cerrar falla enseguida y no se lleva el estado del shell
+        result = session.run('echo "sin cerrar', timeout=5)
+        if result.success or "Timeout" in (result.error or "") or session.restarts != 0 or \
+                session.run("echo $VIBE_TEST").output != "ok":
+            print(f"  ❌ Error de sintaxis mal manejado: {result}")
+            return False
+
+        result = session.run("sleep 5", timeout=0.5)
+        if result.success or "Timeout" not in result.error:
+            print(f"  ❌ No se respetó el timeout: {result}")
+            return False
+
+        session.run("exit 3")
+        result = session.run("echo vivo")
+        if result.output != "vivo" or session.restarts != 2:
+            print(f"  ❌ El shell no se reinició: {result} ({session.restarts} reinicios)")
+            return False
+
+        print(f"  ✅ Estado persistente, timeout y reinicio ({session.restarts} reinicios)")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en sesión de shell: {e}")
+        return False
+    finally:
+        session.close()
+
+def test_bench_helpers():
+    """Verifica el servidor Ollama falso y los proyectos sintéticos de los benchmarks"""
+    print("\n🔍 Verificando utilidades de benchmark...")
+
+    import tempfile
+    from bench_vibe import FakeOllama, make_laravel_tree
+
+    server = FakeOllama([{"content": "hola mundo"}])
+    try:
+        import ollama
+        client = ollama.Client(host=server.start())
+        if [m.model for m in client.list().models] != ["bench"]:
+            print("  ❌ /api/tags no devolvió el modelo falso")
+            return False
+        streamed = "".join(c['message']['content'] for c in client.chat(model="bench", messages=[], stream=True))
+        if streamed != "hola mundo" or client.chat(model="bench", messages=[])['message']['content'] != "hola mundo":
+            print(f"  ❌ /api/chat respondió otra cosa: {streamed!r}")
+            return False
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = make_laravel_tree(Path(tmp), 50)
+            php = list(root.rglob("*.php"))
+            if len(php) < 40 or not (root / "composer.json").exists():
+                print(f"  ❌ Proyecto sintético incompleto ({len(php)} archivos PHP)")
+                return False
+
+        print("  ✅ Servidor falso y proyecto sintético")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en utilidades de benchmark: {e}")
+        return False
+    finally:
+        server.stop()
+
+def test_telemetry():
+    """Verifica los tramos de telemetría de modelo y herramientas"""
+    print("\n🔍 Verificando telemetría...")
+
+    import asyncio
+    import json
+    import tempfile
+    import vibe
+    from bench_vibe import FakeOllama
+
+    server = FakeOllama([{"content": 'TOOL:read(file_path="vibe.py", limit=5)'}, {"content": "Listo."}],
+                        token_ms=1)
+    original = vibe.telemetry
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            vibe.telemetry = vibe.Telemetry(str(Path(tmp) / "telemetry.jsonl"))
+            engine = vibe.ChatEngine("sistema", client=vibe.ollama.AsyncClient(host=server.start()),
+                                     native_tools=False)
+            vibe.console.quiet = True
+            asyncio.run(engine.run_turn("lee vibe.py"))
+            vibe.console.quiet = False
+            vibe.telemetry.close()
+
+            spans = [json.loads(line) for line in (Path(tmp) / "telemetry.jsonl").read_text().splitlines()]
+            kinds = [span["kind"] for span in spans]
+            # La herramienta puede terminar antes que el stream que la pidió (despacho temprano)
+            if sorted(kinds) != ["model", "model", "tool"] or spans[-1]["eval_count"] is None:
+                print(f"  ❌ Tramos inesperados: {kinds}")
+                return False
+
+            summary = vibe.telemetry.summary()
+            if summary["tokens_per_second"] <= 0 or summary["tools"]["read"]["calls"] != 1:
+                print(f"  ❌ Resumen incorrecto: {summary}")
+                return False
+
+        print(f"  ✅ {len(spans)} tramos registrados ({summary['tokens_per_second']:.0f} tokens/s)")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en telemetría: {e}")
+        return False
+    finally:
+        vibe.console.quiet = False
+        vibe.telemetry = original
+        server.stop()
+
+def test_project_profile():
+    """Verifica el perfil del proyecto cacheado y su invalidación"""
+    print("\n🔍 Verificando perfil del proyecto...")
+
+    import json
+    import os
+    import tempfile
+    import vibe
+
+    cwd = os.getcwd()
+    detect = vibe.detect_framework
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            Path("artisan").write_text("<?php")
+            Path("composer.json").write_text(json.dumps({"require": {"laravel/framework": "^10.0"}}))
+
+            profile = vibe.ProjectProfile()
+            if profile.load() is not None:
+                print("  ❌ Sin perfil guardado, load() debería devolver None")
+                return False
+            profile.build()
+
+            # Con el perfil vigente no se vuelve a detectar nada
+            vibe.detect_framework = lambda: (_ for _ in ()).throw(AssertionError("detección repetida"))
+            info, context, fresh = vibe.ProjectProfile().load()
+            vibe.detect_framework = detect
+            if not fresh or info["version"] != "^10.0" or "composer.json" not in context:
+                print(f"  ❌ Perfil cacheado incorrecto: {info}")
+                return False
+
+            Path("composer.json").write_text(json.dumps({"require": {"laravel/framework": "^11.0"}}))
+            profile = vibe.ProjectProfile()
+            _, _, fresh = profile.load()
+            if fresh or not profile.stale():
+                print("  ❌ El cambio en composer.json no invalidó el perfil")
+                return False
+            info, _ = profile.build()
+            if info["version"] != "^11.0" or profile.stale():
+                print(f"  ❌ La reconstrucción no tomó el cambio: {info}")
+                return False
+
+        print("  ✅ Perfil restaurado sin detectar y reconstruido al cambiar composer.json")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en perfil del proyecto: {e}")
+        return False
+    finally:
+        vibe.detect_framework = detect
+        os.chdir(cwd)
+
+def test_lazy_imports():
+    """Verifica que importar vibe no cargue ollama ni los renderizadores de rich"""
+    print("\n🔍 Verificando importaciones diferidas...")
+
+    import subprocess
+
+    code = ("import sys, vibe; print(','.join(m for m in ('ollama', 'numpy', 'rich.markdown', 'rich.table', 'rich.panel') "
+            "if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=Path(__file__).parent, timeout=60)
+    if result.returncode != 0:
+        print(f"  ❌ Error al importar vibe: {result.stderr[-300:]}")
+        return False
+    if result.stdout.strip():
+        print(f"  ❌ Se importaron al arrancar: {result.stdout.strip()}")
+        return False
+
+    import vibe
+    if not callable(vibe.ollama.AsyncClient):
+        print("  ❌ El proxy de ollama no resuelve sus atributos")
+        return False
+
+    print("  ✅ ollama y rich.markdown/table/panel se cargan al usarse")
+    return True
+
+def test_batch_mode():
+    """Verifica el modo por lotes: concurrencia, resultados en JSONL y reanudación"""
+    print("\n🔍 Verificando modo por lotes...")
+
+    import asyncio
+    import json
+    import tempfile
+    import time
+    import vibe
+    from bench_vibe import FakeOllama
+
+    server = FakeOllama([{"content": "Listo."}], first_token_ms=200)
+    try:
+        client = vibe.ollama.AsyncClient(host=server.start())
+        with tempfile.TemporaryDirectory() as tmp:
+            prompts, out = Path(tmp) / "prompts.jsonl", Path(tmp) / "results.jsonl"
+            prompts.write_text('{"id": "a", "prompt": "uno"}\n"dos"\n{"prompt": "tres"}\n{"prompt": "cuatro"}\n')
+            # Una ejecución anterior resolvió "a" y se cortó a mitad de escribir el siguiente registro
+            out.write_text('{"id": "a", "status": "ok", "response": "previo"}\n{"id": "2", "stat')
+
+            start = time.perf_counter()
+            summary = asyncio.run(vibe.run_batch(str(prompts), str(out), concurrency=3, client=client))
+            elapsed = time.perf_counter() - start
+            if summary != {"total": 4, "skipped": 1, "ok": 3, "error": 0}:
+                print(f"  ❌ Resumen incorrecto: {summary}")
+                return False
+            if elapsed > 0.55:
+                print(f"  ❌ Los prompts no se ejecutaron en paralelo ({elapsed:.2f}s)")
+                return False
+
+            records = [json.loads(line) for line in out.read_text().splitlines()[2:]]
+            if sorted(r["id"] for r in records) != ["2", "3", "4"] or any(r["response"] != "Listo." for r in records):
+                print(f"  ❌ Resultados incorrectos: {records}")
+                return False
+
+            # Repetir el comando no vuelve a llamar al modelo
+            chats = len(server.requests)
+            summary = asyncio.run(vibe.run_batch(str(prompts), str(out), client=client))
+            if summary["skipped"] != 4 or len(server.requests) != chats:
+                print(f"  ❌ La reanudación repitió prompts: {summary}")
+                return False
+
+        print(f"  ✅ 3 prompts en {elapsed:.2f}s con concurrencia 3; reanudación sin repetir")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en modo por lotes: {e}")
+        return False
+    finally:
+        vibe.console.quiet = False
+        server.stop()
+
+def test_ollama_pool():
+    """Verifica el pool de servidores: verificación, enrutado, sesiones fijas y failover"""
+    print("\n🔍 Verificando pool de servidores Ollama...")
+
+    import asyncio
+    import socket
+    import vibe
+    from bench_vibe import FakeOllama
+
+    # Un puerto sin nadie escuchando hace de servidor caído
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    servers = [FakeOllama([{"content": "Listo."}], first_token_ms=100) for _ in range(2)]
+    other = FakeOllama(model="otro")
+    try:
+        hosts = [server.start() for server in servers] + [other.start(), dead]
+        pool = vibe.OllamaPool(hosts)
+        healthy = pool.check()
+        if [e.host for e in healthy] != hosts[:3] or pool.endpoints[3].error is None:
+            print(f"  ❌ Verificación incorrecta: {[(e.host, e.healthy) for e in pool.endpoints]}")
+            return False
+
+        async def conversation(client, turns):
+            for _ in range(turns):
+                await client.chat(model="bench", messages=[{"role": "user", "content": "hola"}])
+
+        async def scenario():
+            # Dos conversaciones a la vez se reparten; cada una se queda en su servidor
+            clients = [vibe.PooledClient(pool) for _ in range(2)]
+            await asyncio.gather(*(conversation(c, 2) for c in clients))
+            counts = [len(server.requests) for server in servers]
+            if counts != [2, 2] or other.requests:
+                print(f"  ❌ Reparto incorrecto: {counts}, servidor sin el modelo: {len(other.requests)}")
+                return None
+
+            # Si su servidor cae, la conversación sigue en el otro sin error
+            pinned = pool.pick("bench", clients[0].session)
+            index = pool.endpoints.index(pinned)
+            servers[index].stop()
+            survivor = servers[1 - index]
+            before = len(survivor.requests)
+            text = "".join([chunk["message"]["content"] async for chunk in
+                            await clients[0].chat(model="bench", messages=[], stream=True)])
+            if text != "Listo." or len(survivor.requests) != before + 1:
+                print("  ❌ No hubo failover al caer el servidor")
+                return None
+            if pinned.healthy or pinned.failures != 1 or pinned.inflight != 0:
+                print(f"  ❌ El servidor caído no quedó marcado: {pinned}")
+                return None
+            return survivor
+
+        survivor = asyncio.run(asyncio.wait_for(scenario(), 10))
+        if survivor is None:
+            return False
+
+        print(f"  ✅ 3 de 4 servidores disponibles, sesiones repartidas 2/2, failover a {survivor.url}")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en el pool: {e}")
+        return False
+    finally:
+        for server in servers + [other]:
+            server.stop()
+
+def test_model_routing():
+    """Verifica el enrutado por niveles: modelo pequeño para herramientas, grande para respuestas"""
+    print("\n🔍 Verificando enrutado de modelos...")
+
+    import asyncio
+    import vibe
+    from bench_vibe import FakeOllama
+
+    server = FakeOllama([{"content": 'TOOL:read(file_path="vibe.py", limit=3)'},
+                         {"content": "Respuesta del pequeño."},
+                         {"content": "Respuesta final."}], token_ms=1)
+    try:
+        engine = vibe.ChatEngine("sistema", model="grande", small_model="chico", native_tools=False,
+                                 client=vibe.ollama.AsyncClient(host=server.start()))
+        engine.model_routing = "tools"
+        vibe.console.quiet = True
+        answer = asyncio.run(engine.run_turn("lee vibe.py"))
+        vibe.console.quiet = False
+
+        # Lectura con el pequeño; su respuesta final se descarta y la da el grande
+        models = [request["model"] for request in server.requests if request["path"] == "/api/chat"]
+        if models != ["chico", "chico", "grande"] or answer != "Respuesta final.":
+            print(f"  ❌ Enrutado incorrecto: {models} → {answer!r}")
+            return False
+        if engine.routing_stats["small"] != 1 or engine.routing_stats["escalations"] != 1:
+            print(f"  ❌ Contadores incorrectos: {engine.routing_stats}")
+            return False
+        if engine._small_accepts("", [{"tool": "edit", "params": {}}]) or \
+                not engine._small_accepts("", [{"tool": "grep", "params": {}}]):
+            print("  ❌ Los cambios deberían escalar al modelo grande y las lecturas no")
+            return False
+        engine.model_routing = "all"
+        if not engine._small_accepts("Respuesta.", []):
+            print("  ❌ Con la política 'all' el pequeño debería poder responder")
+            return False
+
+        print(f"  ✅ Herramientas con el modelo pequeño, respuesta final escalada ({' → '.join(models)})")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en enrutado de modelos: {e}")
+        return False
+    finally:
+        vibe.console.quiet = False
+        server.stop()
+
+def test_semantic_index():
+    """Verifica el índice semántico: top-k, actualización incremental y persistencia"""
+    print("\n🔍 Verificando índice semántico...")
+
+    import tempfile
+    import vibe
+    from bench_vibe import FakeOllama
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        result = vibe.Tools.search("login")
+        if result.success or "pip install numpy" not in result.error:
+            print(f"  ❌ Sin numpy el error debería explicarlo: {result.error}")
+            return False
+        print("  ⚠️  numpy no instalado: solo se verificó el aviso de la herramienta search")
+        return True
+
+    server = FakeOllama()
+    try:
+        client = vibe.ollama.Client(host=server.start())
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            controllers = root / "app" / "Http" / "Controllers"
+            controllers.mkdir(parents=True)
+            (controllers / "AuthController.php").write_text(
+                "<?php\nclass AuthController {\n    public function login($request) {\n"
+                "        // valida password y email del usuario\n    }\n}\n")
+            (controllers / "InvoiceController.php").write_text(
+                "<?php\nclass InvoiceController {\n    public function total($invoice) {\n"
+                "        return $invoice->amount * 1.21;\n    }\n}\n")
+            (root / "resources.js").write_text("const item = 1;\n" * 100)  # 3 fragmentos solapados
+
+            # Si el servidor de embeddings falla, nada queda marcado como indexado
+            class Down:
+                def embed(self, **kwargs):
+                    raise ConnectionError("Ollama no responde")
+            index = vibe.SemanticIndex(tmp, model="embed", client=Down())
+            try:
+                index.search("login")
+                print("  ❌ El fallo del embedding no se propagó")
+                return False
+            except ConnectionError:
+                pass
+            index._client = client
+
+            hits = index.search("login password email", limit=2)
+            if len(hits) != 2 or not hits[0]["path"].endswith("AuthController.php") or "login" not in hits[0]["text"]:
+                print(f"  ❌ Resultado inesperado: {[(h['path'], round(h['score'], 2)) for h in hits]}")
+                return False
+
+            # Solo se vuelven a embeber los archivos modificados
+            (controllers / "InvoiceController.php").write_text("<?php\nclass InvoiceController {}\n")
+            (controllers / "AuthController.php").unlink()
+            reembedded = index.refresh()
+            if reembedded != 1 or any(h["path"].endswith("AuthController.php") for h in index.search("login")):
+                print(f"  ❌ Actualización incremental incorrecta ({reembedded} fragmentos)")
+                return False
+
+            # Otra instancia carga el índice guardado sin recalcular nada
+            embeds = sum(1 for r in server.requests if r["path"] == "/api/embed")
+            reloaded = vibe.SemanticIndex(tmp, model="embed", client=client)
+            reloaded._load()
+            if reloaded.refresh() != 0 or len(reloaded.search("item", limit=10)) != 4:
+                print("  ❌ El índice guardado no se reutilizó")
+                return False
+            if sum(1 for r in server.requests if r["path"] == "/api/embed") != embeds + 1:
+                print("  ❌ Se recalcularon embeddings al recargar")
+                return False
+
+            # Metadatos en JSON: un índice preparado dentro del proyecto no puede ejecutar código
+            import json
+            meta = json.loads(Path(reloaded._meta_path).read_text(encoding="utf-8"))
+            if meta["version"] != vibe.SemanticIndex.VERSION or len(meta["chunks"]) != len(reloaded._chunks):
+                print("  ❌ Metadatos del índice semántico inesperados")
+                return False
+
+        print(f"  ✅ Top-k por similitud, {reembedded} fragmento recalculado tras el cambio, índice reutilizado")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en índice semántico: {e}")
+        return False
+    finally:
+        server.stop()
+
+def test_symbol_index():
+    """Verifica el índice de símbolos PHP y su actualización incremental"""
+    print("\n🔍 Verificando índice de símbolos...")
+
+    import tempfile
+    import vibe
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            controllers = Path(tmp) / "app" / "Http" / "Controllers"
+            controllers.mkdir(parents=True)
+            auth = controllers / "AuthController.php"
+            auth.write_text(
+                "<?php\nnamespace App\\Http\\Controllers;\n\n"
+                "class AuthController extends Controller\n{\n"
+                "    // function comentada() {}\n"
+                "    public function login(Request $request)\n    {\n"
+                "        $check = function ($user) { return '}'; };\n    }\n\n"
+                "    protected function logout() {}\n}\n")
+            (Path(tmp) / "helpers.php").write_text("<?php\nfunction money($value) { return $value; }\n")
+
+            index = vibe.SymbolIndex(tmp)
+            found = index.lookup("authcontroller")
+            if len(found) != 1 or found[0]["fqn"] != "App\\Http\\Controllers\\AuthController" or found[0]["line"] != 4:
+                print(f"  ❌ Clase no encontrada: {found}")
+                return False
+            members = [(m["name"], m["line"]) for m in found[0]["members"]]
+            if members != [("login", 7), ("logout", 12)]:
+                print(f"  ❌ Métodos incorrectos: {members}")
+                return False
+            if [m["line"] for m in index.lookup("AuthController::logout")] != [12] or \
+                    [m["kind"] for m in index.lookup("App\\Http\\Controllers\\AuthController")] != ["class"] or \
+                    [m["name"] for m in index.lookup("mon")] != ["money"]:
+                print("  ❌ Búsqueda por Clase::metodo, nombre completo o prefijo incorrecta")
+                return False
+
+            # Solo se reanaliza el archivo modificado
+            auth.write_text(auth.read_text().replace("    protected function logout() {}\n",
+                                                     "    public function refresh() {}\n"))
+            db = index._connect()
+            reparsed = index.refresh(db)
+            db.close()
+            if reparsed != 1 or index.lookup("logout") or not index.lookup("AuthController@refresh"):
+                print(f"  ❌ Actualización incremental incorrecta ({reparsed} archivos)")
+                return False
+
+            result = vibe.Tools.symbol("AuthController")  # Índice del directorio de trabajo
+            if not result.success:
+                print(f"  ❌ Error en la herramienta symbol: {result.error}")
+                return False
+
+        print("  ✅ Clases, métodos y funciones con archivo:línea; 1 archivo reanalizado tras el cambio")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en índice de símbolos: {e}")
+        return False
+
+def test_route_table():
+    """Verifica la extracción de rutas de Laravel y su caché por hash"""
+    print("\n🔍 Verificando tabla de rutas...")
+
+    import tempfile
+    import vibe
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            routes_dir = Path(tmp) / "routes"
+            routes_dir.mkdir()
+            (routes_dir / "web.php").write_text(
+                "<?php\nuse App\\Http\\Controllers\\UserController;\n\n"
+                "Route::get('/', fn () => view('welcome'))->name('home');\n"
+                "Route::middleware('auth')->prefix('admin')->name('admin.')->group(function () {\n"
+                "    Route::resource('users', UserController::class)->except(['create', 'edit']);\n"
+                "    Route::post('/export', 'ExportController@run')->middleware('can:export');\n"
+                "    require base_path('routes/admin/stats.php');\n"
+                "});\n"
+                "require __DIR__.'/auth.php';\n")
+            (routes_dir / "auth.php").write_text("<?php\nRoute::post('login', [LoginController::class, 'store']);\n")
+            (routes_dir / "admin").mkdir()
+            (routes_dir / "admin" / "stats.php").write_text("<?php\nRoute::get('/stats', [StatsController::class, 'index']);\n")
+            (routes_dir / "api.php").write_text("<?php\nRoute::apiResource('photos', PhotoController::class);\n")
+
+            table = vibe.RouteTable(tmp)
+            routes = table.routes()
+            if len(routes) != 14:
+                print(f"  ❌ Se esperaban 14 rutas: {[vibe.format_route(r) for r in routes]}")
+                return False
+            show = table.query("admin.users.show")
+            if len(show) != 1 or show[0]["uri"] != "/admin/users/{user}" or \
+                    show[0]["action"] != "App\\Http\\Controllers\\UserController@show" or \
+                    show[0]["middleware"] != ["web", "auth"]:
+                print(f"  ❌ Ruta de resource incorrecta: {show}")
+                return False
+            export = table.query("export")[0]
+            login = table.query("login")[0]
+            stats = table.query("stats")[0]
+            if export["middleware"] != ["web", "auth", "can:export"] or login["middleware"] != ["web"] or \
+                    stats["uri"] != "/admin/stats" or stats["middleware"] != ["web", "auth"] or \
+                    [r["uri"] for r in table.query(method="DELETE")] != ["/admin/users/{user}", "/api/photos/{photo}"]:
+                print(f"  ❌ Middleware o métodos incorrectos: {export}, {login}")
+                return False
+
+            # Otra instancia usa la caché mientras los archivos no cambien
+            cached = vibe.RouteTable(tmp)
+            cached._build = lambda hashes: (_ for _ in ()).throw(AssertionError("rutas reanalizadas"))
+            if len(cached.routes()) != 14:
+                print("  ❌ La caché de rutas no se reutilizó")
+                return False
+            (routes_dir / "api.php").write_text("<?php\nRoute::get('/ping', fn () => 'pong');\n")
+            if [r["uri"] for r in vibe.RouteTable(tmp).query(filter="/api")] != ["/api/ping"]:
+                print("  ❌ Un cambio en los archivos no invalidó la caché")
+                return False
+
+            summary = vibe.summarize_routes(routes)
+            if not summary.startswith("Rutas: 14") or "/admin (7)" not in summary:
+                print(f"  ❌ Resumen incorrecto:\n{summary}")
+                return False
+
+        print("  ✅ 14 rutas con grupos, resources, middleware y require; caché invalidada al cambiar")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en tabla de rutas: {e}")
+        return False
+
+def test_multi_edit():
+    """Verifica que multi_edit valide todo antes de escribir y revierta ante un fallo"""
+    print("\n🔍 Verificando edición atómica...")
+
+    import os
+    import tempfile
+    import vibe
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            model = Path(tmp) / "User.php"
+            controller = Path(tmp) / "UserController.php"
+            model.write_text("<?php\nclass User {\n    protected $table = 'users';\n    protected $guarded = [];\n}\n")
+            controller.write_text("<?php\n$user = User::find($id);\n$users = User::all();\n")
+            before = (model.read_text(), controller.read_text())
+
+            # Un edit inválido impide todos los demás
+            result = vibe.execute_tool("multi_edit", {"edits": [
+                {"file_path": str(model), "old_string": "users", "new_string": "members"},
+                {"file_path": str(controller), "old_string": "Usuario::", "new_string": "Member::"},
+            ]})
+            if result.success or "edit 2" not in result.error or (model.read_text(), controller.read_text()) != before:
+                print(f"  ❌ Un edit inválido no detuvo la operación: {result}")
+                return False
+
+            # Formato JSON del protocolo de texto, replace_all y varios edits por archivo
+            call = vibe.parse_tool_calls(
+                "TOOL:multi_edit(edits='[{\"file_path\": \"%s\", \"old_string\": \"User::\", "
+                "\"new_string\": \"Member::\", \"replace_all\": true}, "
+                "{\"file_path\": \"%s\", \"old_string\": \"class User\", \"new_string\": \"class Member\"}, "
+                "{\"file_path\": \"%s\", \"old_string\": \"$table\", \"new_string\": \"$tableName\"}]')"
+                % (controller, model, model))[0]
+            if vibe._tool_paths(call) != [str(controller), str(model), str(model)]:
+                print(f"  ❌ Rutas de multi_edit incorrectas: {vibe._tool_paths(call)}")
+                return False
+            result = vibe.execute_tool(call["tool"], call["params"])
+            if not result.success or "4 reemplazo(s)" not in result.output or \
+                    model.read_text().count("Member") != 1 or "User" in controller.read_text() or \
+                    "$tableName" not in model.read_text() or sorted(os.listdir(tmp)) != ["User.php", "UserController.php"]:
+                print(f"  ❌ Edición múltiple incorrecta: {result}")
+                return False
+
+            # Si falla el renombrado del segundo archivo, el primero se restaura
+            before = (model.read_text(), controller.read_text())
+            replace, calls = os.replace, []
+            def failing_replace(src, dst):
+                calls.append(dst)
+                if len(calls) == 2:
+                    raise OSError("disco lleno")
+                replace(src, dst)
+            vibe.os.replace = failing_replace
+            try:
+                result = vibe.execute_tool("multi_edit", {"edits": [
+                    {"file_path": str(model), "old_string": "$guarded", "new_string": "$fillable"},
+                    {"file_path": str(controller), "old_string": "all()", "new_string": "get()"},
+                ]})
+            finally:
+                vibe.os.replace = replace
+            if result.success or "disco lleno" not in result.error or \
+                    (model.read_text(), controller.read_text()) != before or len(os.listdir(tmp)) != 2:
+                print(f"  ❌ No se revirtió el fallo: {result}")
+                return False
+
+            # Escapes de JSON (comillas dobles de PHP y saltos de línea) dentro de edits='...'
+            view = Path(tmp) / "hola.php"
+            view.write_text('<?php\necho "hola";\n')
+            call = vibe.parse_tool_calls(
+                'TOOL:multi_edit(edits=\'[{"file_path": "%s", "old_string": "echo \\"hola\\";", '
+                '"new_string": "echo \\"adiós\\";\\nreturn;"}]\')' % view)[0]
+            result = vibe.execute_tool(call["tool"], call["params"])
+            if not result.success or view.read_text() != '<?php\necho "adiós";\nreturn;\n':
+                print(f"  ❌ Comillas escapadas en edits: {result} {view.read_text()!r}")
+                return False
+
+            # Un enlace simbólico se mantiene y se edita el archivo al que apunta
+            link = Path(tmp) / "enlace.php"
+            link.symlink_to(view)
+            result = vibe.execute_tool("multi_edit", {"edits": [
+                {"file_path": str(link), "old_string": "return;", "new_string": "exit;"}]})
+            if not result.success or not link.is_symlink() or "exit;" not in view.read_text():
+                print(f"  ❌ El enlace simbólico no se respetó: {result}")
+                return False
+
+        print("  ✅ Validación previa, JSON de texto con escapes, varios archivos y rollback ante fallos")
+        return True
+
+    except Exception as e:
+        print(f"  ❌ Error en edición atómica: {e}")
+        return False
+
 def main():
     """Ejecuta todas las pruebas"""
     print("═" * 60)
@@ -223,6 +1443,30 @@ def main():
     results.append(("Herramientas", test_tools()))
     results.append(("Detección Framework", test_framework_detection()))
     results.append(("Parser", test_tool_parser()))
+    results.append(("Parser incremental", test_incremental_parser()))
+    results.append(("Streaming", test_streaming()))
+    results.append(("Tools nativas", test_native_tools()))
+    results.append(("Planificador", test_tool_scheduler()))
+    results.append(("Índice grep", test_grep_index()))
+    results.append(("Motor de búsqueda", test_search_engine()))
+    results.append(("Recorrido", test_walker()))
+    results.append(("Índice de líneas", test_line_index()))
+    results.append(("Contexto", test_context_manager()))
+    results.append(("Caché", test_tool_cache()))
+    results.append(("Precarga", test_model_warmer()))
+    results.append(("Salida de bash", test_bash_output()))
+    results.append(("Shell persistente", test_shell_session()))
+    results.append(("Benchmarks", test_bench_helpers()))
+    results.append(("Telemetría", test_telemetry()))
+    results.append(("Perfil del proyecto", test_project_profile()))
+    results.append(("Importaciones diferidas", test_lazy_imports()))
+    results.append(("Modo por lotes", test_batch_mode()))
+    results.append(("Pool de servidores", test_ollama_pool()))
+    results.append(("Enrutado de modelos", test_model_routing()))
+    results.append(("Índice semántico", test_semantic_index()))
+    results.append(("Índice de símbolos", test_symbol_index()))
+    results.append(("Tabla de rutas", test_route_table()))
+    results.append(("Edición atómica", test_multi_edit()))
 
     # Resumen
     print("\n" + "═" * 60)
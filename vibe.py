@@ -4,21 +4,85 @@ Vibe - Tu programador personal para PHP
 Ejecuta: python vibe.py
 """
 
-import ollama
 import os
+import sys
+import asyncio
+import signal
 import subprocess
 import re
 import json
+import hashlib
+import mmap
+import threading
+import multiprocessing
+import heapq
+import time
+import queue
+import uuid
+import tempfile
+from array import array
 from pathlib import Path
+import importlib
 from rich.console import Console
-from rich.markdown import Markdown
-from rich.table import Table
-from rich.panel import Panel
-from typing import List, Dict, Optional
+from rich.errors import LiveError
+from typing import List, Dict, Optional, Tuple, Iterator
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque, OrderedDict
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+class _LazyModule:
+    """Módulo que se importa al usar su primer atributo; ollama (httpx, pydantic) tarda ~0,5 s en cargar"""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self._name)
+        self.__dict__.update(vars(module))  # Los siguientes accesos ya no pasan por aquí
+        return getattr(module, attr)
+
+ollama = _LazyModule("ollama")
 
 console = Console()
 MODEL = os.getenv("VIBE_MODEL", "qwen3-coder:30b")  # Modelo por defecto (cambiado de gpt-oss:20b)
+SMALL_MODEL = os.getenv("VIBE_SMALL_MODEL", "")  # Modelo rápido para las rondas de herramientas ("" = no)
+MODEL_ROUTING = os.getenv("VIBE_MODEL_ROUTING", "tools").lower()  # tools, all u off: qué acepta el modelo pequeño
+STREAM = os.getenv("VIBE_STREAM", "1") != "0"  # Mostrar tokens a medida que llegan
+KEEP_ALIVE = os.getenv("VIBE_KEEP_ALIVE", "30m")  # Tiempo que Ollama mantiene el modelo en memoria
+KEEP_ALIVE = int(KEEP_ALIVE) if KEEP_ALIVE.lstrip('-').isdigit() else KEEP_ALIVE
+HOSTS = [h.strip() for h in os.getenv("VIBE_HOSTS", "").split(",") if h.strip()]  # Varios servidores Ollama
+ROUTING = os.getenv("VIBE_ROUTING", "load").lower()  # load (menos peticiones en curso) o latency
+HEALTH_INTERVAL = float(os.getenv("VIBE_HEALTH_INTERVAL", "30"))  # Segundos entre verificaciones del pool
+NATIVE_TOOLS = os.getenv("VIBE_NATIVE_TOOLS", "auto").lower()  # auto, on u off: API de tools de Ollama
+TOOL_WORKERS = int(os.getenv("VIBE_TOOL_WORKERS", "8"))  # Herramientas de lectura en paralelo
+CACHE_DIR = os.getenv("VIBE_CACHE_DIR", ".vibe")  # Índices y cachés persistentes del proyecto
+GREP_INDEX = os.getenv("VIBE_GREP_INDEX", "1") != "0"  # Usar el índice de trigramas en grep
+GREP_MAX_BYTES = int(os.getenv("VIBE_GREP_MAX_BYTES", str(10 * 1024 * 1024)))  # Archivos mayores se omiten
+GREP_WORKERS = int(os.getenv("VIBE_GREP_WORKERS", str(os.cpu_count() or 1)))  # Procesos de búsqueda
+GREP_MAX_RESULTS = 100
+BASH_OUTPUT_BYTES = int(os.getenv("VIBE_BASH_OUTPUT_BYTES", str(64 * 1024)))  # Principio + final que se conservan
+BASH_TIMEOUT = 300
+PERSISTENT_SHELL = os.getenv("VIBE_PERSISTENT_SHELL", "0") == "1"  # Un shell vivo por conversación
+BATCH_CONCURRENCY = int(os.getenv("VIBE_BATCH_CONCURRENCY", "4"))  # Conversaciones simultáneas en --batch
+CONTEXT_TOKENS = int(os.getenv("VIBE_CONTEXT_TOKENS", "16000"))  # Presupuesto de tokens del historial
+CONTEXT_KEEP_RECENT = int(os.getenv("VIBE_CONTEXT_KEEP", "6"))  # Mensajes recientes que nunca se compactan
+TOOL_CACHE_BYTES = int(os.getenv("VIBE_TOOL_CACHE_BYTES", str(32 * 1024 * 1024)))  # Memoria de la caché
+TELEMETRY_FILE = os.getenv("VIBE_TELEMETRY", os.path.join(CACHE_DIR, "telemetry.jsonl"))  # "" para desactivar
+READ_INDEX_MIN_BYTES = int(os.getenv("VIBE_READ_INDEX_MIN_BYTES", str(1024 * 1024)))  # Leer por ventanas
+READ_DEFAULT_LIMIT = 2000  # Líneas que se leen de un archivo grande si no se indica limit
+GITIGNORE = os.getenv("VIBE_GITIGNORE", "1") != "0"  # Respetar .gitignore al recorrer el proyecto
+EMBED_MODEL = os.getenv("VIBE_EMBED_MODEL", "nomic-embed-text")  # Modelo de embeddings del índice semántico
+SEMANTIC_ATTACH = int(os.getenv("VIBE_SEMANTIC_ATTACH", "0"))  # Fragmentos adjuntados a cada mensaje (0 = no)
+
+# Directorios que glob y grep nunca recorren
+IGNORE_DIRS = {'.git', '__pycache__', 'node_modules', 'storage', 'vendor', 'bootstrap/cache',
+               '.next', 'dist', 'build', CACHE_DIR}
 
 # ═══════════════════════════════════════════════════════════════════════════
 # DATACLASSES
@@ -37,6 +101,243 @@ class ToolResult:
     output: str
     error: Optional[str] = None
 
+@dataclass(eq=False)  # Cada servidor es único aunque coincidan sus datos
+class Endpoint:
+    host: str
+    healthy: bool = True  # Se asume disponible hasta la primera verificación
+    checked: bool = False
+    models: frozenset = frozenset()  # Modelos instalados (list)
+    loaded: frozenset = frozenset()  # Modelos en memoria (ps)
+    catalog: Tuple = ()  # Entradas de list tal como las devuelve Ollama
+    latency_ms: Optional[float] = None  # Media móvil de la verificación
+    inflight: int = 0
+    requests: int = 0
+    failures: int = 0
+    error: Optional[str] = None
+
+@dataclass
+class SearchResult:
+    matches: List[str]
+    scanned: int = 0
+    binary: int = 0
+    large: int = 0
+    unreadable: int = 0
+    truncated: bool = False
+
+    @property
+    def skipped(self) -> int:
+        return self.binary + self.large + self.unreadable
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SALIDA DE COMANDOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class OutputBuffer:
+    """Salida acotada de un comando: conserva el principio y el final y cuenta lo descartado"""
+
+    def __init__(self, max_bytes: int = BASH_OUTPUT_BYTES):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self._head = bytearray()
+        self._tail = bytearray()
+        self.total_bytes = 0
+        self.total_lines = 0
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+        self.total_lines += data.count(b'\n')
+        room = self.head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data
+            # Recortar de a bloques mantiene el coste lineal en el tamaño de la salida
+            if len(self._tail) > 2 * self.tail_limit:
+                del self._tail[:-self.tail_limit]
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.total_bytes - len(self._head) - min(len(self._tail), self.tail_limit)
+
+    def text(self) -> str:
+        tail = self._tail[-self.tail_limit:] if self.tail_limit else b""
+        if not self.dropped_bytes:
+            return (bytes(self._head) + bytes(tail)).decode('utf-8', errors='replace')
+        return (
+            bytes(self._head).decode('utf-8', errors='replace')
+            + f"\n\n... [salida truncada: {self.dropped_bytes} de {self.total_bytes} bytes omitidos, "
+              f"{self.total_lines} líneas en total] ...\n\n"
+            + bytes(tail).decode('utf-8', errors='replace')
+        )
+
+class CommandProgress:
+    """Indicador en consola con las líneas y bytes que lleva emitidos un comando"""
+
+    def __init__(self, description: str):
+        self.description = description[:60]
+        self._last_update = 0.0
+        self._status = console.status(f"[dim]{self.description}[/]")
+        try:
+            self._status.start()
+        except LiveError:
+            self._status = None  # Ya hay otro indicador activo en la consola
+
+    def update(self, output: OutputBuffer):
+        now = time.monotonic()
+        if self._status is None or now - self._last_update < 0.1:
+            return
+        self._last_update = now
+        self._status.update(f"[dim]{self.description} — {output.total_lines} líneas, "
+                            f"{output.total_bytes / 1024:.0f} KB[/]")
+
+    def stop(self):
+        if self._status is not None:
+            self._status.stop()
+            self._status = None
+
+def _pump_output(stream, output: OutputBuffer, progress: CommandProgress):
+    """Copia la salida de un proceso al buffer acotado a medida que llega"""
+    for chunk in iter(lambda: stream.read1(65536), b''):
+        output.write(chunk)
+        progress.update(output)
+
+def _kill_process_tree(process):
+    """Termina el shell y los procesos que lanzó"""
+    try:
+        if os.name != "nt":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+def _bash_result(output: OutputBuffer, returncode: int) -> ToolResult:
+    return ToolResult(
+        tool="bash",
+        success=returncode == 0,
+        output=output.text().strip(),
+        error=None if returncode == 0 else f"Exit code: {returncode}"
+    )
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SESIÓN DE SHELL PERSISTENTE
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ShellSession:
+    """Shell de larga duración: conserva cd, variables y entornos activados entre comandos"""
+
+    def __init__(self, shell: Optional[str] = None):
+        self.shell = shell or ("/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh")
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._marker = b""
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    @staticmethod
+    def _reader(stream, chunks: queue.Queue):
+        for chunk in iter(lambda: stream.read1(65536), b''):
+            chunks.put(chunk)
+        chunks.put(None)  # El shell terminó
+
+    def _start(self):
+        if self._process is not None:
+            self.restarts += 1
+        self._process = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+        # Cada shell tiene su propio marcador: la salida de uno anterior nunca cierra un comando nuevo
+        self._marker = f"__VIBE_{uuid.uuid4().hex}__".encode()
+        self._chunks = queue.Queue()
+        threading.Thread(target=self._reader, args=(self._process.stdout, self._chunks), daemon=True).start()
+
+    def interrupt(self):
+        """Mata el shell y lo que esté ejecutando; el próximo comando arranca uno nuevo"""
+        process = self._process
+        if process is not None and process.poll() is None:
+            _kill_process_tree(process)
+            process.wait()  # Sin esperar, poll() podría seguir viéndolo vivo
+
+    def close(self):
+        self.interrupt()
+        self._process = None
+
+    def run(self, command: str, description: str = "", timeout: float = BASH_TIMEOUT) -> ToolResult:
+        """Ejecuta un comando en el shell vivo y espera a su marcador de fin"""
+        with self._lock:
+            console.print(f"[dim]🔧 {description or command}[/]")
+            output = OutputBuffer()
+            progress = None
+            try:
+                if not self.alive:
+                    self._start()
+                marker, chunks = self._marker, self._chunks
+                # stdin desde /dev/null: el comando no puede consumir las líneas de control siguientes.
+                # eval recibe el comando como una sola cadena entre comillas simples: una comilla sin
+                # cerrar es un error de sintaxis inmediato y no se traga el marcador. eval y las llaves
+                # no abren subshell, así que cd y export persisten.
+                quoted = "'" + command.replace("'", "'\\''") + "'"
+                script = f"{{ eval {quoted}\n}} < /dev/null\nprintf '\\n%s %d\\n' '{marker.decode()}' $?\n"
+                self._process.stdin.write(script.encode())
+                self._process.stdin.flush()
+                progress = CommandProgress(description or command)
+
+                pending = bytearray()
+                keep = len(marker) + 16  # Lo justo para no partir el marcador entre dos bloques
+                deadline = time.monotonic() + timeout
+                while True:
+                    try:
+                        chunk = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        self.interrupt()
+                        output.write(bytes(pending))
+                        return ToolResult(tool="bash", success=False, output=output.text().strip(),
+                                          error=f"Timeout ({timeout:.0f} s); se reinicia el shell")
+                    if chunk is None:
+                        # El comando cerró el shell (exit, exec...): se reabre en la próxima llamada
+                        output.write(bytes(pending))
+                        return _bash_result(output, self._process.wait())
+                    pending += chunk
+                    index = pending.find(marker)
+                    if index == -1:
+                        if len(pending) > keep:
+                            output.write(bytes(pending[:-keep]))
+                            del pending[:-keep]
+                        progress.update(output)
+                        continue
+                    end = pending.find(b'\n', index)
+                    if end == -1:
+                        continue  # Falta el resto de la línea del marcador
+                    output.write(bytes(pending[:index]))
+                    status = pending[index + len(marker):end].strip()
+                    return _bash_result(output, int(status) if status.lstrip(b'-').isdigit() else 1)
+            except OSError as e:
+                self.interrupt()
+                return ToolResult(tool="bash", success=False, output=output.text().strip(), error=str(e))
+            finally:
+                if progress:
+                    progress.stop()
+                # Un comando puede modificar cualquier archivo
+                tool_cache.clear()
+
+    async def run_async(self, command: str, description: str = "") -> ToolResult:
+        """Versión asíncrona de run; al cancelarla se mata el shell en lugar de esperar al comando"""
+        future = asyncio.get_running_loop().run_in_executor(None, self.run, command, description)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.interrupt()
+            raise
+
 # ═══════════════════════════════════════════════════════════════════════════
 # HERRAMIENTAS PRINCIPALES
 # ═══════════════════════════════════════════════════════════════════════════
@@ -47,26 +348,75 @@ class Tools:
     @staticmethod
     def bash(command: str, description: str = "") -> ToolResult:
         """Ejecuta un comando bash"""
+        process = None
+        output = OutputBuffer()
+        progress = None
         try:
             console.print(f"[dim]🔧 {description or command}[/]")
-            result = subprocess.run(
+            process = subprocess.Popen(
                 command,
                 shell=True,
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            output = result.stdout + result.stderr
-            return ToolResult(
-                tool="bash",
-                success=result.returncode == 0,
-                output=output.strip(),
-                error=None if result.returncode == 0 else f"Exit code: {result.returncode}"
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,  # Un solo canal: stdout y stderr quedan intercalados
+                start_new_session=os.name != "nt"
             )
+            progress = CommandProgress(description or command)
+            reader = threading.Thread(target=_pump_output, args=(process.stdout, output, progress), daemon=True)
+            reader.start()
+            process.wait(timeout=BASH_TIMEOUT)
+            reader.join()
+            return _bash_result(output, process.returncode)
         except subprocess.TimeoutExpired:
-            return ToolResult(tool="bash", success=False, output="", error="Timeout (5 min)")
+            return ToolResult(tool="bash", success=False, output=output.text().strip(), error=f"Timeout ({BASH_TIMEOUT // 60} min)")
+        except Exception as e:
+            return ToolResult(tool="bash", success=False, output="", error=str(e))
+        finally:
+            if process is not None and process.poll() is None:
+                _kill_process_tree(process)
+            if progress:
+                progress.stop()
+            # Un comando puede modificar cualquier archivo
+            tool_cache.clear()
+
+    @staticmethod
+    async def bash_async(command: str, description: str = "") -> ToolResult:
+        """Ejecuta un comando bash como subproceso asíncrono (cancelable)"""
+        process = None
+        output = OutputBuffer()
+        progress = None
+        try:
+            console.print(f"[dim]🔧 {description or command}[/]")
+            process = await asyncio.create_subprocess_shell(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,  # Un solo canal: stdout y stderr quedan intercalados
+                start_new_session=os.name != "nt"
+            )
+            progress = CommandProgress(description or command)
+
+            async def pump():
+                while True:
+                    chunk = await process.stdout.read(65536)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    progress.update(output)
+                await process.wait()
+
+            await asyncio.wait_for(pump(), timeout=BASH_TIMEOUT)
+            return _bash_result(output, process.returncode)
+        except asyncio.TimeoutError:
+            return ToolResult(tool="bash", success=False, output=output.text().strip(), error=f"Timeout ({BASH_TIMEOUT // 60} min)")
         except Exception as e:
             return ToolResult(tool="bash", success=False, output="", error=str(e))
+        finally:
+            # Cancelado o vencido: el proceso no debe quedar corriendo
+            if process is not None and process.returncode is None:
+                _kill_process_tree(process)
+            if progress:
+                progress.stop()
+            # Un comando puede modificar cualquier archivo
+            tool_cache.clear()
 
     @staticmethod
     def read(file_path: str, offset: int = 0, limit: Optional[int] = None) -> ToolResult:
@@ -76,11 +426,23 @@ class Tools:
             if not path.exists():
                 return ToolResult(tool="read", success=False, output="", error="Archivo no encontrado")
 
+            offset = int(offset)
+            limit = int(limit) if limit else None
+
+            if path.stat().st_size >= READ_INDEX_MIN_BYTES:
+                # Archivos grandes: solo se lee la ventana pedida usando el índice de líneas
+                index = get_line_index(str(path))
+                lines = index.read_lines(offset, limit or READ_DEFAULT_LIMIT)
+                numbered = "\n".join(f"{i+1+offset:6d}\t{line}" for i, line in enumerate(lines))
+                remaining = index.line_count - offset - len(lines)
+                if remaining > 0:
+                    numbered += (f"\n\n... ({remaining} líneas más de {index.line_count}; "
+                                 f"usa offset/limit para leer otra parte)")
+                return ToolResult(tool="read", success=True, output=numbered)
+
             content = path.read_text(encoding='utf-8')
             lines = content.splitlines()
-
-            if limit:
-                lines = lines[offset:offset + limit]
+            lines = lines[offset:offset + limit] if limit else lines[offset:]
 
             # Formato con números de línea (estilo cat -n)
             numbered = "\n".join(f"{i+1+offset:6d}\t{line}" for i, line in enumerate(lines))
@@ -96,6 +458,7 @@ class Tools:
             path = Path(file_path)
             path.parent.mkdir(parents=True, exist_ok=True)
             path.write_text(content, encoding='utf-8')
+            tool_cache.invalidate_path(file_path)
             return ToolResult(tool="write", success=True, output=f"Archivo escrito: {file_path}")
         except Exception as e:
             return ToolResult(tool="write", success=False, output="", error=str(e))
@@ -125,23 +488,49 @@ class Tools:
                 new_content = content.replace(old_string, new_string)
 
             path.write_text(new_content, encoding='utf-8')
+            tool_cache.invalidate_path(file_path)
             return ToolResult(tool="edit", success=True,
                             output=f"Archivo editado: {file_path}")
         except Exception as e:
             return ToolResult(tool="edit", success=False, output="", error=str(e))
 
+    @staticmethod
+    def multi_edit(edits) -> ToolResult:
+        """Aplica varios reemplazos en uno o más archivos: todos o ninguno"""
+        try:
+            plan = _plan_multi_edit(_multi_edit_list(edits))
+        except (ValueError, OSError) as e:
+            return ToolResult(tool="multi_edit", success=False, output="", error=str(e))
+        try:
+            _commit_multi_edit(plan)
+        except Exception as e:
+            return ToolResult(tool="multi_edit", success=False, output="",
+                            error=f"{e}. No se modificó ningún archivo")
+        finally:
+            for file in plan:
+                tool_cache.invalidate_path(file.path)
+                tool_cache.invalidate_path(file.display)
+        total = sum(file.replacements for file in plan)
+        lines = [f"{len(plan)} archivo(s) editado(s), {total} reemplazo(s):"]
+        lines += [f"  {file.display}: {file.replacements}" for file in plan]
+        return ToolResult(tool="multi_edit", success=True, output="\n".join(lines))
+
     @staticmethod
     def glob(pattern: str, path: str = ".") -> ToolResult:
         """Busca archivos por patrón glob"""
         try:
             base_path = Path(path)
-            matches = sorted(base_path.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True)
 
-            # Filtrar directorios comunes a ignorar
-            ignore = {'.git', '__pycache__', 'node_modules', 'storage', 'vendor', 'bootstrap/cache', '.next', 'dist', 'build'}
-            matches = [m for m in matches if not any(ig in m.parts for ig in ignore)]
+            def with_mtime():
+                for rel in walk_files(path, pattern):
+                    try:
+                        yield os.stat(base_path / rel).st_mtime, rel
+                    except OSError:
+                        continue
 
-            output = "\n".join(str(m) for m in matches[:100])  # Limitar a 100 resultados
+            # Solo los 100 más recientes: un heap evita ordenar todas las coincidencias
+            newest = heapq.nlargest(100, with_mtime())
+            output = "\n".join(str(base_path / rel) for _, rel in newest)
             return ToolResult(tool="glob", success=True, output=output or "No se encontraron archivos")
         except Exception as e:
             return ToolResult(tool="glob", success=False, output="", error=str(e))
@@ -155,46 +544,77 @@ class Tools:
             base_path = Path(path)
             matches = []
 
-            ignore = {'.git', '__pycache__', 'node_modules', 'storage', 'vendor', 'bootstrap/cache'}
-
             flags = re.IGNORECASE if case_insensitive else 0
             regex = re.compile(pattern, flags)
 
-            for file_path in base_path.rglob(glob_pattern):
-                if not file_path.is_file() or any(ig in file_path.parts for ig in ignore):
-                    continue
-
+            # El índice reduce la búsqueda a los archivos candidatos; None = recorrido completo
+            files = None
+            if GREP_INDEX:
                 try:
-                    content = file_path.read_text(encoding='utf-8')
-
-                    if output_mode == "files_with_matches":
-                        if regex.search(content):
-                            matches.append(str(file_path))
-                    elif output_mode == "content":
-                        lines = content.splitlines()
-                        for i, line in enumerate(lines, 1):
-                            if regex.search(line):
-                                context = []
-                                if context_lines > 0:
-                                    start = max(0, i - 1 - context_lines)
-                                    end = min(len(lines), i + context_lines)
-                                    context = lines[start:end]
-                                    matches.append(f"{file_path}:{i}:\n" + "\n".join(context))
-                                else:
-                                    matches.append(f"{file_path}:{i}: {line}")
-                except:
-                    continue
-
-            output = "\n".join(matches[:100]) if matches else "No se encontraron coincidencias"
-            return ToolResult(tool="grep", success=True, output=output)
+                    files = get_grep_index().candidates(pattern, base_path, glob_pattern)
+                except OSError:
+                    files = None  # Índice inaccesible: se recorre el árbol completo
+            if files is None:
+                files = (base_path / rel for rel in walk_files(path, glob_pattern, recursive=True))
+
+            result = search_files(files, pattern, flags, output_mode, context_lines)
+
+            output = "\n".join(result.matches) if result.matches else "No se encontraron coincidencias"
+            summary = f"{result.scanned} archivos escaneados, {result.skipped} omitidos"
+            if result.skipped:
+                summary += f" ({result.binary} binarios, {result.large} demasiado grandes, {result.unreadable} ilegibles)"
+            if result.truncated:
+                summary += f"; resultados limitados a {GREP_MAX_RESULTS}"
+            return ToolResult(tool="grep", success=True, output=f"{output}\n\n[{summary}]")
         except Exception as e:
             return ToolResult(tool="grep", success=False, output="", error=str(e))
 
+    @staticmethod
+    def search(query: str, limit: int = 5) -> ToolResult:
+        """Busca fragmentos de código por significado en el índice semántico"""
+        try:
+            snippets = get_semantic_index().search(query, int(limit))
+            if not snippets:
+                return ToolResult(tool="search", success=True, output="No se encontraron fragmentos")
+            return ToolResult(tool="search", success=True, output=format_snippets(snippets))
+        except Exception as e:
+            return ToolResult(tool="search", success=False, output="", error=str(e))
+
+    @staticmethod
+    def symbol(name: str, kind: Optional[str] = None) -> ToolResult:
+        """Ubica clases, métodos y funciones PHP en el índice de símbolos"""
+        try:
+            matches = get_symbol_index().lookup(name, kind)
+            if not matches:
+                return ToolResult(tool="symbol", success=True, output=f"No se encontró el símbolo {name}")
+            lines = []
+            for match in matches:
+                lines.append(f"{match['path']}:{match['line']} {match['kind']} {match['fqn']} — {match['signature']}")
+                for member in match.get("members", []):
+                    lines.append(f"  :{member['line']} {member['signature']}")
+            return ToolResult(tool="symbol", success=True, output="\n".join(lines))
+        except Exception as e:
+            return ToolResult(tool="symbol", success=False, output="", error=str(e))
+
+    @staticmethod
+    def routes(filter: Optional[str] = None, method: Optional[str] = None) -> ToolResult:
+        """Consulta la tabla de rutas de Laravel extraída de routes/*.php"""
+        try:
+            matches = get_route_table().query(filter, method)
+            if not matches:
+                return ToolResult(tool="routes", success=True, output="No se encontraron rutas")
+            output = "\n".join(format_route(route) for route in matches[:200])
+            if len(matches) > 200:
+                output += f"\n\n[{len(matches)} rutas; se muestran 200, usa filter para acotar]"
+            return ToolResult(tool="routes", success=True, output=output)
+        except Exception as e:
+            return ToolResult(tool="routes", success=False, output="", error=str(e))
+
     @staticmethod
     def list_models() -> ToolResult:
         """Lista los modelos disponibles en Ollama"""
         try:
-            models = ollama.list()
+            models = ollama_pool.list() if ollama_pool else ollama.list()
             if not models.get('models'):
                 return ToolResult(tool="list_models", success=False, output="",
                                 error="No hay modelos disponibles en Ollama")
@@ -212,6 +632,1928 @@ class Tools:
             return ToolResult(tool="list_models", success=False, output="",
                             error=f"Error al listar modelos: {str(e)}")
 
+# ═══════════════════════════════════════════════════════════════════════════
+# EDICIÓN ATÓMICA
+# ═══════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class _PlannedFile:
+    path: str  # Ruta real (enlaces simbólicos resueltos)
+    display: str  # Ruta tal como la pidió el modelo
+    original: bytes
+    updated: bytes
+    stamp: Optional[Tuple[int, int]]
+    replacements: int
+
+def _multi_edit_list(edits) -> List[Dict]:
+    """Normaliza el parámetro edits: lista de dicts o JSON (protocolo de texto)"""
+    if isinstance(edits, str):
+        try:
+            edits = json.loads(edits, strict=False)  # Admite saltos de línea reales dentro de las cadenas
+        except json.JSONDecodeError as e:
+            raise ValueError(f"edits no es JSON válido: {e}")
+    if isinstance(edits, dict):
+        edits = [edits]
+    if not isinstance(edits, list) or not edits:
+        raise ValueError("edits debe ser una lista no vacía de {file_path, old_string, new_string}")
+    for number, edit in enumerate(edits, 1):
+        if not isinstance(edit, dict):
+            raise ValueError(f"edit {number}: se esperaba un objeto")
+        for key in ("file_path", "old_string", "new_string"):
+            if not isinstance(edit.get(key), str):
+                raise ValueError(f"edit {number}: falta {key}")
+        if not edit["old_string"]:
+            raise ValueError(f"edit {number}: old_string vacío")
+    return edits
+
+def _edit_spans(content: str, edit: Dict, number: int) -> List[Tuple[int, int, str]]:
+    """Posiciones (inicio, fin, reemplazo) de un edit sobre el contenido original"""
+    old = edit["old_string"]
+    spans, start = [], content.find(old)
+    while start != -1:
+        spans.append((start, start + len(old), edit["new_string"]))
+        if len(spans) > 1 and not edit.get("replace_all"):
+            count = content.count(old)
+            raise ValueError(f"edit {number} ({edit['file_path']}): old_string encontrado {count} veces. "
+                             "Usa replace_all=true o proporciona más contexto")
+        start = content.find(old, start + len(old))
+    if not spans:
+        raise ValueError(f"edit {number} ({edit['file_path']}): old_string no encontrado en el archivo")
+    return spans
+
+def _plan_multi_edit(edits: List[Dict]) -> List[_PlannedFile]:
+    """Valida todos los edits contra el contenido original y calcula cada archivo resultante
+
+    Cada old_string se busca en el archivo tal como está (no en el resultado de los edits
+    anteriores), así que los reemplazos de un mismo archivo no pueden solaparse.
+    """
+    grouped: "OrderedDict[str, List[Tuple[int, Dict]]]" = OrderedDict()
+    for number, edit in enumerate(edits, 1):
+        # realpath: con un enlace simbólico se reemplaza el archivo real, no el enlace
+        grouped.setdefault(os.path.realpath(edit["file_path"]), []).append((number, edit))
+
+    plan = []
+    for path, file_edits in grouped.items():
+        display = file_edits[0][1]["file_path"]
+        stamp = _file_stamp(path)
+        if stamp is None or not os.path.isfile(path):
+            raise ValueError(f"{display}: archivo no encontrado")
+        original = Path(path).read_bytes()
+        try:
+            content = original.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ValueError(f"{display}: no es texto UTF-8")
+
+        spans = sorted(span for number, edit in file_edits for span in _edit_spans(content, edit, number))
+        parts, position = [], 0
+        for start, end, new in spans:
+            if start < position:
+                raise ValueError(f"{display}: dos edits se solapan en la posición {start}")
+            parts += [content[position:start], new]
+            position = end
+        parts.append(content[position:])
+        plan.append(_PlannedFile(path, display, original, "".join(parts).encode('utf-8'), stamp, len(spans)))
+    return plan
+
+def _replace_file(path: str, data: bytes) -> str:
+    """Escribe data en un temporal junto a path; devuelve el temporal listo para os.replace"""
+    directory, name = os.path.split(path)
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.chmod(temp, os.stat(path).st_mode & 0o7777)
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return temp
+
+def _commit_multi_edit(plan: List[_PlannedFile]):
+    """Escribe todos los temporales y después los renombra; ante un fallo restaura los originales"""
+    temps: Dict[str, str] = {}
+    committed: List[_PlannedFile] = []
+    try:
+        for file in plan:
+            temps[file.path] = _replace_file(file.path, file.updated)
+        for file in plan:
+            if _file_stamp(file.path) != file.stamp:
+                raise RuntimeError(f"{file.display} cambió mientras se editaba")
+        for file in plan:
+            os.replace(temps[file.path], file.path)
+            del temps[file.path]
+            committed.append(file)
+    except BaseException:
+        for file in reversed(committed):
+            try:
+                os.replace(_replace_file(file.path, file.original), file.path)
+            except OSError:
+                pass  # Se intenta restaurar el resto aunque uno falle
+        raise
+    finally:
+        for temp in temps.values():
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ÍNDICE DE LÍNEAS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class LineIndex:
+    """Desplazamientos de inicio de línea (uno cada BLOCK líneas) para leer ventanas con mmap"""
+
+    BLOCK = 64
+    _BLOCK_REGEX = re.compile(rb'(?:[^\n]*\n){%d}' % BLOCK)
+
+    def __init__(self, path: str):
+        self.path = path
+        stat = os.stat(path)
+        self.mtime_ns, self.size = stat.st_mtime_ns, stat.st_size
+        self.offsets = array('Q', [0])  # offsets[i] = byte donde empieza la línea i * BLOCK
+        self.line_count = 0
+        if self.size == 0:
+            return
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            self.offsets.extend(match.end() for match in self._BLOCK_REGEX.finditer(data))
+            last = self.offsets[-1]
+            tail = data[last:]
+        self.line_count = (len(self.offsets) - 1) * self.BLOCK + tail.count(b'\n')
+        if tail and not tail.endswith(b'\n'):
+            self.line_count += 1
+        elif not tail and len(self.offsets) > 1:
+            self.offsets.pop()  # El archivo termina justo en un bloque: no hay línea ahí
+
+    def is_current(self) -> bool:
+        """Sigue siendo válido si el archivo no cambió desde que se construyó"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+    def read_lines(self, offset: int, limit: int) -> List[str]:
+        """Devuelve las líneas [offset, offset + limit) leyendo solo esa zona del archivo"""
+        if offset >= self.line_count or limit <= 0:
+            return []
+        block = min(offset // self.BLOCK, len(self.offsets) - 1)
+        lines = []
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = self.offsets[block]
+            for _ in range(offset - block * self.BLOCK):
+                pos = data.find(b'\n', pos) + 1
+            while len(lines) < limit and pos < self.size:
+                end = data.find(b'\n', pos)
+                end = self.size if end == -1 else end
+                lines.append(data[pos:end].rstrip(b'\r').decode('utf-8', errors='replace'))
+                pos = end + 1
+        return lines
+
+_line_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+_line_indexes_lock = threading.Lock()
+LINE_INDEX_CACHE_SIZE = 32
+
+def get_line_index(path: str) -> LineIndex:
+    """Índice de líneas cacheado del archivo; se reconstruye si cambió su mtime o tamaño"""
+    key = os.path.abspath(path)
+    with _line_indexes_lock:
+        index = _line_indexes.get(key)
+        if index is not None and index.is_current():
+            _line_indexes.move_to_end(key)
+            return index
+    index = LineIndex(key)
+    with _line_indexes_lock:
+        _line_indexes[key] = index
+        _line_indexes.move_to_end(key)
+        while len(_line_indexes) > LINE_INDEX_CACHE_SIZE:
+            _line_indexes.popitem(last=False)
+    return index
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RECORRIDO DEL PROYECTO
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _compile_glob(pattern: str, recursive: bool = False) -> re.Pattern:
+    """Traduce un patrón glob (con soporte de **) a una regex sobre rutas relativas con /"""
+    parts = []
+    for component in pattern.replace('\\', '/').split('/'):
+        if component == '**':
+            parts.append(None)
+            continue
+        regex, i = "", 0
+        while i < len(component):
+            char = component[i]
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            elif char == '[' and ']' in component[i + 2:]:
+                end = component.index(']', i + 2)
+                body = component[i + 1:end]
+                regex += '[' + ('^' + body[1:] if body.startswith('!') else body) + ']'
+                i = end
+            else:
+                regex += re.escape(char)
+            i += 1
+        parts.append(regex)
+
+    # Como Path.rglob: el patrón puede empezar en cualquier subdirectorio
+    if recursive and parts and parts[0] is not None:
+        parts.insert(0, None)
+
+    result = ""
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part is None:
+            result += '.*' if last else '(?:[^/]+/)*'
+        else:
+            result += part + ('' if last else '/')
+    return re.compile(result + r'\Z', re.DOTALL)
+
+class GitIgnore:
+    """Reglas de los .gitignore encontrados durante el recorrido"""
+
+    def __init__(self, offset: str = ""):
+        self.rules: List[Tuple[str, re.Pattern, bool, bool]] = []  # (directorio, regex, negada, solo_dirs)
+        self.offset = offset  # Directorio recorrido, relativo a la raíz del proyecto
+
+    def load(self, dir_abs: str, dir_rel: str):
+        """Agrega las reglas del .gitignore de un directorio (dir_rel relativo a la raíz del proyecto)"""
+        try:
+            with open(os.path.join(dir_abs, ".gitignore"), encoding='utf-8', errors='replace') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        base = dir_rel + "/" if dir_rel else ""
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            line = line[1:] if negated else line
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            # Sin / intermedia la regla aplica a cualquier nivel; con / está anclada
+            anchored = '/' in line
+            if not line.lstrip('/'):
+                continue
+            self.rules.append((base, _compile_glob(line.lstrip('/'), recursive=not anchored), negated, dir_only))
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        """La última regla que coincide decide, como en git (rel relativo al directorio recorrido)"""
+        rel = f"{self.offset}/{rel}" if self.offset else rel
+        result = False
+        for base, regex, negated, dir_only in self.rules:
+            if (dir_only and not is_dir) or not rel.startswith(base):
+                continue
+            if regex.match(rel[len(base):]):
+                result = not negated
+        return result
+
+def _ignored_dir(rel: str) -> bool:
+    """Indica si una ruta relativa atraviesa alguno de los directorios ignorados"""
+    parts = rel.split('/')
+    return any(part in IGNORE_DIRS for part in parts) or \
+        any('/'.join(parts[:i]) in IGNORE_DIRS for i in range(2, len(parts)))
+
+def _git_files(dir_abs: str) -> Optional[List[str]]:
+    """Archivos versionados y no ignorados según el índice de git, o None fuera de un repo"""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=dir_abs, capture_output=True, timeout=30
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return [p for p in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if p]
+
+def _ancestor_gitignore(root: str, start: str) -> Optional[GitIgnore]:
+    """Reglas de los .gitignore desde la raíz del proyecto hasta start, excluido
+
+    La raíz es el directorio actual si contiene a root. Devuelve None si start o alguno
+    de sus ancestros está ignorado, porque entonces no hay nada que recorrer.
+    """
+    project = os.path.abspath(".")
+    if root != project and not root.startswith(project.rstrip(os.sep) + os.sep):
+        project = root
+    offset = os.path.relpath(root, project).replace(os.sep, '/')
+    offset = "" if offset == "." else offset
+    chain = [part for part in f"{offset}/{start}".split('/') if part]
+    gitignore = GitIgnore()
+    for depth in range(len(chain)):
+        rel = '/'.join(chain[:depth])
+        if rel and gitignore.ignored(rel, True):
+            return None
+        gitignore.load(os.path.join(project, rel), rel)
+    if chain and gitignore.ignored('/'.join(chain), True):
+        return None
+    gitignore.offset = offset
+    return gitignore
+
+def _walk_tree(root: str, start: str, max_depth: Optional[int]) -> Iterator[str]:
+    """Recorrido con scandir que poda los directorios ignorados antes de entrar en ellos"""
+    gitignore = None
+    if GITIGNORE:
+        gitignore = _ancestor_gitignore(root, start)
+        if gitignore is None:
+            return
+    stack = [start]
+    while stack:
+        rel_dir = stack.pop()
+        dir_abs = os.path.join(root, rel_dir)
+        if gitignore:
+            gitignore.load(dir_abs, '/'.join(part for part in (gitignore.offset, rel_dir) if part))
+        try:
+            with os.scandir(dir_abs) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        depth = rel_dir.count('/') + 1 if rel_dir else 0
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in IGNORE_DIRS or rel in IGNORE_DIRS:
+                    continue
+                if max_depth is not None and depth + 1 >= max_depth:
+                    continue
+                if gitignore and gitignore.ignored(rel, True):
+                    continue
+                subdirs.append(rel)
+            elif not (gitignore and gitignore.ignored(rel, False)):
+                yield rel
+        stack.extend(reversed(subdirs))
+
+def walk_files(base: str = ".", pattern: Optional[str] = None, recursive: bool = False) -> Iterator[str]:
+    """Rutas (relativas a base, con /) de los archivos del proyecto no ignorados que cumplen el patrón
+
+    Con recursive=True el patrón puede coincidir en cualquier nivel (como Path.rglob).
+    Usa el índice de git cuando está disponible y si no recorre el árbol respetando .gitignore.
+    """
+    root = os.path.abspath(base)
+    matcher = _compile_glob(pattern, recursive) if pattern else None
+
+    # Los componentes literales iniciales del patrón acotan dónde empezar a recorrer
+    start, max_depth = "", None
+    if pattern and not recursive:
+        parts = pattern.replace('\\', '/').split('/')
+        literal = []
+        for part in parts[:-1]:
+            if any(c in part for c in '*?['):
+                break
+            literal.append(part)
+        start = '/'.join(literal)
+        if '**' not in parts:
+            max_depth = len(parts)
+
+    rels: Optional[Iterator[str]] = None
+    if GITIGNORE:
+        listed = _git_files(os.path.join(root, start)) if os.path.isdir(os.path.join(root, start)) else None
+        if listed is not None:
+            prefix = start + "/" if start else ""
+            rels = (prefix + rel for rel in listed
+                    if max_depth is None or (prefix + rel).count('/') < max_depth)
+    if rels is None:
+        rels = _walk_tree(root, start, max_depth)
+
+    for rel in rels:
+        if _ignored_dir(rel):
+            continue
+        if matcher is None or matcher.match(rel):
+            yield rel
+
+# ═══════════════════════════════════════════════════════════════════════════
+# MOTOR DE BÚSQUEDA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _search_buffer(data, display: str, regex: re.Pattern, output_mode: str,
+                   context_lines: int, limit: int, matches: List[str]):
+    """Busca en un buffer (mmap en bytes o texto decodificado) con la misma semántica línea a línea de grep
+
+    count agrega una entrada archivo:N con las líneas que coinciden, como grep -c.
+    """
+    if output_mode == "files_with_matches":
+        if regex.search(data):
+            matches.append(display)
+        return
+    if output_mode not in ("content", "count"):
+        return
+
+    binary = not isinstance(data, str)
+    newline, cr = (b'\n', b'\r') if binary else ('\n', '\r')
+
+    def text(chunk) -> str:
+        return chunk.decode('utf-8', errors='replace') if binary else chunk
+
+    size = len(data)
+    pos = 0
+    line_no, counted = 1, 0  # line_no es el número de línea de la posición counted
+    lines_matched = 0
+    while (output_mode == "count" or len(matches) < limit) and pos <= size:
+        found = regex.search(data, pos)
+        if not found:
+            break
+        start = data.rfind(newline, 0, found.start()) + 1
+        end = data.find(newline, found.start())
+        end = size if end == -1 else end
+        pos = end + 1
+
+        # La búsqueda sobre el buffer puede cruzar líneas: se confirma en la línea aislada
+        line = data[start:end].rstrip(cr)
+        if not regex.search(line):
+            continue
+        if output_mode == "count":
+            lines_matched += 1
+            continue
+
+        line_no += data[counted:start].count(newline)
+        counted = start
+
+        if context_lines > 0:
+            ctx_start, ctx_end = start, end
+            for _ in range(context_lines):
+                if ctx_start == 0:
+                    break
+                ctx_start = data.rfind(newline, 0, ctx_start - 1) + 1
+            for _ in range(context_lines):
+                if ctx_end >= size:
+                    break
+                next_end = data.find(newline, ctx_end + 1)
+                ctx_end = size if next_end == -1 else next_end
+            block = text(data[ctx_start:ctx_end])
+            matches.append(f"{display}:{line_no}:\n" + "\n".join(block.splitlines()))
+        else:
+            matches.append(f"{display}:{line_no}: {text(line)}")
+    if lines_matched:
+        matches.append(f"{display}:{lines_matched}")
+
+def _bytes_pattern(pattern: str, flags: int) -> Optional[bytes]:
+    """Patrón en bytes cuando es un texto literal; entonces buscar sin decodificar da el mismo resultado
+
+    Con metacaracteres o flags (también en línea, como (?i)) no: en bytes . y [^x] coinciden
+    con medio carácter UTF-8, y \\w, \\b y las mayúsculas dejan de reconocer letras acentuadas.
+    """
+    try:
+        if re.compile(pattern, flags).flags != re.UNICODE:
+            return None
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if not all(op is sre_parse.LITERAL for op, _ in parsed):
+        return None
+    return re.escape("".join(chr(av) for _, av in parsed)).encode('utf-8')
+
+def _search_chunk(paths: List[str], pattern, flags: int, output_mode: str,
+                  context_lines: int, limit: int, max_bytes: int) -> SearchResult:
+    """Busca en un grupo de archivos; se ejecuta en un proceso del pool
+
+    Con un patrón str cada archivo se decodifica antes de buscar (mayúsculas y \\w Unicode).
+    """
+    regex = re.compile(pattern, flags | re.MULTILINE)
+    result = SearchResult(matches=[])
+    for display in paths:
+        if len(result.matches) >= limit:
+            result.truncated = True
+            break
+        try:
+            with open(display, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > max_bytes:
+                    result.large += 1
+                    continue
+                result.scanned += 1
+                if size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if data.find(b'\0', 0, 8192) != -1:
+                        result.scanned -= 1
+                        result.binary += 1
+                        continue
+                    buffer = data if isinstance(pattern, bytes) else data[:].decode('utf-8', errors='replace')
+                    _search_buffer(buffer, display, regex, output_mode, context_lines, limit, result.matches)
+        except (OSError, ValueError):
+            result.unreadable += 1
+    return result
+
+_search_pool: Optional[ProcessPoolExecutor] = None
+_search_pool_lock = threading.Lock()
+
+def _get_search_pool() -> ProcessPoolExecutor:
+    """Pool de procesos de búsqueda, creado al primer uso y reutilizado entre llamadas"""
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            # spawn evita heredar locks de los hilos del planificador al hacer fork
+            _search_pool = ProcessPoolExecutor(max_workers=GREP_WORKERS,
+                                               mp_context=multiprocessing.get_context("spawn"))
+        return _search_pool
+
+def _reset_search_pool():
+    """Descarta un pool roto; el siguiente uso crea uno nuevo"""
+    global _search_pool
+    with _search_pool_lock:
+        _search_pool = None
+
+def search_files(files, pattern: str, flags: int = 0, output_mode: str = "files_with_matches",
+                 context_lines: int = 0, max_results: int = GREP_MAX_RESULTS,
+                 chunk_size: int = 64) -> SearchResult:
+    """Busca la regex en los archivos repartiéndolos entre procesos y se detiene al llegar al límite"""
+    encoded = _bytes_pattern(pattern, flags) or pattern
+    total = SearchResult(matches=[])
+    paths = [str(f) for f in files]
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+
+    def merge(partial: SearchResult) -> bool:
+        """Acumula un resultado parcial; devuelve True al alcanzar el límite"""
+        total.matches.extend(partial.matches)
+        total.scanned += partial.scanned
+        total.binary += partial.binary
+        total.large += partial.large
+        total.unreadable += partial.unreadable
+        if len(total.matches) >= max_results:
+            del total.matches[max_results:]
+            total.truncated = True
+        return total.truncated
+
+    args = (encoded, flags, output_mode, context_lines, max_results, GREP_MAX_BYTES)
+
+    # Pocos archivos: el coste de repartir supera al de buscar
+    if GREP_WORKERS <= 1 or len(chunks) <= 2:
+        for chunk in chunks:
+            if merge(_search_chunk(chunk, *args)):
+                break
+        return total
+
+    pool = _get_search_pool()
+    pending: deque = deque()
+    next_chunk = 0
+    try:
+        while next_chunk < len(chunks) or pending:
+            # Mantener un número acotado de tareas en vuelo para poder cortar pronto
+            while next_chunk < len(chunks) and len(pending) < GREP_WORKERS * 2:
+                pending.append(pool.submit(_search_chunk, chunks[next_chunk], *args))
+                next_chunk += 1
+            if merge(pending.popleft().result()):
+                break
+    except BrokenProcessPool:
+        _reset_search_pool()
+        return search_files(paths, pattern, flags, output_mode, context_lines, max_results, len(paths) + 1)
+    finally:
+        for future in pending:
+            future.cancel()
+    return total
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ÍNDICE DE TRIGRAMAS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _regex_trigrams(pattern: str) -> set:
+    """Trigramas (ASCII, en minúsculas) que toda coincidencia de la regex debe contener"""
+    runs: List[str] = []
+
+    def flush(current: List[str]):
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    def walk(parsed, current: List[str]):
+        for op, av in parsed:
+            if op is sre_parse.LITERAL:
+                current.append(chr(av))
+            elif op is sre_parse.AT:
+                continue  # anclas de ancho cero: no rompen la secuencia
+            elif op is sre_parse.SUBPATTERN:
+                walk(av[-1], current)
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                flush(current)
+                low, _, item = av
+                if low >= 1:
+                    inner: List[str] = []
+                    walk(item, inner)
+                    flush(inner)
+            else:
+                flush(current)
+
+    current: List[str] = []
+    walk(sre_parse.parse(pattern), current)
+    flush(current)
+
+    trigrams = set()
+    for run in runs:
+        data = run.encode('utf-8').lower()
+        for a, b, c in zip(data, data[1:], data[2:]):
+            if a < 0x80 and b < 0x80 and c < 0x80:
+                trigrams.add(a << 16 | b << 8 | c)
+    return trigrams
+
+class TrigramIndex:
+    """Índice invertido de trigramas del proyecto, persistido en disco y actualizado por mtime/tamaño"""
+
+    VERSION = 2
+    MAX_FILE_BYTES = 2 * 1024 * 1024  # Archivos mayores no se indexan: siempre son candidatos
+    FRESH_SECONDS = 1.0  # Un refresh así de reciente se reutiliza en lugar de volver a recorrer
+
+    def __init__(self, root: str = ".", index_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or os.path.join(self.root, CACHE_DIR, "trigrams.bin")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._files: Dict[str, Tuple[int, int, int]] = {}  # ruta relativa -> (id, mtime_ns, tamaño)
+        self._paths: List[Optional[str]] = []  # id -> ruta relativa (None = eliminado)
+        self._postings: Dict[int, array] = {}  # trigrama -> ids de archivos
+        self._unindexed: set = set()
+        self.token: Optional[str] = None  # Cambia cada vez que refresh encuentra un archivo distinto
+        self._refreshed = float("-inf")
+
+    def _load(self):
+        """Lee el índice: una línea JSON de metadatos y tres arrays de enteros (sin pickle: el
+        archivo vive dentro del proyecto y un repositorio clonado podría traerlo preparado)"""
+        self._loaded = True
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header['version'] != self.VERSION or header['root'] != self.root or \
+                        header['byteorder'] != sys.byteorder:
+                    return
+                keys, counts, ids = array('I'), array('I'), array('I')
+                keys.fromfile(f, header['keys'])
+                counts.fromfile(f, header['keys'])
+                ids.fromfile(f, header['ids'])
+            if sum(counts) != len(ids):
+                return
+            paths = header['paths']
+            files = {rel: (int(entry[0]), int(entry[1]), int(entry[2])) for rel, entry in header['files'].items()}
+            if not all(isinstance(path, (str, type(None))) for path in paths) or \
+                    any(not 0 <= entry[0] < len(paths) for entry in files.values()) or \
+                    (ids and max(ids) >= len(paths)):
+                return
+            postings, offset = {}, 0
+            for key, count in zip(keys, counts):
+                postings[key] = ids[offset:offset + count]
+                offset += count
+            self._files, self._paths, self._postings = files, paths, postings
+            self._unindexed = {rel for rel in header['unindexed'] if isinstance(rel, str)}
+        except (OSError, EOFError, KeyError, TypeError, ValueError, IndexError, AttributeError):
+            pass  # Índice ausente o corrupto: se reconstruye desde cero
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        keys = array('I', self._postings)
+        counts = array('I', (len(posting) for posting in self._postings.values()))
+        ids = array('I')
+        for posting in self._postings.values():
+            ids.extend(posting)
+        header = {"version": self.VERSION, "root": self.root, "byteorder": sys.byteorder,
+                  "files": self._files, "paths": self._paths, "unindexed": sorted(self._unindexed),
+                  "keys": len(keys), "ids": len(ids)}
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+            keys.tofile(f)
+            counts.tofile(f)
+            ids.tofile(f)
+        os.replace(temp_path, self.index_path)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Recorre el proyecto y devuelve (mtime_ns, tamaño) de cada archivo"""
+        found = {}
+        for rel in walk_files(self.root):
+            try:
+                stat = os.stat(os.path.join(self.root, rel))
+            except OSError:
+                continue
+            found[rel] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def _add(self, rel: str, mtime: int, size: int):
+        file_id = len(self._paths)
+        self._paths.append(rel)
+        self._files[rel] = (file_id, mtime, size)
+        if size > self.MAX_FILE_BYTES:
+            self._unindexed.add(rel)
+            return
+        try:
+            with open(os.path.join(self.root, rel), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if b'\0' in data[:8192]:
+            return  # Binario: grep nunca lo devuelve
+        data = data.lower()
+        for a, b, c in set(zip(data, data[1:], data[2:])):
+            key = a << 16 | b << 8 | c
+            posting = self._postings.get(key)
+            if posting is None:
+                self._postings[key] = array('I', (file_id,))
+            else:
+                posting.append(file_id)
+
+    def _remove(self, rel: str):
+        file_id = self._files.pop(rel)[0]
+        self._paths[file_id] = None
+        self._unindexed.discard(rel)
+
+    def _compact(self):
+        """Renumera los archivos vivos y descarta los ids eliminados de las listas"""
+        remap = {}
+        paths = []
+        for old_id, rel in enumerate(self._paths):
+            if rel is not None:
+                remap[old_id] = len(paths)
+                paths.append(rel)
+        postings = {}
+        for key, posting in self._postings.items():
+            live = array('I', (remap[i] for i in posting if i in remap))
+            if live:
+                postings[key] = live
+        self._paths = paths
+        self._postings = postings
+        self._files = {rel: (remap[entry[0]], entry[1], entry[2]) for rel, entry in self._files.items()}
+
+    def refresh(self):
+        """Reindexa solo los archivos nuevos, modificados o eliminados"""
+        found = self._scan()
+        changed = False
+        for rel in [rel for rel in self._files if rel not in found]:
+            self._remove(rel)
+            changed = True
+        for rel, (mtime, size) in found.items():
+            entry = self._files.get(rel)
+            if entry is not None and entry[1] == mtime and entry[2] == size:
+                continue
+            if entry is not None:
+                self._remove(rel)
+            self._add(rel, mtime, size)
+            changed = True
+        if len(self._paths) > 2 * len(self._files):
+            self._compact()
+        if changed:
+            self._save()
+        if changed or self.token is None:
+            self.token = uuid.uuid4().hex
+        self._refreshed = time.monotonic()
+
+    def stamp(self) -> str:
+        """Sello del árbol para la caché de glob/grep: reutiliza el recorrido de refresh"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self.refresh()
+            return self.token
+
+    def candidates(self, pattern: str, base_path: Path, glob_pattern: str = "*") -> Optional[List[Path]]:
+        """Archivos que pueden contener la regex, o None si el índice no puede acotar la búsqueda"""
+        base_abs = os.path.abspath(base_path)
+        if base_abs != self.root and not base_abs.startswith(self.root + os.sep):
+            return None
+        trigrams = _regex_trigrams(pattern)
+        if not trigrams:
+            return None
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            # execute_tool acaba de tomar el sello con stamp(): no hace falta recorrer otra vez
+            if time.monotonic() - self._refreshed > self.FRESH_SECONDS:
+                self.refresh()
+
+            ids = None
+            for key in sorted(trigrams, key=lambda k: len(self._postings.get(k, ()))):
+                ids = set(self._postings.get(key, ())) if ids is None else ids.intersection(self._postings.get(key, ()))
+                if not ids:
+                    break
+            rels = [self._paths[i] for i in ids or ()]
+            rels = [rel for rel in rels if rel is not None] + sorted(self._unindexed)
+
+        base_rel = os.path.relpath(base_abs, self.root).replace(os.sep, '/')
+        prefix = "" if base_rel == "." else base_rel + "/"
+        matcher = _compile_glob(glob_pattern, recursive=True)
+        return [base_path / rel[len(prefix):] for rel in sorted(rels)
+                if rel.startswith(prefix) and matcher.match(rel[len(prefix):])]
+
+_grep_index: Optional[TrigramIndex] = None
+_grep_index_lock = threading.Lock()
+
+def get_grep_index() -> TrigramIndex:
+    """Índice de trigramas del directorio de trabajo (se crea al primer uso)"""
+    global _grep_index
+    with _grep_index_lock:
+        if _grep_index is None or _grep_index.root != os.path.abspath("."):
+            _grep_index = TrigramIndex(".")
+        return _grep_index
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ÍNDICE SEMÁNTICO
+# ═══════════════════════════════════════════════════════════════════════════
+
+SEMANTIC_EXTENSIONS = ('.php', '.js', '.ts', '.jsx', '.tsx', '.vue')  # Incluye las vistas .blade.php
+
+def _numpy():
+    """NumPy es opcional: solo lo necesita el índice semántico"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("El índice semántico necesita numpy: pip install numpy") from None
+    return numpy
+
+def _chunk_source(text: str, lines_per_chunk: int = 40, overlap: int = 10) -> List[Tuple[int, int, str]]:
+    """Divide un archivo en fragmentos solapados de líneas: (primera, última, texto)"""
+    lines = text.splitlines()
+    chunks = []
+    for start in range(0, len(lines), lines_per_chunk - overlap):
+        body = "\n".join(lines[start:start + lines_per_chunk])
+        if body.strip():
+            chunks.append((start + 1, min(start + lines_per_chunk, len(lines)), body[:4000]))
+        if start + lines_per_chunk >= len(lines):
+            break
+    return chunks
+
+class SemanticIndex:
+    """Embeddings de fragmentos del código (PHP, Blade, JS) con búsqueda top-k por similitud coseno
+
+    Los vectores normalizados viven en un memmap de NumPy (vectors.f32) y los metadatos en un
+    JSON (nunca pickle: el índice vive dentro del proyecto). Solo se vuelven a embeber los
+    archivos cuyo mtime/tamaño cambió; las filas de los archivos modificados quedan libres
+    hasta que una compactación reescribe la matriz.
+    """
+
+    VERSION = 2
+    BATCH = 32  # Fragmentos por petición de embeddings
+    FILES_PER_SAVE = 64  # Una construcción interrumpida conserva lo ya embebido
+    MAX_FILE_BYTES = 512 * 1024
+
+    def __init__(self, root: str = ".", model: str = EMBED_MODEL, index_dir: Optional[str] = None, client=None):
+        self.root = os.path.abspath(root)
+        self.model = model
+        self.index_dir = index_dir or os.path.join(self.root, CACHE_DIR, "semantic")
+        self._client = client
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._files: Dict[str, Tuple[int, int, List[int]]] = {}  # ruta relativa -> (mtime_ns, tamaño, filas)
+        self._chunks: List[Optional[Tuple[str, int, int]]] = []  # fila -> (ruta, primera, última); None = libre
+        self._dims = 0
+        self._vectors = None  # memmap (capacidad, dims) float32
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "meta.json")
+
+    def _open_vectors(self, capacity: int):
+        np = _numpy()
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self._dims))
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with open(self._meta_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data['version'] != self.VERSION or data['root'] != self.root or data['model'] != self.model:
+                return
+            self._files = {rel: (int(mtime), int(size), [int(row) for row in rows])
+                           for rel, (mtime, size, rows) in data['files'].items()}
+            self._chunks = [None if chunk is None else (str(chunk[0]), int(chunk[1]), int(chunk[2]))
+                            for chunk in data['chunks']]
+            self._dims = int(data['dims'])
+            capacity = os.path.getsize(self._vectors_path) // (4 * self._dims) if self._dims else 0
+            if len(self._chunks) > capacity or \
+                    any(not 0 <= row < len(self._chunks) for _, _, rows in self._files.values() for row in rows):
+                raise ValueError("metadatos inconsistentes con la matriz")
+            if capacity:
+                self._open_vectors(capacity)
+        except (OSError, KeyError, TypeError, ValueError, IndexError, AttributeError):
+            # Índice ausente o corrupto: se reconstruye desde cero
+            self._files, self._chunks, self._dims, self._vectors = {}, [], 0, None
+
+    def _save(self):
+        if self._vectors is not None:
+            self._vectors.flush()  # Primero los vectores: los metadatos nunca apuntan a filas sin escribir
+        os.makedirs(self.index_dir, exist_ok=True)
+        temp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "root": self.root, "model": self.model,
+                       "files": self._files, "chunks": self._chunks, "dims": self._dims}, f, ensure_ascii=False)
+        os.replace(temp_path, self._meta_path)
+
+    def _embed(self, texts: List[str]):
+        """Embeddings normalizados (filas de norma 1) de los textos"""
+        np = _numpy()
+        client = self._client or (ollama_pool.client_for(self.model) if ollama_pool else ollama)
+        vectors = []
+        for i in range(0, len(texts), self.BATCH):
+            vectors.extend(client.embed(model=self.model, input=texts[i:i + self.BATCH])['embeddings'])
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def _append(self, matrix) -> List[int]:
+        """Agrega filas al memmap, duplicando su capacidad cuando se llena; devuelve sus números"""
+        if not self._dims:
+            self._dims = matrix.shape[1]
+            os.makedirs(self.index_dir, exist_ok=True)
+            open(self._vectors_path, 'wb').close()
+            self._vectors = None
+        capacity = len(self._vectors) if self._vectors is not None else 0
+        first = len(self._chunks)
+        needed = first + len(matrix)
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity, 1024)
+            self._vectors = None  # Se cierra el memmap antes de ampliar el archivo
+            with open(self._vectors_path, 'r+b') as f:
+                f.truncate(capacity * self._dims * 4)
+            self._open_vectors(capacity)
+        self._vectors[first:needed] = matrix
+        return list(range(first, needed))
+
+    def _compact(self):
+        """Reescribe la matriz solo con las filas vivas"""
+        np = _numpy()
+        live = [row for row, chunk in enumerate(self._chunks) if chunk is not None]
+        remap = {old: new for new, old in enumerate(live)}
+        matrix = np.array(self._vectors[live]) if live else np.zeros((0, self._dims), dtype=np.float32)
+        self._chunks = [self._chunks[row] for row in live]
+        self._files = {rel: (mtime, size, [remap[row] for row in rows])
+                       for rel, (mtime, size, rows) in self._files.items()}
+        self._vectors = None
+        temp_path = f"{self._vectors_path}.{os.getpid()}.tmp"
+        matrix.tofile(temp_path)
+        os.replace(temp_path, self._vectors_path)
+        if live:
+            self._open_vectors(len(live))
+        self._save()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found = {}
+        for rel in walk_files(self.root):
+            if not rel.endswith(SEMANTIC_EXTENSIONS):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, rel))
+            except OSError:
+                continue
+            if stat.st_size <= self.MAX_FILE_BYTES:
+                found[rel] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def refresh(self) -> int:
+        """Embebe los archivos nuevos o modificados; devuelve cuántos fragmentos calculó"""
+        found = self._scan()
+        changed = [rel for rel in self._files if self._files[rel][:2] != found.get(rel)]
+        for rel in changed:
+            for row in self._files.pop(rel)[2]:
+                self._chunks[row] = None
+        pending = [rel for rel in found if rel not in self._files]
+
+        embedded = 0
+        for i in range(0, len(pending), self.FILES_PER_SAVE):
+            texts, owners = [], []
+            batch: Dict[str, Tuple[int, int, List[int]]] = {}
+            for rel in pending[i:i + self.FILES_PER_SAVE]:
+                try:
+                    with open(os.path.join(self.root, rel), encoding='utf-8', errors='replace') as f:
+                        chunks = _chunk_source(f.read())
+                except OSError:
+                    continue
+                batch[rel] = (*found[rel], [])
+                for start, end, body in chunks:
+                    # La ruta en el texto ayuda a encontrar "el controlador de usuarios"
+                    texts.append(f"{rel}\n{body}")
+                    owners.append((rel, start, end))
+            if texts:
+                rows = self._append(self._embed(texts))
+                for row, owner in zip(rows, owners):
+                    self._chunks.append(owner)
+                    batch[owner[0]][2].append(row)
+                embedded += len(texts)
+            # Solo ahora cuentan como indexados: si el embedding falla se reintentan en la próxima búsqueda
+            self._files.update(batch)
+            self._save()
+
+        if changed and not pending:
+            self._save()
+        free = sum(1 for chunk in self._chunks if chunk is None)
+        if free and free * 2 > len(self._chunks):
+            self._compact()
+        return embedded
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """Los `limit` fragmentos más parecidos a la consulta, con su texto actual"""
+        np = _numpy()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self.refresh()
+            rows = len(self._chunks)
+            live = [row for row in range(rows) if self._chunks[row] is not None]
+            if not live:
+                return []
+            scores = np.asarray(self._vectors[:rows] @ self._embed([query])[0])
+            scores[[row for row in range(rows) if self._chunks[row] is None]] = -np.inf
+            k = min(limit, len(live))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = [(self._chunks[row], float(scores[row])) for row in top]
+
+        results = []
+        for (rel, start, end), score in hits:
+            try:
+                with open(os.path.join(self.root, rel), encoding='utf-8', errors='replace') as f:
+                    lines = f.read().splitlines()[start - 1:end]
+            except OSError:
+                continue
+            results.append({"path": rel, "start": start, "end": end, "score": score, "text": "\n".join(lines)})
+        return results
+
+_semantic_index: Optional[SemanticIndex] = None
+_semantic_index_lock = threading.Lock()
+
+def get_semantic_index() -> SemanticIndex:
+    """Índice semántico del directorio de trabajo (se crea al primer uso)"""
+    global _semantic_index
+    with _semantic_index_lock:
+        if _semantic_index is None or _semantic_index.root != os.path.abspath("."):
+            _semantic_index = SemanticIndex(".")
+        return _semantic_index
+
+def format_snippets(snippets: List[Dict]) -> str:
+    return "\n\n".join(f"{s['path']}:{s['start']}-{s['end']} (similitud {s['score']:.2f})\n```\n{s['text']}\n```"
+                       for s in snippets)
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ÍNDICE DE SÍMBOLOS PHP
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Comentarios, cadenas y heredocs: se vacían para que sus llaves y palabras no cuenten
+_PHP_NOISE = re.compile(r"""//[^\n]*|\#(?!\[)[^\n]*|/\*.*?\*/|'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|"""
+                        r"""<<<[ \t]*['"]?(\w+)['"]?\n.*?\n[ \t]*\1\b""", re.S)
+_PHP_TOKEN = re.compile(r"""(?P<open>\{)|(?P<close>\})"""
+                        r"""|\bnamespace\s+(?P<namespace>[\w\\]+)"""
+                        r"""|(?<![\w$:>])(?P<kind>class|interface|trait|enum)\s+(?P<type>\w+)"""
+                        r"""|\bfunction\s+&?\s*(?P<function>\w+)\s*\(""")
+_PHP_TYPES = ("class", "interface", "trait", "enum")
+
+def _blank_php_noise(match: re.Match) -> str:
+    text = match.group()
+    blank = "''" if text[0] in "'\"<" else " "
+    return blank + "\n" * text.count("\n")  # Se conservan los saltos para numerar las líneas
+
+def parse_php_symbols(source: str) -> List[Tuple[str, str, str, Optional[str], int, str]]:
+    """Declaraciones de un archivo PHP: (tipo, nombre, nombre completo, clase contenedora, línea, firma)"""
+    lines = source.splitlines()
+    code = _PHP_NOISE.sub(_blank_php_noise, source)
+    symbols = []
+    namespace = ""
+    depth = 0
+    types: List[Tuple[str, int]] = []  # Clases abiertas: (nombre completo, profundidad de su cuerpo)
+    pending: Optional[str] = None  # Clase declarada cuyo cuerpo aún no se abrió
+    line, position = 1, 0
+
+    for match in _PHP_TOKEN.finditer(code):
+        line += code.count("\n", position, match.start())
+        position = match.start()
+        if match.group("open"):
+            depth += 1
+            if pending:
+                types.append((pending, depth))
+                pending = None
+        elif match.group("close"):
+            if types and types[-1][1] == depth:
+                types.pop()
+            depth = max(depth - 1, 0)
+        elif match.group("namespace"):
+            namespace = match.group("namespace").strip("\\")
+        elif match.group("kind"):
+            name = match.group("type")
+            if name in ("extends", "implements") or code[max(0, match.start() - 8):match.start()].rstrip().endswith("new"):
+                continue  # Clase anónima
+            fqn = f"{namespace}\\{name}" if namespace else name
+            pending = fqn
+            symbols.append((match.group("kind"), name, fqn, None, line, lines[line - 1].strip()[:200]))
+        else:
+            name = match.group("function")
+            signature = lines[line - 1].strip()[:200] if line <= len(lines) else ""
+            if types and types[-1][1] == depth:
+                symbols.append(("method", name, f"{types[-1][0]}::{name}", types[-1][0], line, signature))
+            elif not types:
+                fqn = f"{namespace}\\{name}" if namespace else name
+                symbols.append(("function", name, fqn, None, line, signature))
+    return symbols
+
+def _parse_php_chunk(root: str, entries: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int, List]]:
+    """Analiza un grupo de archivos (se ejecuta en el pool de procesos)"""
+    parsed = []
+    for rel, mtime, size in entries:
+        try:
+            with open(os.path.join(root, rel), encoding='utf-8', errors='replace') as f:
+                symbols = parse_php_symbols(f.read())
+        except (OSError, RecursionError):
+            symbols = []
+        parsed.append((rel, mtime, size, symbols))
+    return parsed
+
+class SymbolIndex:
+    """Namespaces, clases, métodos y funciones PHP con su archivo:línea, en SQLite
+
+    Se actualiza por mtime/tamaño: solo se vuelven a analizar los archivos cambiados,
+    repartidos entre el pool de procesos de búsqueda cuando son muchos.
+    """
+
+    VERSION = 1
+    CHUNK = 64  # Archivos por tarea del pool
+
+    def __init__(self, root: str = ".", db_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or os.path.join(self.root, CACHE_DIR, "symbols.db")
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import sqlite3  # Solo lo necesita la herramienta symbol
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=30)
+        if db.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            db.executescript(f"""
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS symbols;
+                CREATE TABLE files (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER);
+                CREATE TABLE symbols (path TEXT, kind TEXT, name TEXT, fqn TEXT, parent TEXT,
+                                      line INTEGER, signature TEXT);
+                CREATE INDEX symbols_name ON symbols (name COLLATE NOCASE);
+                CREATE INDEX symbols_fqn ON symbols (fqn COLLATE NOCASE);
+                CREATE INDEX symbols_parent ON symbols (parent);
+                CREATE INDEX symbols_path ON symbols (path);
+                PRAGMA user_version = {self.VERSION};
+            """)
+        return db
+
+    def _parse(self, entries: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int, List]]:
+        chunks = [entries[i:i + self.CHUNK] for i in range(0, len(entries), self.CHUNK)]
+        # Pocos archivos: el coste de repartir supera al de analizarlos
+        if GREP_WORKERS <= 1 or len(chunks) <= 2:
+            return [item for chunk in chunks for item in _parse_php_chunk(self.root, chunk)]
+        try:
+            results = _get_search_pool().map(_parse_php_chunk, [self.root] * len(chunks), chunks)
+            return [item for chunk in results for item in chunk]
+        except BrokenProcessPool:
+            _reset_search_pool()
+            return _parse_php_chunk(self.root, entries)
+
+    def refresh(self, db) -> int:
+        """Reanaliza los archivos nuevos o modificados y olvida los eliminados; devuelve cuántos analizó"""
+        found = {}
+        for rel in walk_files(self.root):
+            if rel.endswith(".php") and not rel.endswith(".blade.php"):
+                try:
+                    stat = os.stat(os.path.join(self.root, rel))
+                except OSError:
+                    continue
+                found[rel] = (stat.st_mtime_ns, stat.st_size)
+        known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime, size FROM files")}
+        stale = [rel for rel, stamp in known.items() if found.get(rel) != stamp]
+        pending = [(rel, *stamp) for rel, stamp in found.items() if known.get(rel) != stamp]
+        if not stale and not pending:
+            return 0
+
+        parsed = self._parse(pending)
+        with db:  # Una sola transacción: un fallo no deja el índice a medias
+            db.executemany("DELETE FROM symbols WHERE path = ?", [(rel,) for rel in stale])
+            db.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in stale])
+            db.executemany("INSERT INTO files VALUES (?, ?, ?)", [(rel, mtime, size) for rel, mtime, size, _ in parsed])
+            db.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           [(rel, *symbol) for rel, _, _, symbols in parsed for symbol in symbols])
+        return len(parsed)
+
+    def lookup(self, name: str, kind: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Busca por nombre corto, nombre completo (App\\Models\\User) o Clase::metodo / Clase@metodo"""
+        name = name.strip().lstrip("\\")
+        columns = "path, kind, name, fqn, parent, line, signature"
+        if "::" in name or "@" in name:
+            owner, method = re.split(r"::|@", name, maxsplit=1)
+            where = "kind = 'method' AND name = ? COLLATE NOCASE AND (parent = ? COLLATE NOCASE OR parent LIKE ?)"
+            args = [method, owner, "%\\" + owner]
+        elif "\\" in name:
+            where, args = "fqn = ? COLLATE NOCASE", [name]
+        else:
+            where, args = "name = ? COLLATE NOCASE", [name]
+        if kind:
+            where += " AND kind = ?"
+            args.append(kind)
+
+        with self._lock:
+            db = self._connect()
+            try:
+                self.refresh(db)
+                query = f"SELECT {columns} FROM symbols WHERE {where} ORDER BY kind != 'class', path, line LIMIT ?"
+                rows = db.execute(query, args + [limit]).fetchall()
+                if not rows and "::" not in name and "@" not in name and "\\" not in name:
+                    # Sin coincidencia exacta se prueba como prefijo
+                    prefix = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    rows = db.execute(f"SELECT {columns} FROM symbols WHERE name LIKE ? ESCAPE '\\'"
+                                      + (" AND kind = ?" if kind else "") + " ORDER BY name, path LIMIT ?",
+                                      [prefix] + ([kind] if kind else []) + [limit]).fetchall()
+                results = []
+                for path, kind_, short, fqn, parent, line, signature in rows:
+                    entry = {"path": path, "kind": kind_, "name": short, "fqn": fqn, "parent": parent,
+                             "line": line, "signature": signature}
+                    if kind_ in _PHP_TYPES:
+                        entry["members"] = [{"name": m, "line": l, "signature": sig} for m, l, sig in db.execute(
+                            "SELECT name, line, signature FROM symbols WHERE parent = ? AND path = ? ORDER BY line",
+                            (fqn, path))]
+                    results.append(entry)
+                return results
+            finally:
+                db.close()
+
+_symbol_index: Optional[SymbolIndex] = None
+_symbol_index_lock = threading.Lock()
+
+def get_symbol_index() -> SymbolIndex:
+    """Índice de símbolos del directorio de trabajo (se crea al primer uso)"""
+    global _symbol_index
+    with _symbol_index_lock:
+        if _symbol_index is None or _symbol_index.root != os.path.abspath("."):
+            _symbol_index = SymbolIndex(".")
+        return _symbol_index
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RUTAS DE LARAVEL
+# ═══════════════════════════════════════════════════════════════════════════
+
+_ROUTE_TOKEN = re.compile(r"""(?P<comment>//[^\n]*|\#(?!\[)[^\n]*|/\*.*?\*/)"""
+                          r"""|(?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")"""
+                          r"""|(?P<name>\\?[A-Za-z_][\w\\]*)|(?P<var>\$\w+)"""
+                          r"""|(?P<op>::|\?->|->|=>|[()\[\]{},;.])|(?P<space>\s+)|(?P<other>.)""", re.S)
+_ROUTE_VERBS = {"get": "GET|HEAD", "post": "POST", "put": "PUT", "patch": "PATCH", "delete": "DELETE",
+                "options": "OPTIONS", "any": "ANY"}
+_RESOURCE_ACTIONS = [("index", "GET|HEAD", ""), ("create", "GET|HEAD", "/create"), ("store", "POST", ""),
+                     ("show", "GET|HEAD", "/{%s}"), ("edit", "GET|HEAD", "/{%s}/edit"),
+                     ("update", "PUT|PATCH", "/{%s}"), ("destroy", "DELETE", "/{%s}")]
+# Convenciones de RouteServiceProvider / bootstrap/app.php para los archivos principales
+_ROUTE_FILE_DEFAULTS = {"routes/web.php": ("", ["web"]), "routes/api.php": ("api", ["api"])}
+
+def _singular(word: str) -> str:
+    """Singular aproximado para el parámetro de un resource (users → user, categories → category)"""
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _join_uri(prefix: str, uri: str) -> str:
+    return "/" + "/".join(part.strip("/") for part in (prefix, uri) if part.strip("/"))
+
+class _RouteFileParser:
+    """Recorre las llamadas Route::... de un archivo y produce sus rutas con los atributos de grupo"""
+
+    def __init__(self, table: "RouteTable", rel: str, source: str):
+        self.table = table
+        self.rel = rel
+        self.tokens: List[Tuple[str, str, int]] = []
+        line = 1
+        for match in _ROUTE_TOKEN.finditer(source):
+            kind, value = match.lastgroup, match.group()
+            if kind not in ("comment", "space"):
+                self.tokens.append((kind, value, line))
+            line += value.count("\n")
+        self.imports = {}  # alias -> nombre completo, de las sentencias use
+        for i, (kind, value, _) in enumerate(self.tokens):
+            if value == "use" and i + 1 < len(self.tokens) and self.tokens[i + 1][0] == "name":
+                full = self.tokens[i + 1][1].lstrip("\\")
+                alias = full.rsplit("\\", 1)[-1]
+                if i + 3 < len(self.tokens) and self.tokens[i + 2][1] == "as":
+                    alias = self.tokens[i + 3][1]
+                self.imports[alias] = full
+        self.pos = 0
+
+    def _peek(self, offset: int = 0) -> str:
+        index = self.pos + offset
+        return self.tokens[index][1] if index < len(self.tokens) else ""
+
+    def _class_name(self, name: str) -> str:
+        if name.startswith("\\"):
+            return name[1:]
+        head, _, rest = name.partition("\\")
+        return self.imports[head] + ("\\" + rest if rest else "") if head in self.imports else name
+
+    def _skip_balanced(self):
+        """Avanza sobre un ( [ { y todo su contenido"""
+        depth = 0
+        while self.pos < len(self.tokens):
+            value = self._peek()
+            self.pos += 1
+            if value in ("(", "[", "{"):
+                depth += 1
+            elif value in (")", "]", "}"):
+                depth -= 1
+                if depth <= 0:
+                    return
+
+    def _primary(self):
+        kind, value, _ = self.tokens[self.pos]
+        if kind == "string":
+            self.pos += 1
+            return value[1:-1].replace("\\'", "'")
+        if value == "[":
+            return self._array()
+        if value in ("function", "static") and (value == "function" or self._peek(1) in ("function", "fn")):
+            if value == "static":
+                self.pos += 1
+            self.pos += 1
+            self._skip_balanced()  # Parámetros
+            if self._peek() == "use":
+                self.pos += 1
+                self._skip_balanced()
+            while self.pos < len(self.tokens) and self._peek() != "{":
+                self.pos += 1  # Tipo de retorno
+            start = self.pos + 1
+            self._skip_balanced()
+            return ("closure", start, self.pos - 1)
+        if value == "fn":
+            self.pos += 1
+            self._skip_balanced()
+            while self.pos < len(self.tokens) and self._peek() != "=>":
+                self.pos += 1
+            self.pos += 1
+            start = self.pos
+            self._skip_expression()
+            return ("closure", start, self.pos)
+        if kind == "name" and self._peek(1) == "::" and self._peek(2) == "class":
+            self.pos += 3
+            return ("class", self._class_name(value))
+        if kind == "name" and value.lstrip("\\") == "base_path" and self._peek(1) == "(":
+            self.pos += 1
+            args = self._arguments()
+            return args[0] if args and isinstance(args[0], str) else None  # Ruta relativa a la raíz
+        return None
+
+    def _skip_expression(self):
+        while self.pos < len(self.tokens) and self._peek() not in (",", ")", "]", ";", "=>"):
+            if self._peek() in ("(", "[", "{"):
+                self._skip_balanced()
+            else:
+                self.pos += 1
+
+    def _expression(self):
+        start = self.pos
+        value = self._primary()
+        if value is None:
+            self.pos = start
+        end = self.pos
+        self._skip_expression()
+        # Una concatenación u otra expresión compleja no tiene valor estático conocido
+        return value if self.pos == end else None
+
+    def _array(self):
+        self.pos += 1  # [
+        items = []
+        while self.pos < len(self.tokens) and self._peek() != "]":
+            value = self._expression()
+            if self._peek() == "=>":
+                self.pos += 1
+                items.append((value, self._expression()))
+            else:
+                items.append((None, value))
+            if self._peek() == ",":
+                self.pos += 1
+        self.pos += 1  # ]
+        if all(key is None for key, _ in items):
+            return [value for _, value in items]
+        return {key if key is not None else i: value for i, (key, value) in enumerate(items)}
+
+    def _arguments(self) -> List:
+        args = []
+        if self._peek() != "(":
+            return args
+        self.pos += 1
+        while self.pos < len(self.tokens) and self._peek() != ")":
+            args.append(self._expression())
+            if self._peek() == ",":
+                self.pos += 1
+        self.pos += 1
+        return args
+
+    def _chain_calls(self) -> List[Tuple[str, List, int]]:
+        """Lee metodo(args)->metodo(args)... tras Route::"""
+        calls = []
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] == "name":
+            name, line = self.tokens[self.pos][1], self.tokens[self.pos][2]
+            self.pos += 1
+            calls.append((name, self._arguments(), line))
+            if self._peek() not in ("->", "?->"):
+                break
+            self.pos += 1
+        return calls
+
+    def parse(self, start: int, end: int, attrs: Dict):
+        """Procesa las sentencias entre dos posiciones con los atributos de grupo dados"""
+        self.pos = start
+        while self.pos < end:
+            kind, value, _ = self.tokens[self.pos]
+            if kind == "name" and value.lstrip("\\") == "Route" and self._peek(1) == "::":
+                self.pos += 2
+                calls = self._chain_calls()
+                resume = self.pos
+                self._apply(calls, attrs)
+                self.pos = resume
+            elif value in ("require", "require_once", "include", "include_once"):
+                self.pos += 1
+                parts, base = [], os.path.dirname(self.rel)  # __DIR__.'/x.php': relativa al archivo
+                while self.pos < end and self._peek() != ";":
+                    kind, value, _ = self.tokens[self.pos]
+                    if kind == "name" and value.lstrip("\\") == "base_path":
+                        base = ""  # base_path('routes/x.php'): relativa a la raíz del proyecto
+                    elif kind == "string":
+                        parts.append(value[1:-1])
+                    self.pos += 1
+                target = os.path.normpath(os.path.join(base, "".join(parts).lstrip("/")))
+                self.table._include(target.replace(os.sep, "/"), attrs)
+            else:
+                self.pos += 1
+
+    def _group_attrs(self, attrs: Dict, method: str, args: List) -> Dict:
+        """Atributos resultantes de prefix(), middleware(), name(), controller()... o de un array de grupo"""
+        attrs = dict(attrs, middleware=list(attrs["middleware"]))
+        value = args[0] if args else None
+        if method == "group" and isinstance(value, dict):
+            for key, item in value.items():
+                attrs = self._group_attrs(attrs, {"as": "name"}.get(key, key), [item])
+            return attrs
+        if method == "prefix" and isinstance(value, str):
+            attrs["prefix"] = _join_uri(attrs["prefix"], value).strip("/")
+        elif method == "middleware":
+            attrs["middleware"] += [m for m in (value if isinstance(value, list) else args) if isinstance(m, str)]
+        elif method in ("name", "as") and isinstance(value, str):
+            attrs["name"] += value
+        elif method == "namespace" and isinstance(value, str):
+            attrs["namespace"] = "\\".join(p.strip("\\") for p in (attrs["namespace"], value) if p.strip("\\"))
+        elif method == "controller":
+            attrs["controller"] = value[1] if isinstance(value, tuple) else value if isinstance(value, str) else None
+        return attrs
+
+    def _action(self, attrs: Dict, action) -> str:
+        if isinstance(action, tuple) and action[0] == "closure":
+            return "Closure"
+        if isinstance(action, tuple) and action[0] == "class":
+            return f"{action[1]}@__invoke"
+        if isinstance(action, list) and len(action) == 2 and isinstance(action[0], tuple) and action[0][0] == "class":
+            return f"{action[0][1]}@{action[1]}"
+        if isinstance(action, str):
+            if "@" not in action and attrs["controller"]:
+                return f"{attrs['controller']}@{action}"
+            return f"{attrs['namespace']}\\{action}" if attrs["namespace"] and not action.startswith("\\") else action
+        if isinstance(action, dict) and "uses" in action:
+            return self._action(attrs, action["uses"])
+        return "?"
+
+    def _route(self, attrs: Dict, methods: str, uri, action: str, line: int, name: str = "", verb: str = "") -> Dict:
+        return {"method": methods, "uri": _join_uri(attrs["prefix"], uri if isinstance(uri, str) else "?"),
+                "name": attrs["name"] + name if name else "", "action": action,
+                "middleware": list(attrs["middleware"]), "file": self.rel, "line": line, "_verb": verb}
+
+    def _resource(self, attrs: Dict, args: List, line: int, api: bool) -> List[Dict]:
+        if not args or not isinstance(args[0], str):
+            return []
+        controller = args[1][1] if len(args) > 1 and isinstance(args[1], tuple) else \
+            args[1] if len(args) > 1 and isinstance(args[1], str) else "?"
+        segments = args[0].split(".")
+        # photos.comments → photos/{photo}/comments/{comment}
+        base = "/".join(f"{seg}/{{{_singular(seg).replace('-', '_')}}}" for seg in segments[:-1])
+        base = _join_uri(base, segments[-1])
+        parameter = _singular(segments[-1]).replace("-", "_")
+        routes = []
+        for verb, methods, suffix in _RESOURCE_ACTIONS:
+            if api and verb in ("create", "edit"):
+                continue
+            uri = base + (suffix % parameter if "%s" in suffix else suffix)
+            routes.append(self._route(attrs, methods, uri, f"{controller}@{verb}", line,
+                                      name=f"{args[0]}.{verb}", verb=verb))
+        return routes
+
+    def _apply(self, calls: List[Tuple[str, List, int]], attrs: Dict):
+        routes: List[Dict] = []
+        terminal = False
+        for method, args, line in calls:
+            if not terminal:
+                if method in _ROUTE_VERBS or method == "match":
+                    methods = _ROUTE_VERBS.get(method)
+                    if method == "match":
+                        verbs = args.pop(0) if args else []
+                        methods = "|".join(v.upper() for v in (verbs if isinstance(verbs, list) else [verbs])
+                                           if isinstance(v, str))
+                    routes.append(self._route(attrs, methods, args[0] if args else None,
+                                              self._action(attrs, args[1] if len(args) > 1 else None), line))
+                    terminal = True
+                elif method in ("view", "redirect", "permanentRedirect"):
+                    target = args[1] if len(args) > 1 and isinstance(args[1], str) else "?"
+                    action = f"view:{target}" if method == "view" else f"redirect:{target}"
+                    routes.append(self._route(attrs, "GET|HEAD" if method == "view" else "ANY",
+                                              args[0] if args else None, action, line))
+                    terminal = True
+                elif method in ("resource", "apiResource"):
+                    routes.extend(self._resource(attrs, args, line, api=method == "apiResource"))
+                    terminal = True
+                elif method in ("resources", "apiResources") and args and isinstance(args[0], dict):
+                    for name, controller in args[0].items():
+                        routes.extend(self._resource(attrs, [name, controller], line, api=method == "apiResources"))
+                    terminal = True
+                elif method == "group":
+                    attrs = self._group_attrs(attrs, method, args)
+                    closure = args[-1] if args else None
+                    if isinstance(closure, tuple) and closure[0] == "closure":
+                        self.parse(closure[1], closure[2], attrs)
+                    elif isinstance(closure, str) and closure.endswith(".php"):
+                        self.table._include(closure, attrs)  # Route::group([...], base_path('routes/x.php'))
+                    terminal = True
+                else:
+                    attrs = self._group_attrs(attrs, method, args)
+                continue
+            # Modificadores encadenados tras la definición de la ruta
+            value = args[0] if args else None
+            if method == "name" and isinstance(value, str):
+                for route in routes:
+                    route["name"] = attrs["name"] + value
+            elif method == "middleware":
+                extra = [m for m in (value if isinstance(value, list) else args) if isinstance(m, str)]
+                for route in routes:
+                    route["middleware"] += extra
+            elif method in ("only", "except"):
+                keep = set(value if isinstance(value, list) else args)
+                routes = [r for r in routes if (r["_verb"] in keep) == (method == "only")]
+        for route in routes:
+            route.pop("_verb", None)
+        self.table._routes.extend(routes)
+
+class RouteTable:
+    """Tabla de rutas extraída de routes/**/*.php, cacheada en disco por hash de los archivos"""
+
+    VERSION = 1
+
+    def __init__(self, root: str = ".", cache_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.cache_path = cache_path or os.path.join(self.root, CACHE_DIR, "routes.json")
+        self._lock = threading.Lock()
+        self._hashes: Optional[Dict[str, str]] = None
+        self._routes: List[Dict] = []
+        self._parsed: set = set()
+
+    def _route_files(self) -> Dict[str, str]:
+        """Hash SHA-1 del contenido de cada archivo de rutas"""
+        hashes = {}
+        routes_dir = os.path.join(self.root, "routes")
+        for dirpath, dirnames, filenames in os.walk(routes_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".php"):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        with open(path, 'rb') as f:
+                            hashes[os.path.relpath(path, self.root).replace(os.sep, "/")] = hashlib.sha1(f.read()).hexdigest()
+                    except OSError:
+                        continue
+        return hashes
+
+    def _include(self, rel: str, attrs: Dict):
+        """Analiza un archivo de rutas (una sola vez) con los atributos del grupo que lo incluye"""
+        rel = rel.replace("\\", "/").lstrip("./")
+        if rel in self._parsed or not os.path.isfile(os.path.join(self.root, rel)):
+            return
+        self._parsed.add(rel)
+        try:
+            with open(os.path.join(self.root, rel), encoding='utf-8', errors='replace') as f:
+                parser = _RouteFileParser(self, rel, f.read())
+        except OSError:
+            return
+        parser.parse(0, len(parser.tokens), attrs)
+
+    def _build(self, hashes: Dict[str, str]) -> List[Dict]:
+        self._routes, self._parsed = [], set()
+        # web.php y api.php primero: los archivos que incluyen heredan su grupo
+        ordered = [rel for rel in _ROUTE_FILE_DEFAULTS if rel in hashes] + \
+                  [rel for rel in hashes if rel not in _ROUTE_FILE_DEFAULTS]
+        for rel in ordered:
+            prefix, middleware = _ROUTE_FILE_DEFAULTS.get(rel, ("", []))
+            self._include(rel, {"prefix": prefix, "middleware": list(middleware), "name": "",
+                                "namespace": "", "controller": None})
+        return self._routes
+
+    def routes(self) -> List[Dict]:
+        """Todas las rutas; se vuelven a extraer solo si cambió algún archivo de rutas"""
+        with self._lock:
+            hashes = self._route_files()
+            if hashes == self._hashes:
+                return self._routes
+            try:
+                with open(self.cache_path, encoding='utf-8') as f:
+                    data = json.load(f)
+                if data['version'] == self.VERSION and data['files'] == hashes:
+                    self._hashes, self._routes = hashes, data['routes']
+                    return self._routes
+            except (OSError, ValueError, KeyError, TypeError):
+                pass  # Caché ausente, corrupta o de otros archivos
+            routes = self._build(hashes)
+            self._hashes = hashes
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"version": self.VERSION, "files": hashes, "routes": routes}, f, ensure_ascii=False)
+                os.replace(temp_path, self.cache_path)
+            except OSError:
+                pass
+            return routes
+
+    def query(self, filter: Optional[str] = None, method: Optional[str] = None) -> List[Dict]:
+        """Rutas cuyo URI, nombre, acción o middleware contienen el filtro"""
+        needle = (filter or "").lower()
+        verb = (method or "").upper()
+        return [route for route in self.routes()
+                if (not verb or verb in route["method"].split("|") or route["method"] == "ANY")
+                and (not needle or needle in " ".join([route["uri"], route["name"], route["action"],
+                                                      *route["middleware"]]).lower())]
+
+def format_route(route: Dict) -> str:
+    middleware = f" [{', '.join(route['middleware'])}]" if route["middleware"] else ""
+    return (f"{route['method']:<10} {route['uri']}  {route['name'] or '-'}  {route['action']}{middleware}  "
+            f"{route['file']}:{route['line']}")
+
+def summarize_routes(routes: List[Dict], max_groups: int = 12) -> str:
+    """Resumen compacto para el prompt: totales por método y por primer segmento del URI"""
+    if not routes:
+        return ""
+    methods: Dict[str, int] = {}
+    groups: Dict[str, List[Dict]] = {}
+    for route in routes:
+        verb = route["method"].split("|")[0]
+        methods[verb] = methods.get(verb, 0) + 1
+        groups.setdefault("/" + route["uri"].strip("/").split("/")[0], []).append(route)
+    lines = [f"Rutas: {len(routes)} (" + ", ".join(f"{v} {n}" for v, n in sorted(methods.items(), key=lambda i: -i[1]))
+             + "). Detalle con la herramienta routes(filter=...)"]
+    for prefix, items in sorted(groups.items(), key=lambda item: -len(item[1]))[:max_groups]:
+        controllers = []
+        for route in items:
+            controller = route["action"].split("@")[0].rsplit("\\", 1)[-1]
+            if controller not in controllers and controller not in ("Closure", "?") and ":" not in controller:
+                controllers.append(controller)
+        middleware = sorted({m for route in items for m in route["middleware"]})
+        lines.append(f"  {prefix} ({len(items)})" + (f" middleware: {', '.join(middleware[:4])};" if middleware else "")
+                     + (f" {', '.join(controllers[:4])}" + ("..." if len(controllers) > 4 else "") if controllers else ""))
+    if len(groups) > max_groups:
+        lines.append(f"  ... y {len(groups) - max_groups} prefijos más")
+    return "\n".join(lines)
+
+_route_table: Optional[RouteTable] = None
+_route_table_lock = threading.Lock()
+
+def get_route_table() -> RouteTable:
+    """Tabla de rutas del directorio de trabajo (se crea al primer uso)"""
+    global _route_table
+    with _route_table_lock:
+        if _route_table is None or _route_table.root != os.path.abspath("."):
+            _route_table = RouteTable(".")
+        return _route_table
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CACHÉ DE RESULTADOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _tree_stamp(base: str, pattern: Optional[str], recursive: bool) -> str:
+    """Huella de (ruta, mtime, tamaño) de los archivos que recorre un glob o un grep"""
+    digest = hashlib.blake2b(digest_size=16)
+    for rel in walk_files(base, pattern, recursive):
+        stamp = _file_stamp(os.path.join(base, rel))
+        if stamp is not None:
+            digest.update(f"{rel}\0{stamp[0]}\0{stamp[1]}\n".encode('utf-8', errors='surrogateescape'))
+    return digest.hexdigest()
+
+class ToolCache:
+    """Memoización de read/glob/grep validada por mtime, con LRU y límite de memoria
+
+    read se valida contra el mtime/tamaño del archivo. glob y grep dependen de todo el
+    árbol: dentro del proyecto se validan con el sello del índice de trigramas, que cambia
+    cuando su recorrido encuentra un archivo nuevo, borrado o modificado fuera de VIBE
+    (editor, composer, git). Fuera del proyecto se usa una huella de los archivos recorridos.
+    """
+
+    CACHEABLE = {"read", "glob", "grep"}
+
+    def __init__(self, max_bytes: int = TOOL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # clave -> (resultado, ruta absoluta, sello, bytes)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(tool: str, params: Dict) -> tuple:
+        return (tool,) + tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    @staticmethod
+    def _scope(tool: str, params: Dict) -> str:
+        target = params.get('file_path') if tool == "read" else params.get('path', '.')
+        return os.path.abspath(str(target))
+
+    def stamp(self, tool: str, params: Dict):
+        """Sello tomado antes de ejecutar la herramienta (si algo cambia durante la ejecución, no coincide)"""
+        if tool == "read":
+            return _file_stamp(self._scope(tool, params))
+        try:
+            path = str(params.get('path', '.'))
+            if tool == "glob" and not params.get('pattern'):
+                return None
+            if GREP_INDEX:
+                # El índice de trigramas ya recorre y revisa el proyecto en cada grep: su sello
+                # cubre cualquier ruta dentro de él que no atraviese directorios ignorados
+                index = get_grep_index()
+                target = os.path.abspath(path)
+                rel = os.path.relpath(target, index.root).replace(os.sep, '/')
+                if _paths_overlap(target, index.root) and not rel.startswith('..') and not _ignored_dir(rel):
+                    return index.stamp()
+            if tool == "glob":
+                return _tree_stamp(path, params.get('pattern'), False)
+            if tool == "grep":
+                return _tree_stamp(path, params.get('glob_pattern', '*'), True)
+        except (OSError, TypeError, re.error):
+            pass  # Parámetros inválidos o ruta inaccesible: el resultado no se cachea
+        return None
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def get(self, tool: str, params: Dict, stamp=None) -> Optional[ToolResult]:
+        """Resultado cacheado si su sello coincide con el actual (el de stamp(), tomado por quien llama)"""
+        if tool not in self.CACHEABLE:
+            return None
+        key = self._key(tool, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if stamp is not None and entry[2] == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, tool: str, params: Dict, result: ToolResult, stamp=None):
+        if tool not in self.CACHEABLE or not result.success or stamp is None:
+            return
+        size = len(result.output)
+        if size > self.max_bytes // 4:
+            return  # Un solo resultado enorme desplazaría a todos los demás
+        key = self._key(tool, params)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (result, self._scope(tool, params), stamp, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_path(self, path: str):
+        """Descarta las entradas que dependen de un archivo modificado"""
+        target = os.path.abspath(path)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry[1] == target or (key[0] != "read" and _paths_overlap(entry[1], target))]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+tool_cache = ToolCache()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# TELEMETRÍA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _ns_to_ms(value) -> Optional[float]:
+    return value / 1e6 if value is not None else None
+
+class Telemetry:
+    """Tramos de tiempo de cada llamada al modelo y cada herramienta, en memoria y en JSONL"""
+
+    def __init__(self, path: Optional[str] = TELEMETRY_FILE):
+        # Ruta absoluta: el archivo es el mismo aunque luego cambie el directorio de trabajo
+        self.path = os.path.abspath(path) if path else None
+        self.session = uuid.uuid4().hex[:8]
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+        self._file = None
+
+    def record(self, kind: str, name: str, duration_ms: float, **fields) -> Dict:
+        span = {"ts": round(time.time(), 3), "session": self.session, "kind": kind, "name": name,
+                "duration_ms": round(duration_ms, 3), **fields}
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                try:
+                    if self._file is None:
+                        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                    self._file.write(json.dumps(span, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    console.print(f"[dim]Telemetría desactivada: {e}[/]")
+                    self.path = None
+        return span
+
+    def record_model(self, model: str, response, duration_ms: float,
+                     first_token_ms: Optional[float] = None) -> Dict:
+        """Registra una llamada al modelo con las métricas que devuelve Ollama al terminar"""
+        response = response or {}
+        return self.record(
+            "model", model, duration_ms,
+            first_token_ms=round(first_token_ms, 3) if first_token_ms is not None else None,
+            prompt_eval_count=response.get('prompt_eval_count'),
+            eval_count=response.get('eval_count'),
+            load_ms=_ns_to_ms(response.get('load_duration')),
+            prompt_eval_ms=_ns_to_ms(response.get('prompt_eval_duration')),
+            eval_ms=_ns_to_ms(response.get('eval_duration')),
+            total_ms=_ns_to_ms(response.get('total_duration')),
+        )
+
+    def summary(self) -> Dict:
+        """Resumen de la sesión para /stats"""
+        with self._lock:
+            spans = list(self.spans)
+        models = [s for s in spans if s["kind"] == "model"]
+        eval_tokens = sum(s["eval_count"] or 0 for s in models)
+        eval_ms = sum(s["eval_ms"] or 0 for s in models)
+        prompts = [s["prompt_eval_count"] for s in models if s["prompt_eval_count"] is not None]
+        first_tokens = [s["first_token_ms"] for s in models if s["first_token_ms"] is not None]
+
+        by_model: Dict[str, Dict] = {}
+        for span in models:
+            stats = by_model.setdefault(span["name"], {"calls": 0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += span["duration_ms"]
+
+        tools: Dict[str, Dict] = {}
+        for span in spans:
+            if span["kind"] != "tool":
+                continue
+            stats = tools.setdefault(span["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            stats["calls"] += 1
+            stats["total_ms"] += span["duration_ms"]
+            stats["max_ms"] = max(stats["max_ms"], span["duration_ms"])
+            stats["errors"] += not span.get("success", True)
+
+        return {
+            "model_calls": len(models),
+            "model_ms": sum(s["duration_ms"] for s in models),
+            "load_ms": sum(s["load_ms"] or 0 for s in models),
+            "eval_tokens": eval_tokens,
+            "tokens_per_second": eval_tokens / (eval_ms / 1000) if eval_ms else 0.0,
+            "prompt_tokens": prompts,
+            "first_token_ms": sum(first_tokens) / len(first_tokens) if first_tokens else None,
+            "models": by_model,
+            "tools": tools,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+telemetry = Telemetry()
+
 # ═══════════════════════════════════════════════════════════════════════════
 # DETECCIÓN DE FRAMEWORK
 # ═══════════════════════════════════════════════════════════════════════════
@@ -296,12 +2638,20 @@ def get_project_context(framework_info: Dict) -> str:
     if framework_info['features']:
         context_parts.append(f"Características: {', '.join(framework_info['features'])}")
 
-    # Leer archivos clave
-    important_files = framework_info.get('config_files', [])
+    # Leer archivos clave (copia: framework_info no debe cambiar)
+    important_files = list(framework_info.get('config_files', []))
 
     # Agregar archivos comunes según framework
     if framework_info['name'] == 'Laravel':
         important_files.extend(['composer.json', 'package.json', '.env.example'])
+        # Las rutas van como tabla resumida: pegar los archivos solo mostraba los primeros 2000 caracteres
+        try:
+            summary = summarize_routes(get_route_table().routes())
+        except Exception:
+            summary = ""
+        if summary:
+            context_parts.append(summary)
+            important_files = [f for f in important_files if not f.startswith('routes/')]
 
     for file_path in important_files[:5]:  # Limitar a 5 archivos
         path = Path(file_path)
@@ -316,6 +2666,78 @@ def get_project_context(framework_info: Dict) -> str:
 
     return "\n".join(context_parts)
 
+# ═══════════════════════════════════════════════════════════════════════════
+# PERFIL DEL PROYECTO
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Archivos que leen detect_framework y get_project_context: si ninguno cambia, el perfil tampoco
+PROFILE_INPUTS = [
+    "artisan", "composer.json", "composer.lock", "package.json", "package-lock.json", ".env.example",
+    "routes/web.php", "routes/api.php", "bin/console", "symfony.lock", "config/routes.yaml",
+    "system/CodeIgniter.php", "application/config/config.php", "bin/cake", "yii",
+]
+
+def project_fingerprint(root: str = ".") -> str:
+    """Hash de ruta, tamaño y mtime de los archivos del perfil (solo stat, sin leerlos)"""
+    digest = hashlib.sha1(str(ProjectProfile.VERSION).encode())
+    # Todos los archivos de rutas: el resumen de rutas del contexto depende de ellos
+    routes = sorted(os.path.relpath(os.path.join(d, f), root).replace(os.sep, "/")
+                    for d, _, files in os.walk(os.path.join(root, "routes")) for f in files if f.endswith(".php"))
+    for name in PROFILE_INPUTS + [r for r in routes if r not in PROFILE_INPUTS]:
+        try:
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        except OSError:
+            digest.update(f"{name}:-\n".encode())
+    return digest.hexdigest()
+
+class ProjectProfile:
+    """Framework y contexto del directorio de trabajo cacheados en disco, validados por su huella"""
+
+    VERSION = 2
+
+    def __init__(self, path: Optional[str] = None):
+        self.root = os.path.abspath(".")
+        self.path = path or os.path.join(self.root, CACHE_DIR, "project.json")
+        self.fingerprint: Optional[str] = None  # Huella del perfil cargado o construido
+
+    def stale(self) -> bool:
+        """Indica si algún archivo del perfil cambió desde que se cargó o construyó"""
+        return project_fingerprint(self.root) != self.fingerprint
+
+    def load(self) -> Optional[Tuple[Dict, str, bool]]:
+        """Perfil guardado como (framework_info, contexto, vigente); None si no hay uno válido"""
+        try:
+            data = json.loads(Path(self.path).read_text(encoding='utf-8'))
+            if data['version'] != self.VERSION or data['root'] != self.root:
+                return None
+            self.fingerprint = data['fingerprint']
+            return data['framework_info'], data['context'], not self.stale()
+        except (OSError, ValueError, KeyError, TypeError):
+            return None  # Perfil ausente o corrupto: se reconstruye
+
+    def build(self) -> Tuple[Dict, str]:
+        """Detecta el framework, genera el contexto y guarda el perfil"""
+        # La huella se toma antes de leer: un cambio durante la detección invalida el perfil
+        fingerprint = self.fingerprint = project_fingerprint(self.root)
+        framework_info = detect_framework()
+        context = get_project_context(framework_info)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": self.VERSION,
+                    "root": self.root,
+                    "fingerprint": fingerprint,
+                    "framework_info": framework_info,
+                    "context": context,
+                }, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass  # Sin caché en disco (p. ej. checkout de solo lectura): se detecta en cada inicio
+        return framework_info, context
+
 # ═══════════════════════════════════════════════════════════════════════════
 # GESTOR DE TAREAS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -335,6 +2757,7 @@ class TaskManager:
         if not self.tasks:
             return
 
+        from rich.table import Table
         table = Table(title="📋 Lista de Tareas")
         table.add_column("#", style="cyan", width=4)
         table.add_column("Estado", width=12)
@@ -354,95 +2777,440 @@ class TaskManager:
         console.print(table)
 
 # ═══════════════════════════════════════════════════════════════════════════
-# PARSER DE LLAMADAS A HERRAMIENTAS
+# PRESUPUESTO DE CONTEXTO
 # ═══════════════════════════════════════════════════════════════════════════
 
-def parse_tool_calls(text: str) -> List[Dict]:
-    """Extrae llamadas a herramientas del texto del asistente"""
-
-    tool_calls = []
-
-    # Eliminar bloques de código markdown que podrían contener ejemplos
-    # Esto evita que los ejemplos en código sean parseados como herramientas reales
-    text_without_code_blocks = re.sub(r'```[\s\S]*?```', '', text)
-    text_without_inline_code = re.sub(r'`[^`]+`', '', text_without_code_blocks)
-
-    # Eliminar tablas markdown que contienen ejemplos
-    # Las tablas empiezan con | y contienen líneas con ━ o -
-    lines = text_without_inline_code.split('\n')
-    filtered_lines = []
-    in_table = False
-
-    for line in lines:
-        # Detectar inicio/contenido de tabla
-        if '|' in line or '━' in line or (in_table and line.strip().startswith('-')):
-            in_table = True
-            continue
-        # Salir de la tabla cuando hay una línea sin | y sin ━
-        elif in_table and '|' not in line:
-            in_table = False
-
-        if not in_table:
-            filtered_lines.append(line)
-
-    filtered_text = '\n'.join(filtered_lines)
-
-    # Patrón mejorado para detectar llamadas a herramientas
-    # Formato: TOOL:nombre_herramienta(param1="valor1", param2="valor2")
-    # Buscar TOOL:nombre( y luego encontrar el ) correspondiente manejando balance
-    tool_pattern = r'TOOL:(\w+)\('
-
-    tool_matches = list(re.finditer(tool_pattern, filtered_text))
-
-    for tool_match in tool_matches:
-        tool_name = tool_match.group(1)
-        start_pos = tool_match.end()
-
-        # Encontrar el paréntesis de cierre balanceando paréntesis
-        paren_count = 1
-        end_pos = start_pos
-        while end_pos < len(filtered_text) and paren_count > 0:
-            if filtered_text[end_pos] == '(':
-                paren_count += 1
-            elif filtered_text[end_pos] == ')':
-                paren_count -= 1
-            end_pos += 1
-
-        if paren_count == 0:
-            params_str = filtered_text[start_pos:end_pos-1]
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token en código y texto mixto)"""
+    return len(text) // 4 + 1
+
+def _message_tokens(message: Dict) -> int:
+    """Tokens de un mensaje, incluidos los argumentos de sus llamadas estructuradas"""
+    tokens = estimate_tokens(message["content"])
+    if message.get("tool_calls"):
+        tokens += estimate_tokens(json.dumps(message["tool_calls"], ensure_ascii=False))
+    return tokens
+
+def _describe_call(call: Dict) -> str:
+    """Representación corta de una llamada para los resúmenes compactados"""
+    params = ", ".join(
+        f'{k}="{v[:60]}"' if isinstance(v, str) else f"{k}=[{len(v)}]" if isinstance(v, list) else f"{k}={v}"
+        for k, v in call['params'].items() if k not in ('content', 'new_string', 'old_string')
+    )
+    return f"{call['tool']}({params})"
+
+class ContextManager:
+    """Historial de mensajes con presupuesto de tokens y compactación de lo más antiguo"""
+
+    def __init__(self, system_prompt: str, budget: int = CONTEXT_TOKENS, keep_recent: int = CONTEXT_KEEP_RECENT):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.messages: List[Dict] = []
+        self._tokens: List[int] = []
+        self._summaries: List[Optional[str]] = []  # Versión compacta de cada mensaje, si existe
+        self.compacted_tokens = 0
+        self.add("system", system_prompt)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self._tokens)
+
+    def add(self, role: str, content: str, summary: Optional[str] = None, **fields):
+        """Agrega un mensaje y compacta el historial si se supera el presupuesto"""
+        message = {"role": role, "content": content, **fields}
+        self.messages.append(message)
+        self._tokens.append(_message_tokens(message))
+        self._summaries.append(summary)
+        self.compact()
+
+    def add_tool_results(self, calls: List[Dict], results: List[ToolResult], native: bool = False):
+        """Agrega los resultados de una ronda de herramientas junto con su resumen compacto"""
+        if native:
+            # Un mensaje "tool" por llamada, como espera la API de tools de Ollama
+            for call, r in zip(calls, results):
+                lines = f"{len(r.output.splitlines())} líneas" if r.success else f"Error: {r.error}"
+                self.add("tool", r.output if r.success else f"Error: {r.error}",
+                         summary=f"{_describe_call(call)}: {lines} (compactado, vuelve a ejecutar la herramienta si lo necesitas)",
+                         tool_name=call['tool'])
+            return
+        results_text = "\n\n".join(
+            f"Resultado de {r.tool}:\n{r.output if r.success else f'Error: {r.error}'}"
+            for r in results
+        )
+        summary = "\n".join(
+            f"- {_describe_call(call)}: " + (
+                f"{len(r.output.splitlines())} líneas" if r.success else f"Error: {r.error}"
+            )
+            for call, r in zip(calls, results)
+        )
+        self.add(
+            "user",
+            f"RESULTADOS DE HERRAMIENTAS:\n{results_text}",
+            summary=f"RESULTADOS DE HERRAMIENTAS (compactados, vuelve a ejecutar la herramienta si los necesitas):\n{summary}"
+        )
+
+    def replace_last(self, content: str):
+        """Reemplaza el contenido del último mensaje"""
+        self.messages[-1]["content"] = content
+        self._tokens[-1] = _message_tokens(self.messages[-1])
+        self._summaries[-1] = None
+
+    def replace_system(self, system_prompt: str):
+        """Cambia el prompt del sistema conservando el resto del historial"""
+        self.messages[0]["content"] = system_prompt
+        self._tokens[0] = estimate_tokens(system_prompt)
+
+    def _set(self, i: int, content: str):
+        message = self.messages[i]
+        message["content"] = content
+        if "tool_calls" in message:
+            # Los argumentos de llamadas antiguas (p. ej. el contenido de un write) también se recortan
+            message["tool_calls"] = [
+                {"function": {"name": call["function"]["name"], "arguments": {
+                    k: v[:200] + "..." if isinstance(v, str) and len(v) > 200 else v
+                    for k, v in call["function"]["arguments"].items()
+                }}}
+                for call in message["tool_calls"]
+            ]
+        freed = self._tokens[i] - _message_tokens(message)
+        self._tokens[i] -= freed
+        self._summaries[i] = None
+        self.compacted_tokens += freed
+
+    def compact(self) -> int:
+        """Reduce el historial al presupuesto; el prompt del sistema y los mensajes recientes no se tocan"""
+        before = self.total_tokens
+        if before <= self.budget:
+            return 0
+
+        # 1) Resultados de herramientas antiguos → resumen de una línea por llamada
+        for i in range(1, len(self.messages) - self.keep_recent):
+            if self.total_tokens <= self.budget:
+                break
+            if self._summaries[i] is not None:
+                self._set(i, self._summaries[i])
+
+        # 2) Mensajes antiguos largos → recortados
+        for i in range(1, len(self.messages) - self.keep_recent):
+            if self.total_tokens <= self.budget:
+                break
+            content = self.messages[i]["content"]
+            if self._tokens[i] > 150:
+                self._set(i, content[:400] + "\n... (mensaje antiguo recortado)")
+
+        # 3) Si aún no alcanza, se descartan los mensajes más antiguos. Un mensaje con tool_calls se
+        #    va junto con sus resultados "tool": la API no acepta resultados sin la llamada que los pidió
+        while self.total_tokens > self.budget and len(self.messages) > self.keep_recent + 1:
+            end = 2
+            while end < len(self.messages) and self.messages[end]["role"] == "tool":
+                end += 1
+            if len(self.messages) - (end - 1) < self.keep_recent + 1:
+                break  # El turno llega a los mensajes recientes: se conserva entero
+            self.compacted_tokens += sum(self._tokens[1:end])
+            del self.messages[1:end], self._tokens[1:end], self._summaries[1:end]
+
+        freed = before - self.total_tokens
+        if freed:
+            console.print(f"[dim]🗜  Contexto compactado: {before} → {self.total_tokens} tokens estimados[/]")
+        return freed
 
-            # Parsear parámetros con mejor manejo de comillas
-            params = {}
+# ═══════════════════════════════════════════════════════════════════════════
+# PARSER DE LLAMADAS A HERRAMIENTAS
+# ═══════════════════════════════════════════════════════════════════════════
 
-            # Patrón mejorado que maneja strings multi-línea
-            param_pattern = r'(\w+)=("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|[^,)]+)'
+_TEXT_EVENTS = re.compile(r'TOOL:|`|\n')
+_INDENT = re.compile(r'[ \t]*')
+_BACKTICKS = re.compile(r'`+')
+_TOOL_START = re.compile(r'TOOL:(\w*)(\(?)')
+_PARAM_SEPARATOR = re.compile(r'[\s,]*')
+_PARAM_KEY = re.compile(r'(\w+)\s*(=?)\s*')
+_BARE_VALUE = re.compile(r'[^,)]*')
+_STRING_STOP = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_ESCAPES = {'"': '"', "'": "'", 'n': '\n'}
+# Parámetros con JSON dentro: sus escapes (\" \n \\) los interpreta json.loads, no el parser
+_RAW_PARAMS = {"edits"}
+
+class ToolCallParser:
+    """Parser incremental de TOOL:nombre(k="v") en una sola pasada y sensible a comillas.
+
+    Ignora ejemplos en bloques de código, código en línea y tablas markdown; dentro de una
+    llamada los paréntesis y backticks de los valores entre comillas no cuentan.
+    """
 
-            for param_match in re.finditer(param_pattern, params_str):
-                key = param_match.group(1)
-                value = param_match.group(2).strip()
+    def __init__(self):
+        self._states = {
+            "text": self._text, "backticks": self._backticks, "fence": self._fence,
+            "inline": self._inline, "skip_line": self._skip_line, "tool": self._tool,
+            "call": self._call, "value": self._value, "string": self._string, "bare": self._bare,
+        }
+        self.reset()
+
+    def reset(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = "text"
+        self._line_start = True
+        self._tool_name = ""
+        self._params: Dict = {}
+        self._key: Optional[str] = None
+        self._quote = ""
+        self._value_parts: List[str] = []
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume un fragmento del texto y devuelve las llamadas que quedaron completas"""
+        # Solo se conserva lo que aún no se pudo decidir (unos pocos caracteres)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        calls: List[Dict] = []
+        while self._pos < len(self._buffer) and self._states[self._state](calls):
+            pass
+        return calls
+
+    # Cada estado avanza sobre el buffer; devuelve False cuando necesita más texto
+
+    def _text(self, calls: List[Dict]) -> bool:
+        buf = self._buffer
+        if self._line_start:
+            indent = _INDENT.match(buf, self._pos).end()
+            self._pos = indent
+            if indent == len(buf):
+                return False
+            self._line_start = False
+            if buf[indent] in '|━':
+                self._state = "skip_line"
+                return True
+
+        event = _TEXT_EVENTS.search(buf, self._pos)
+        if event is None:
+            # Un "TOOL:" o unos backticks pueden estar partidos entre fragmentos
+            self._pos = max(self._pos, len(buf) - 4)
+            return False
+        if event.group() == '\n':
+            self._pos = event.end()
+            self._line_start = True
+        else:
+            self._pos = event.start()
+            self._state = "tool" if event.group() == "TOOL:" else "backticks"
+        return True
+
+    def _backticks(self, calls: List[Dict]) -> bool:
+        run = _BACKTICKS.match(self._buffer, self._pos)
+        if run.end() == len(self._buffer):
+            return False
+        self._pos = run.end()
+        count = len(run.group())
+        self._state = "fence" if count >= 3 else "inline" if count == 1 else "text"
+        return True
+
+    def _fence(self, calls: List[Dict]) -> bool:
+        end = self._buffer.find("```", self._pos)
+        if end == -1:
+            self._pos = max(self._pos, len(self._buffer) - 2)
+            return False
+        self._pos = end + 3
+        self._state = "text"
+        return True
+
+    def _inline(self, calls: List[Dict]) -> bool:
+        end = self._buffer.find("`", self._pos)
+        if end == -1:
+            self._pos = len(self._buffer)
+            return False
+        self._pos = end + 1
+        self._state = "text"
+        return True
+
+    def _skip_line(self, calls: List[Dict]) -> bool:
+        end = self._buffer.find("\n", self._pos)
+        if end == -1:
+            self._pos = len(self._buffer)
+            return False
+        self._pos = end + 1
+        self._line_start = True
+        self._state = "text"
+        return True
+
+    def _tool(self, calls: List[Dict]) -> bool:
+        match = _TOOL_START.match(self._buffer, self._pos)
+        if match.end() == len(self._buffer) and not match.group(2):
+            return False
+        if match.group(1) and match.group(2):
+            self._tool_name, self._params = match.group(1), {}
+            self._pos = match.end()
+            self._state = "call"
+        else:
+            self._pos += len("TOOL:")
+            self._state = "text"
+        return True
+
+    def _call(self, calls: List[Dict]) -> bool:
+        buf = self._buffer
+        self._pos = _PARAM_SEPARATOR.match(buf, self._pos).end()
+        if self._pos == len(buf):
+            return False
+        char = buf[self._pos]
+        if char == ')':
+            calls.append({"tool": self._tool_name, "params": self._params})
+            self._pos += 1
+            self._state = "text"
+            return True
+        if char in _STRING_STOP:
+            self._key = None  # Valor posicional: se recorre para respetar sus comillas y se descarta
+            self._state = "value"
+            return True
+        key = _PARAM_KEY.match(buf, self._pos)
+        if key is None:
+            self._pos += 1
+            return True
+        if key.end() == len(buf):
+            return False
+        if key.group(2):
+            self._key = key.group(1)
+            self._pos = key.end()
+        else:
+            self._key = None
+        self._state = "value"
+        return True
+
+    def _value(self, calls: List[Dict]) -> bool:
+        self._value_parts = []
+        char = self._buffer[self._pos]
+        if char in _STRING_STOP:
+            self._quote = char
+            self._pos += 1
+            self._state = "string"
+        else:
+            self._state = "bare"
+        return True
+
+    def _string(self, calls: List[Dict]) -> bool:
+        buf, pos = self._buffer, self._pos
+        stop = _STRING_STOP[self._quote].search(buf, pos)
+        if stop is None:
+            self._value_parts.append(buf[pos:])
+            self._pos = len(buf)
+            return False
+        self._value_parts.append(buf[pos:stop.start()])
+        if stop.group() == self._quote:
+            self._pos = stop.end()
+            self._set_param("".join(self._value_parts))
+            return True
+        if stop.end() == len(buf):
+            self._pos = stop.start()  # Falta el carácter escapado
+            return False
+        escaped = buf[stop.end()]
+        if self._key in _RAW_PARAMS and escaped != self._quote:
+            self._value_parts.append('\\' + escaped)
+        else:
+            self._value_parts.append(_ESCAPES.get(escaped, '\\' + escaped))
+        self._pos = stop.end() + 1
+        return True
+
+    def _bare(self, calls: List[Dict]) -> bool:
+        value = _BARE_VALUE.match(self._buffer, self._pos)
+        self._value_parts.append(value.group())
+        self._pos = value.end()
+        if value.end() == len(self._buffer):
+            return False
+        self._set_param("".join(self._value_parts).strip())
+        return True
+
+    def _set_param(self, value):
+        # Convertir valores booleanos
+        if value.lower() == 'true':
+            value = True
+        elif value.lower() == 'false':
+            value = False
+        if self._key is not None:
+            self._params[self._key] = value
+        self._state = "call"
 
-                # Remover comillas externas
-                if (value.startswith('"') and value.endswith('"')) or \
-                   (value.startswith("'") and value.endswith("'")):
-                    value = value[1:-1]
-                    # Decodificar escapes
-                    value = value.replace('\\"', '"').replace("\\'", "'").replace('\\n', '\n')
+def parse_tool_calls(text: str) -> List[Dict]:
+    """Extrae llamadas a herramientas del texto del asistente"""
+    return ToolCallParser().feed(text)
 
-                # Convertir valores booleanos
-                if isinstance(value, str):
-                    if value.lower() == 'true':
-                        value = True
-                    elif value.lower() == 'false':
-                        value = False
+# ═══════════════════════════════════════════════════════════════════════════
+# ESQUEMAS DE HERRAMIENTAS (API NATIVA DE OLLAMA)
+# ═══════════════════════════════════════════════════════════════════════════
 
-                params[key] = value
+def _tool_schema(name: str, description: str, properties: Dict, required: List[str]) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
 
-            tool_calls.append({
-                "tool": tool_name,
-                "params": params
-            })
+TOOL_SCHEMAS = [
+    _tool_schema("bash", "Ejecuta un comando de shell en el directorio del proyecto", {
+        "command": {"type": "string", "description": "Comando a ejecutar"},
+        "description": {"type": "string", "description": "Qué hace el comando, en pocas palabras"},
+    }, ["command"]),
+    _tool_schema("read", "Lee un archivo con números de línea", {
+        "file_path": {"type": "string", "description": "Ruta del archivo"},
+        "offset": {"type": "integer", "description": "Primera línea a leer (desde 0)"},
+        "limit": {"type": "integer", "description": "Cantidad de líneas a leer"},
+    }, ["file_path"]),
+    _tool_schema("write", "Crea o sobrescribe un archivo con el contenido completo", {
+        "file_path": {"type": "string", "description": "Ruta del archivo"},
+        "content": {"type": "string", "description": "Contenido completo del archivo"},
+    }, ["file_path", "content"]),
+    _tool_schema("edit", "Reemplaza un texto exacto de un archivo", {
+        "file_path": {"type": "string", "description": "Ruta del archivo"},
+        "old_string": {"type": "string", "description": "Texto a reemplazar; debe ser único salvo con replace_all"},
+        "new_string": {"type": "string", "description": "Texto nuevo"},
+        "replace_all": {"type": "boolean", "description": "Reemplazar todas las apariciones"},
+    }, ["file_path", "old_string", "new_string"]),
+    _tool_schema("multi_edit", "Aplica varios reemplazos exactos en uno o más archivos de forma atómica: "
+                 "se validan todos antes de escribir y, si alguno falla, no se modifica nada", {
+        "edits": {"type": "array", "description": "Reemplazos; cada old_string se busca en el archivo original",
+                  "items": {"type": "object", "properties": {
+                      "file_path": {"type": "string"},
+                      "old_string": {"type": "string"},
+                      "new_string": {"type": "string"},
+                      "replace_all": {"type": "boolean"},
+                  }, "required": ["file_path", "old_string", "new_string"]}},
+    }, ["edits"]),
+    _tool_schema("glob", "Busca archivos por patrón, los más recientes primero", {
+        "pattern": {"type": "string", "description": "Patrón glob, por ejemplo **/*.php"},
+        "path": {"type": "string", "description": "Directorio base"},
+    }, ["pattern"]),
+    _tool_schema("grep", "Busca una expresión regular en el contenido de los archivos", {
+        "pattern": {"type": "string", "description": "Expresión regular"},
+        "path": {"type": "string", "description": "Directorio base"},
+        "glob_pattern": {"type": "string", "description": "Filtro de archivos, por ejemplo *.php"},
+        "output_mode": {"type": "string", "enum": ["files_with_matches", "content", "count"],
+                        "description": "Archivos, líneas o cantidad de líneas por archivo"},
+        "case_insensitive": {"type": "boolean"},
+        "context_lines": {"type": "integer", "description": "Líneas de contexto en modo content"},
+    }, ["pattern"]),
+    _tool_schema("search", "Busca fragmentos de código por significado (índice de embeddings)", {
+        "query": {"type": "string", "description": "Qué se busca, en lenguaje natural"},
+        "limit": {"type": "integer", "description": "Cantidad de fragmentos"},
+    }, ["query"]),
+    _tool_schema("symbol", "Ubica clases, métodos y funciones PHP (archivo:línea y métodos de la clase)", {
+        "name": {"type": "string", "description": "AuthController, App\\Models\\User o AuthController::login"},
+        "kind": {"type": "string", "enum": ["class", "interface", "trait", "enum", "method", "function"]},
+    }, ["name"]),
+    _tool_schema("routes", "Lista rutas de Laravel: método, URI, nombre, controlador@método y middleware", {
+        "filter": {"type": "string", "description": "Texto a buscar en URI, nombre, acción o middleware"},
+        "method": {"type": "string", "description": "Método HTTP, por ejemplo POST"},
+    }, []),
+    _tool_schema("list_models", "Lista los modelos disponibles en Ollama", {}, []),
+]
+
+def _native_tool_calls(message) -> List[Dict]:
+    """Convierte los tool_calls estructurados de un mensaje de Ollama al formato interno"""
+    return [
+        {"tool": call['function']['name'], "params": dict(call['function']['arguments'] or {}), "native": True}
+        for call in (message.get('tool_calls') or [])
+    ]
 
-    return tool_calls
+def _tools_unsupported(error: Exception) -> bool:
+    """Indica si Ollama rechazó la petición porque el modelo no soporta tools"""
+    return isinstance(error, ollama.ResponseError) and "does not support tools" in str(error)
 
 def execute_tool(tool_name: str, params: Dict) -> ToolResult:
     """Ejecuta una herramienta con los parámetros dados"""
@@ -452,8 +3220,12 @@ def execute_tool(tool_name: str, params: Dict) -> ToolResult:
         "read": Tools.read,
         "write": Tools.write,
         "edit": Tools.edit,
+        "multi_edit": Tools.multi_edit,
         "glob": Tools.glob,
         "grep": Tools.grep,
+        "search": Tools.search,
+        "symbol": Tools.symbol,
+        "routes": Tools.routes,
         "list_models": Tools.list_models
     }
 
@@ -461,20 +3233,378 @@ def execute_tool(tool_name: str, params: Dict) -> ToolResult:
         return ToolResult(tool=tool_name, success=False, output="",
                          error=f"Herramienta desconocida: {tool_name}")
 
+    # Un solo sello por llamada: valida la entrada cacheada y, si no sirve, acompaña al resultado nuevo
+    stamp = tool_cache.stamp(tool_name, params) if tool_name in tool_cache.CACHEABLE else None
+    cached = tool_cache.get(tool_name, params, stamp)
+    if cached is not None:
+        return cached
+
     try:
-        return tools_map[tool_name](**params)
+        result = tools_map[tool_name](**params)
+        tool_cache.put(tool_name, params, result, stamp)
+        return result
     except TypeError as e:
         return ToolResult(tool=tool_name, success=False, output="",
                          error=f"Parámetros incorrectos: {str(e)}")
 
+async def execute_tool_async(tool_name: str, params: Dict, shell: Optional[ShellSession] = None) -> ToolResult:
+    """Versión asíncrona de execute_tool: bash como subproceso asíncrono y el resto en un hilo"""
+    if tool_name == "bash":
+        try:
+            if shell is not None:
+                return await shell.run_async(**params)
+            return await Tools.bash_async(**params)
+        except TypeError as e:
+            return ToolResult(tool=tool_name, success=False, output="",
+                             error=f"Parámetros incorrectos: {str(e)}")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, execute_tool, tool_name, params)
+
+# Herramientas que no modifican nada y pueden ejecutarse en paralelo entre sí
+READ_ONLY_TOOLS = {"read", "glob", "grep", "search", "symbol", "routes", "list_models"}
+
+def _tool_paths(call: Dict) -> Optional[List[str]]:
+    """Rutas que toca una llamada; None significa que puede tocar cualquier archivo"""
+    tool, params = call['tool'], call['params']
+    if tool == "bash":
+        return None
+    if tool == "multi_edit":
+        try:
+            return [os.path.abspath(edit["file_path"]) for edit in _multi_edit_list(params.get('edits'))]
+        except ValueError:
+            return []  # Fallará en la validación sin tocar nada
+    if tool in ("read", "write", "edit"):
+        target = params.get('file_path')
+    elif tool in ("glob", "grep", "search", "symbol", "routes"):
+        target = params.get('path', '.')
+    else:
+        return []
+    return [os.path.abspath(target)] if isinstance(target, str) else []
+
+def _paths_overlap(a: str, b: str) -> bool:
+    """Indica si una ruta es igual a la otra o está contenida en ella"""
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+def _calls_conflict(a: Dict, b: Dict) -> bool:
+    """Dos llamadas deben ejecutarse en orden si alguna escribe sobre rutas de la otra"""
+    if a['tool'] in READ_ONLY_TOOLS and b['tool'] in READ_ONLY_TOOLS:
+        return False
+    paths_a, paths_b = _tool_paths(a), _tool_paths(b)
+    if paths_a is None or paths_b is None:
+        return True
+    return any(_paths_overlap(x, y) for x in paths_a for y in paths_b)
+
+class ToolScheduler:
+    """Ejecuta herramientas en paralelo respetando el orden entre llamadas que se pisan"""
+
+    def __init__(self, max_workers: int = TOOL_WORKERS, shell: Optional[ShellSession] = None):
+        self._semaphore = asyncio.Semaphore(max(1, max_workers))
+        self._shell = shell
+        self._submitted: List[Tuple[Dict, asyncio.Task]] = []
+
+    async def _run(self, call: Dict, dependencies: List[asyncio.Task]) -> ToolResult:
+        if dependencies:
+            await asyncio.wait(dependencies)
+        async with self._semaphore:
+            start = time.perf_counter()
+            result = await execute_tool_async(call['tool'], call['params'], self._shell)
+            telemetry.record("tool", call['tool'], (time.perf_counter() - start) * 1000,
+                             success=result.success, call=_describe_call(call))
+            return result
+
+    def submit(self, call: Dict) -> asyncio.Task:
+        """Programa una llamada detrás de todas las anteriores con las que entra en conflicto"""
+        dependencies = [task for previous, task in self._submitted if _calls_conflict(previous, call)]
+        task = asyncio.ensure_future(self._run(call, dependencies))
+        self._submitted.append((call, task))
+        return task
+
+    async def run(self, calls: List[Dict]) -> List[ToolResult]:
+        """Ejecuta un lote de llamadas y devuelve los resultados en el orden original"""
+        return list(await asyncio.gather(*(self.submit(call) for call in calls)))
+
+    def cancel(self):
+        """Cancela las llamadas que aún no terminaron"""
+        for _, task in self._submitted:
+            task.cancel()
+
+class EarlyToolDispatcher:
+    """Ejecuta llamadas a herramientas completas mientras el modelo sigue generando"""
+
+    def __init__(self, shell: Optional[ShellSession] = None):
+        self._scheduler = ToolScheduler(shell=shell)
+        self._parser = ToolCallParser()
+        self._dispatched: List[Tuple[Dict, asyncio.Task]] = []
+
+    @property
+    def calls(self) -> List[Dict]:
+        """Llamadas despachadas, en el orden en que llegaron"""
+        return [call for call, _ in self._dispatched]
+
+    def dispatch(self, call: Dict):
+        self._dispatched.append((call, self._scheduler.submit(call)))
+
+    def feed(self, chunk: str):
+        """Despacha las llamadas que quedan completas con el nuevo fragmento del stream"""
+        for call in self._parser.feed(chunk):
+            self.dispatch(call)
+
+    async def results(self, tool_calls: List[Dict]) -> List[ToolResult]:
+        """Devuelve los resultados de las llamadas finales reutilizando las ya despachadas"""
+        tasks = []
+        reuse = True
+        for i, call in enumerate(tool_calls):
+            reuse = reuse and i < len(self._dispatched) and self._dispatched[i][0] == call
+            tasks.append(self._dispatched[i][1] if reuse else self._scheduler.submit(call))
+        return list(await asyncio.gather(*tasks))
+
+    def cancel(self):
+        self._scheduler.cancel()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# POOL DE SERVIDORES OLLAMA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _model_key(name: str) -> str:
+    """Nombre canónico de un modelo: "llama3" y "llama3:latest" son el mismo"""
+    return name if ":" in name else f"{name}:latest"
+
+def _host_failure(error: BaseException) -> bool:
+    """¿El error es del servidor (caído, sin red, 5xx) y no de la petición?"""
+    if isinstance(error, ConnectionError):
+        return True
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    import httpx  # Ya cargado por ollama
+    return isinstance(error, httpx.TransportError)
+
+class OllamaPool:
+    """Varios servidores Ollama: verificación periódica, enrutado por carga o latencia,
+    sesiones fijas a un servidor (reutiliza su caché KV) y failover"""
+
+    def __init__(self, hosts: List[str], routing: str = ROUTING, interval: float = HEALTH_INTERVAL):
+        self.endpoints = [Endpoint(host) for host in hosts]
+        self.routing = routing
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Endpoint] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _check_endpoint(self, endpoint: Endpoint):
+        client = ollama.Client(host=endpoint.host, timeout=5)
+        start = time.perf_counter()
+        try:
+            catalog = tuple(client.list().get('models') or ())
+            latency = (time.perf_counter() - start) * 1000
+            loaded = client.ps().get('models') or ()
+        except Exception as e:
+            with self._lock:
+                endpoint.healthy, endpoint.checked, endpoint.error = False, True, str(e)
+            return
+        with self._lock:
+            endpoint.healthy, endpoint.checked, endpoint.error = True, True, None
+            endpoint.catalog = catalog
+            endpoint.models = frozenset(_model_key(m.get('model') or m.get('name') or '') for m in catalog)
+            endpoint.loaded = frozenset(_model_key(m.get('model') or m.get('name') or '') for m in loaded)
+            endpoint.latency_ms = latency if endpoint.latency_ms is None else 0.7 * endpoint.latency_ms + 0.3 * latency
+
+    def check(self) -> List[Endpoint]:
+        """Verifica todos los servidores en paralelo; devuelve los disponibles"""
+        threads = [threading.Thread(target=self._check_endpoint, args=(endpoint,), daemon=True)
+                   for endpoint in self.endpoints]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [endpoint for endpoint in self.endpoints if endpoint.healthy]
+
+    def start(self):
+        """Verifica periódicamente en segundo plano (una sola vez)"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(self.interval):
+                self.check()
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+
+    def pick(self, model: str, session: Optional[str] = None, exclude: Tuple = ()) -> Endpoint:
+        """Elige servidor para el modelo: el fijado a la sesión o el mejor disponible que lo tenga"""
+        key = _model_key(model)
+        with self._lock:
+            candidates = [e for e in self.endpoints
+                          if e.healthy and (not e.checked or key in e.models) and e not in exclude]
+            if not candidates:
+                errors = "; ".join(f"{e.host}: {e.error}" for e in self.endpoints if e.error)
+                raise ConnectionError(f"Ningún servidor Ollama disponible con {model}" +
+                                      (f" ({errors})" if errors else ""))
+            pinned = self._sessions.get(session) if session else None
+            if pinned in candidates:
+                return pinned
+
+            def rank(e: Endpoint):
+                latency = e.latency_ms if e.latency_ms is not None else float("inf")
+                # Un servidor con el modelo ya en memoria se ahorra la carga
+                if self.routing == "latency":
+                    return key not in e.loaded, latency, e.inflight
+                return key not in e.loaded, e.inflight, latency
+
+            endpoint = min(candidates, key=rank)
+            if session:
+                self._sessions[session] = endpoint
+            return endpoint
+
+    def acquire(self, model: str, session: Optional[str] = None, exclude: Tuple = ()) -> Endpoint:
+        endpoint = self.pick(model, session, exclude)
+        with self._lock:
+            endpoint.inflight += 1
+            endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint, error: Optional[BaseException] = None):
+        """Cierra una petición; si el servidor falló, queda fuera hasta la siguiente verificación"""
+        with self._lock:
+            endpoint.inflight -= 1
+            if error is not None:
+                endpoint.failures += 1
+                endpoint.healthy, endpoint.error = False, str(error) or type(error).__name__
+                # Las sesiones fijadas a él se reparten en su próxima petición
+                self._sessions = {s: e for s, e in self._sessions.items() if e is not endpoint}
+
+    def client_for(self, model: str):
+        """Cliente síncrono del mejor servidor para el modelo (para hilos, no para el event loop)"""
+        if not any(endpoint.checked for endpoint in self.endpoints):
+            self.check()
+        return ollama.Client(host=self.pick(model).host)
+
+    def list(self) -> Dict:
+        """Modelos instalados en los servidores disponibles, sin repetir"""
+        seen, models = set(), []
+        with self._lock:
+            for endpoint in self.endpoints:
+                for model in endpoint.catalog if endpoint.healthy else ():
+                    name = model.get('model') or model.get('name')
+                    if name not in seen:
+                        seen.add(name)
+                        models.append(model)
+        return {"models": models}
+
+class PooledClient:
+    """Interfaz de ollama.AsyncClient sobre el pool: cada conversación queda fijada a un servidor
+    y, si este falla antes de responder, la petición se repite en otro"""
+
+    def __init__(self, pool: OllamaPool, session: Optional[str] = None):
+        self.pool = pool
+        self.session = session or uuid.uuid4().hex
+        self._clients: Dict[str, object] = {}
+
+    def _client(self, endpoint: Endpoint):
+        client = self._clients.get(endpoint.host)
+        if client is None:
+            client = self._clients[endpoint.host] = ollama.AsyncClient(host=endpoint.host)
+        return client
+
+    async def chat(self, model: str, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream(model, **kwargs)
+        tried: Tuple = ()
+        while True:
+            endpoint = self.pool.acquire(model, self.session, tried)
+            try:
+                response = await self._client(endpoint).chat(model=model, **kwargs)
+            except BaseException as e:
+                failed = _host_failure(e)
+                self.pool.release(endpoint, e if failed else None)
+                if not failed:
+                    raise
+                tried += (endpoint,)
+                continue
+            self.pool.release(endpoint)
+            return response
+
+    async def _stream(self, model: str, **kwargs):
+        tried: Tuple = ()
+        while True:
+            endpoint = self.pool.acquire(model, self.session, tried)
+            started = False
+            try:
+                async for chunk in await self._client(endpoint).chat(model=model, stream=True, **kwargs):
+                    started = True
+                    yield chunk
+            except BaseException as e:
+                failed = _host_failure(e)
+                self.pool.release(endpoint, e if failed else None)
+                # Con tokens ya mostrados no se puede repetir en otro servidor sin duplicarlos
+                if not failed or started:
+                    raise
+                tried += (endpoint,)
+                continue
+            self.pool.release(endpoint)
+            return
+
+    async def list(self) -> Dict:
+        await asyncio.to_thread(self.pool.check)
+        return self.pool.list()
+
+ollama_pool: Optional[OllamaPool] = OllamaPool(HOSTS) if HOSTS else None
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PRECARGA DE MODELOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ModelWarmer:
+    """Carga modelos en Ollama en segundo plano y los mantiene en memoria con keep_alive"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loads: Dict[str, Future] = {}
+
+    @staticmethod
+    def _load(model: str, future: Future):
+        try:
+            # Un prompt vacío solo carga el modelo, sin generar
+            client = ollama_pool.client_for(model) if ollama_pool else ollama
+            client.generate(model=model, prompt="", keep_alive=KEEP_ALIVE)
+            future.set_result(True)
+        except Exception as e:
+            future.set_exception(e)
+
+    def warm(self, model: str) -> Future:
+        """Inicia la precarga de un modelo (una sola vez mientras no falle)"""
+        with self._lock:
+            future = self._loads.get(model)
+            if future is not None and not (future.done() and future.exception()):
+                return future
+            future = Future()
+            self._loads[model] = future
+        # Hilo daemon: salir de VIBE no espera a que termine una carga
+        threading.Thread(target=self._load, args=(model, future), daemon=True).start()
+        return future
+
+    def is_ready(self, model: str) -> bool:
+        future = self._loads.get(model)
+        return future is not None and future.done() and future.exception() is None
+
+    def error(self, model: str) -> Optional[BaseException]:
+        future = self._loads.get(model)
+        return future.exception() if future is not None and future.done() else None
+
+model_warmer = ModelWarmer()
+
 # ═══════════════════════════════════════════════════════════════════════════
 # SISTEMA DE PROMPTS
 # ═══════════════════════════════════════════════════════════════════════════
 
-def build_system_prompt(framework_info: Dict, project_context: str) -> str:
+def build_system_prompt(framework_info: Dict, project_context: str, native: bool = False) -> str:
     """Construye el prompt del sistema basado en el framework"""
 
-    return f"""Eres VIBE, un asistente experto en Laravel y PHP.
+    rules = """Eres VIBE, un asistente experto en Laravel y PHP.
 
 REGLAS CRÍTICAS:
 1. SIEMPRE responde con información útil, NUNCA vacío
@@ -483,13 +3613,29 @@ REGLAS CRÍTICAS:
 4. Si te preguntan sobre vibe.py: ese es TU código Python, puedes leerlo y modificarlo
 5. Puedes trabajar con CUALQUIER archivo del proyecto, no solo Laravel
 6. IMPORTANTE: Cuando recibas resultados suficientes, da la RESPUESTA FINAL inmediatamente, NO uses más herramientas innecesarias
+"""
 
+    if native:
+        # Las herramientas y sus parámetros llegan como esquemas JSON: basta con el flujo de trabajo
+        return rules + """
+Flujo de trabajo:
+1. Usa herramientas para investigar (máximo 2-3 herramientas)
+2. ¿Ya tienes suficiente información? → Da respuesta final INMEDIATAMENTE
+3. Para CREAR archivos usa write directamente con el contenido completo, sin investigar antes
+4. Si un cambio toca varios lugares, usa un solo multi_edit en vez de muchos edit
+"""
+
+    return rules + """
 Herramientas:
 - TOOL:glob(pattern="**/*.php") - buscar archivos
 - TOOL:read(file_path="ruta") - leer archivo
 - TOOL:grep(pattern="texto", glob_pattern="*.php") - buscar en código
+- TOOL:search(query="dónde se valida el login") - buscar código por significado
+- TOOL:symbol(name="AuthController") - ubicar clase/método/función PHP (también "Clase::metodo")
+- TOOL:routes(filter="admin") - rutas de Laravel con controlador y middleware
 - TOOL:bash(command="cmd") - ejecutar comando
 - TOOL:edit(file_path="ruta", old_string="viejo", new_string="nuevo") - editar
+- TOOL:multi_edit(edits='[{"file_path": "ruta", "old_string": "viejo", "new_string": "nuevo"}, ...]') - varios cambios de una vez (todo o nada); edits es JSON entre comillas simples, con sus escapes (\\" y \\n)
 - TOOL:write(file_path="ruta", content="...") - crear archivo
 
 Flujo de trabajo:
@@ -517,8 +3663,8 @@ TOOL:write(file_path="MIGRACION_LARAVEL12.md", content="# Plan de Migración a L
 Ejemplo 3 (Análisis completo):
 Usuario: Analiza AuthController
 Tú: Voy a buscar AuthController.
-TOOL:glob(pattern="**/AuthController.php")
-[Recibes: app/Http/Controllers/Api/V1/AuthController.php]
+TOOL:symbol(name="AuthController")
+[Recibes: app/Http/Controllers/Api/V1/AuthController.php:12 class ... y sus métodos con línea]
 Tú: Voy a leerlo.
 TOOL:read(file_path="app/Http/Controllers/Api/V1/AuthController.php")
 [Recibes: contenido del archivo]
@@ -539,194 +3685,696 @@ Tú: ## Análisis de AuthController
 # CHAT PRINCIPAL
 # ═══════════════════════════════════════════════════════════════════════════
 
-def vibe_chat():
-    """Loop principal del chat"""
-    global MODEL
-
-    # Banner inicial
-    console.print(Panel.fit(
-        "[bold cyan]VIBE[/] - Tu Programador Personal para PHP\n"
-        f"Modelo: [yellow]{MODEL}[/]",
-        border_style="cyan"
-    ))
-
-    # Detectar framework
-    console.print("\n[dim]Detectando framework...[/]")
-    framework_info = detect_framework()
-
-    console.print(f"[green]✓[/] Framework: [bold]{framework_info['name']}[/]")
-    if framework_info['features']:
-        console.print(f"  Características: {', '.join(framework_info['features'])}")
-
-    # Obtener contexto del proyecto
-    project_context = get_project_context(framework_info)
-
-    # Sistema de mensajes
-    messages = [
-        {
-            "role": "system",
-            "content": build_system_prompt(framework_info, project_context)
-        }
-    ]
-
-    # Gestor de tareas
-    task_manager = TaskManager()
-
-    console.print("\n[dim]Escribe tu tarea o 'exit' para salir[/]\n")
-
-    while True:
-        # Input del usuario
-        user_input = console.input("[bold yellow]Tú:[/] ").strip()
-
-        if user_input.lower() in ['exit', 'quit', 'salir']:
-            console.print("[red]¡Hasta luego! 👋[/]")
-            break
-
-        if not user_input:
-            continue
-
-        # Comandos especiales
-        if user_input.lower() == '/models':
+class ChatEngine:
+    """Motor asíncrono de una conversación: llamadas al modelo, herramientas y contexto"""
+
+    MAX_ITERATIONS = 20  # Límite de seguridad de rondas de herramientas por turno
+
+    def __init__(self, system_prompt: str, model: Optional[str] = None, client=None, stream: bool = STREAM,
+                 native_tools: Optional[bool] = None, text_prompt: Optional[str] = None,
+                 small_model: Optional[str] = None):
+        self.model = model or MODEL
+        # El modelo pequeño decide las rondas de herramientas; el grande, respuestas y cambios
+        self.small_model = SMALL_MODEL if small_model is None else small_model
+        self.model_routing = MODEL_ROUTING
+        self.routing_stats = {"small": 0, "escalations": 0, "wasted_ms": 0.0}
+        self._client = client
+        self.stream = stream
+        self.native_tools = NATIVE_TOOLS != "off" if native_tools is None else native_tools
+        self.text_prompt = text_prompt  # Prompt con el protocolo TOOL:... para modelos sin tools
+        self.context = ContextManager(system_prompt)
+        # El shell persistente depende de la sintaxis POSIX; en Windows cada comando va aparte
+        self.shell = ShellSession() if PERSISTENT_SHELL and os.name != "nt" else None
+        self.tool_runs = 0  # Herramientas ejecutadas en la conversación
+        self.semantic_attach = SEMANTIC_ATTACH
+        self._partial: List[str] = []
+        self._streamed = False
+
+    @property
+    def client(self):
+        # Se crea al primer uso: importar ollama no debe retrasar el prompt inicial
+        if self._client is None:
+            self._client = PooledClient(ollama_pool) if ollama_pool else ollama.AsyncClient()
+        return self._client
+
+    def close(self):
+        if self.shell:
+            self.shell.close()
+
+    def update_prompts(self, native_prompt: str, text_prompt: str):
+        """Cambia el prompt del sistema (p. ej. al revalidar el perfil) sin perder el historial"""
+        self.text_prompt = text_prompt
+        self.context.replace_system(native_prompt if self.native_tools else text_prompt)
+
+    async def _chat(self, dispatcher: Optional[EarlyToolDispatcher],
+                    model: Optional[str] = None) -> Tuple[str, List[Dict]]:
+        """Llama al modelo; con dispatcher muestra los tokens y despacha herramientas temprano.
+
+        Devuelve el texto y las llamadas a herramientas, estructuradas o escritas como TOOL:...
+        """
+        model = model or self.model
+        self._partial = []
+        self._streamed = dispatcher is not None
+        options = {"tools": TOOL_SCHEMAS} if self.native_tools else {}
+        start = time.perf_counter()
+        if dispatcher is None:
+            response = await self.client.chat(model=model, messages=self.context.messages,
+                                              keep_alive=KEEP_ALIVE, **options)
+            telemetry.record_model(model, response, (time.perf_counter() - start) * 1000)
+            message = response['message']
+            return message['content'], _native_tool_calls(message) + parse_tool_calls(message['content'])
+
+        console.print("\n[bold green]Vibe:[/]")
+        first_token_ms = None
+        chunk = None
+        async for chunk in await self.client.chat(model=model, messages=self.context.messages,
+                                                  stream=True, keep_alive=KEEP_ALIVE, **options):
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            # Las llamadas estructuradas llegan completas y se ejecutan al recibirlas
+            for call in _native_tool_calls(chunk['message']):
+                console.print(f"[dim]→ {_describe_call(call)}[/]")
+                dispatcher.dispatch(call)
+            token = chunk['message']['content']
+            if not token:
+                continue
+            self._partial.append(token)
+            console.print(token, end="", markup=False, highlight=False)
+            dispatcher.feed(token)
+
+        # El último fragmento (done=True) trae las métricas de Ollama
+        telemetry.record_model(model, chunk, (time.perf_counter() - start) * 1000, first_token_ms)
+        console.print("\n")
+        return "".join(self._partial), dispatcher.calls
+
+    def _small_accepts(self, text: str, calls: List[Dict]) -> bool:
+        """¿Vale la respuesta del modelo pequeño o hay que pedírsela al grande?"""
+        if calls:
+            # Explorar sí; escribir, editar o ejecutar comandos lo decide el modelo grande
+            return all(call['tool'] in READ_ONLY_TOOLS for call in calls)
+        return self.model_routing == "all" and bool(text.strip())
+
+    async def _ask_small(self) -> Optional[Tuple[str, List[Dict]]]:
+        """Ronda con el modelo pequeño (sin streaming); None si hay que escalar al grande"""
+        start = time.perf_counter()
+        try:
+            text, calls = await self._chat(None, model=self.small_model)
+        except Exception as e:
+            console.print(f"[dim]{self.small_model} falló ({e}); se sigue solo con {self.model}[/]")
+            self.small_model = ""
+            return None
+        if self._small_accepts(text, calls):
+            self.routing_stats["small"] += 1
+            return text, calls
+        self.routing_stats["escalations"] += 1
+        self.routing_stats["wasted_ms"] += (time.perf_counter() - start) * 1000
+        return None
+
+    async def _ask(self) -> Tuple[str, List[Dict], Optional[EarlyToolDispatcher]]:
+        if self.small_model and self.model_routing != "off" and self.small_model != self.model:
+            answer = await self._ask_small()
+            if answer:
+                return answer[0], answer[1], None
+        while True:
+            dispatcher = EarlyToolDispatcher(self.shell) if self.stream else None
             try:
-                models_list = ollama.list()
-                console.print("\n[bold cyan]Modelos disponibles en Ollama:[/]")
-                for model in models_list.get('models', []):
-                    name = model.get('name', 'unknown')
-                    size_gb = model.get('size', 0) / (1024**3)
-                    console.print(f"  • {name} ({size_gb:.2f} GB)")
-                console.print(f"\n[dim]Modelo actual: {MODEL}[/]")
-                console.print("[dim]Cambia con: /model nombre_modelo[/]\n")
-            except Exception as e:
-                console.print(f"[red]Error: {e}[/]")
-            continue
-
-        if user_input.lower().startswith('/model '):
-            new_model = user_input[7:].strip()
-            MODEL = new_model
-            console.print(f"[green]✓ Modelo cambiado a: {MODEL}[/]")
-            console.print("[yellow]Reinicia la conversación para que surta efecto completo[/]\n")
-            continue
-
-        if user_input.lower() == '/help':
-            console.print("\n[bold cyan]Comandos especiales:[/]")
-            console.print("  /models - Lista modelos disponibles")
-            console.print("  /model <nombre> - Cambia de modelo")
-            console.print("  /help - Muestra esta ayuda")
-            console.print("  exit/quit/salir - Salir\n")
-            continue
-
-        # Agregar mensaje del usuario
-        messages.append({"role": "user", "content": user_input})
-
-        # Llamar a Ollama
-        console.print("\n[bold blue]🤔 Vibe pensando...[/]\n")
-
+                text, calls = await self._chat(dispatcher)
+                return text, calls, dispatcher
+            except BaseException as e:
+                if dispatcher:
+                    dispatcher.cancel()
+                if not (self.native_tools and NATIVE_TOOLS == "auto" and _tools_unsupported(e)):
+                    raise
+            # El modelo no soporta tools: se vuelve al protocolo de texto para el resto de la conversación
+            console.print(f"[dim]{self.model} no soporta tools nativas; se usa el protocolo TOOL:...[/]")
+            self.native_tools = False
+            if self.text_prompt:
+                self.context.replace_system(self.text_prompt)
+
+    async def _relevant_code(self, user_input: str) -> str:
+        """Fragmentos del índice semántico para adjuntar al mensaje; "" si el índice no está disponible"""
         try:
-            response = ollama.chat(model=MODEL, messages=messages)
-            assistant_msg = response['message']['content']
+            snippets = await asyncio.to_thread(get_semantic_index().search, user_input, self.semantic_attach)
+        except Exception as e:
+            console.print(f"[dim]Índice semántico desactivado: {e}[/]")
+            self.semantic_attach = 0
+            return ""
+        if snippets:
+            places = ", ".join(f"{s['path']}:{s['start']}" for s in snippets)
+            console.print(f"[dim]📎 {len(snippets)} fragmento(s): {places}[/]")
+        return format_snippets(snippets)
+
+    def _add_assistant(self, text: str, tool_calls: List[Dict]):
+        """Agrega la respuesta del modelo con sus llamadas estructuradas, si las hubo"""
+        native = [{"function": {"name": call['tool'], "arguments": call['params']}}
+                  for call in tool_calls if call.get("native")]
+        if native:
+            self.context.add("assistant", text, tool_calls=native)
+        else:
+            self.context.add("assistant", text)
+
+    async def run_turn(self, user_input: str) -> str:
+        """Procesa un mensaje del usuario hasta la respuesta final; devuelve esa respuesta"""
+        snippets = await self._relevant_code(user_input) if self.semantic_attach else ""
+        if snippets:
+            # Al compactar el historial el mensaje vuelve a ser solo la pregunta
+            self.context.add("user", f"{user_input}\n\nFragmentos relevantes del proyecto:\n{snippets}",
+                             summary=user_input)
+        else:
+            self.context.add("user", user_input)
+        dispatcher = None
+        try:
+            assistant_msg, tool_calls, dispatcher = await self._ask()
 
-            # DEBUG: Mostrar respuesta raw si está vacía
-            if not assistant_msg.strip():
+            if not assistant_msg.strip() and not tool_calls:
                 console.print(f"[red]DEBUG - Respuesta vacía del modelo[/]")
-                console.print(f"[dim]Response completo: {response}[/]")
 
                 # Intentar con un prompt más simple
                 console.print("[yellow]Reintentando con prompt simplificado...[/]")
-                simple_prompt = f"Responde a esta pregunta sobre Laravel: {user_input}"
-                messages[-1] = {"role": "user", "content": simple_prompt}
-                response = ollama.chat(model=MODEL, messages=messages)
-                assistant_msg = response['message']['content']
+                self.context.replace_last(f"Responde a esta pregunta sobre Laravel: {user_input}")
+                assistant_msg, tool_calls, dispatcher = await self._ask()
 
-            messages.append({"role": "assistant", "content": assistant_msg})
+            self._add_assistant(assistant_msg, tool_calls)
 
             # Loop de ejecución de herramientas (permite múltiples rondas)
-            max_iterations = 20  # Límite de seguridad aumentado
             iteration = 0
-
-            while iteration < max_iterations:
+            while iteration < self.MAX_ITERATIONS:
                 iteration += 1
 
-                # Parsear y ejecutar herramientas
-                tool_calls = parse_tool_calls(assistant_msg)
-
-                # Mostrar respuesta del asistente
-                if assistant_msg.strip():
+                # Mostrar respuesta del asistente (en streaming ya se mostró)
+                if not assistant_msg.strip() and not tool_calls:
+                    console.print("[yellow]⚠ El modelo no generó respuesta[/]")
+                    break
+                if not self._streamed and assistant_msg.strip():
                     console.print("\n[bold green]Vibe:[/]")
+                    from rich.markdown import Markdown
                     console.print(Markdown(assistant_msg))
                     console.print()  # Línea en blanco
-                else:
-                    console.print("[yellow]⚠ El modelo no generó respuesta[/]")
-                    break
 
                 # Si no hay herramientas, terminar el loop
                 if not tool_calls:
                     break
 
-                # Ejecutar herramientas
-                console.print(f"[dim]Ejecutando {len(tool_calls)} herramienta(s)... (iteración {iteration}/{max_iterations})[/]\n")
+                console.print(f"[dim]Ejecutando {len(tool_calls)} herramienta(s)... "
+                              f"(iteración {iteration}/{self.MAX_ITERATIONS})[/]\n")
 
-                results = []
-                for call in tool_calls:
-                    result = execute_tool(call['tool'], call['params'])
-                    results.append(result)
+                if dispatcher:
+                    results = await dispatcher.results(tool_calls)
+                else:
+                    results = await ToolScheduler(shell=self.shell).run(tool_calls)
+                self.tool_runs += len(results)
 
-                    # Mostrar resultado
+                for result in results:
                     if result.success:
                         output_preview = result.output[:200] if len(result.output) > 200 else result.output
                         console.print(f"[green]✓ {result.tool}:[/] {output_preview}")
                     else:
                         console.print(f"[red]✗ {result.tool}:[/] {result.error}")
 
-                # Agregar resultados al contexto
-                results_text = "\n\n".join(
-                    f"Resultado de {r.tool}:\n{r.output if r.success else f'Error: {r.error}'}"
-                    for r in results
-                )
-
-                messages.append({
-                    "role": "user",
-                    "content": f"RESULTADOS DE HERRAMIENTAS:\n{results_text}"
-                })
+                self.context.add_tool_results(tool_calls, results,
+                                              native=any(call.get("native") for call in tool_calls))
 
                 # Llamar al modelo nuevamente para que procese los resultados
                 console.print(f"\n[dim]🤔 Procesando resultados (iteración {iteration})...[/]\n")
                 try:
-                    response = ollama.chat(model=MODEL, messages=messages)
-                    assistant_msg = response['message']['content']
+                    assistant_msg, tool_calls, dispatcher = await self._ask()
+                except Exception as e:
+                    console.print(f"[red]Error al procesar resultados: {e}[/]")
+                    break
 
-                    if not assistant_msg.strip():
-                        console.print("[yellow]⚠ El modelo no generó respuesta después de procesar[/]")
-                        break
+                if not assistant_msg.strip() and not tool_calls:
+                    console.print("[yellow]⚠ El modelo no generó respuesta después de procesar[/]")
+                    break
+                self._add_assistant(assistant_msg, tool_calls)
+
+            if iteration >= self.MAX_ITERATIONS:
+                console.print(f"[yellow]⚠ Se alcanzó el límite de {self.MAX_ITERATIONS} iteraciones[/]")
+            return assistant_msg
+
+        except asyncio.CancelledError:
+            # Se conserva lo generado hasta la cancelación para que el modelo tenga contexto
+            if dispatcher:
+                dispatcher.cancel()
+            partial = "".join(self._partial)
+            self.context.add("assistant", (partial + "\n\n" if partial else "") + "[respuesta cancelada por el usuario]")
+            raise
+
+def show_stats(engine: ChatEngine):
+    """Muestra el rendimiento de la sesión: modelo, crecimiento del prompt, herramientas y caché"""
+    summary = telemetry.summary()
+    console.print(f"\n[bold cyan]Modelo ({engine.model}):[/] {summary['model_calls']} llamadas, "
+                  f"{summary['model_ms'] / 1000:.1f}s en total, {summary['load_ms'] / 1000:.1f}s de carga")
+    console.print(f"  Generación: {summary['eval_tokens']} tokens a {summary['tokens_per_second']:.1f} tokens/s")
+    if summary['first_token_ms'] is not None:
+        console.print(f"  Primer token: {summary['first_token_ms']:.0f}ms de media")
+    prompts = summary['prompt_tokens']
+    if prompts:
+        console.print(f"  Prompt: {prompts[0]} → {prompts[-1]} tokens (máx. {max(prompts)}); "
+                      f"contexto estimado {engine.context.total_tokens}, "
+                      f"{engine.context.compacted_tokens} compactados")
+
+    small = engine.small_model
+    if small and small in summary['models']:
+        routing = engine.routing_stats
+        large = summary['models'].get(engine.model)
+        small_avg = summary['models'][small]['total_ms'] / summary['models'][small]['calls']
+        console.print(f"[bold cyan]Enrutado ({engine.model_routing}):[/] {routing['small']} rondas con {small} "
+                      f"({small_avg / 1000:.1f}s de media), {routing['escalations']} escaladas a {engine.model}")
+        if large:
+            # Cada ronda resuelta por el pequeño ahorra la diferencia de medias; las escaladas la gastan
+            large_avg = large['total_ms'] / large['calls']
+            saved = routing['small'] * (large_avg - small_avg) - routing['wasted_ms']
+            console.print(f"  {engine.model}: {large['calls']} llamadas ({large_avg / 1000:.1f}s de media); "
+                          f"ahorro estimado {saved / 1000:.1f}s")
+
+    if summary['tools']:
+        from rich.table import Table
+        table = Table(title="🔧 Herramientas")
+        table.add_column("Herramienta", style="cyan")
+        table.add_column("Llamadas", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Media", justify="right")
+        table.add_column("Máx.", justify="right")
+        table.add_column("Errores", justify="right")
+        for name, stats in sorted(summary['tools'].items(), key=lambda item: -item[1]['total_ms']):
+            table.add_row(name, str(stats['calls']), f"{stats['total_ms']:.0f}ms",
+                          f"{stats['total_ms'] / stats['calls']:.0f}ms", f"{stats['max_ms']:.0f}ms",
+                          str(stats['errors']))
+        console.print(table)
+
+    if ollama_pool:
+        console.print("[bold cyan]Servidores:[/]")
+        for endpoint in ollama_pool.endpoints:
+            state = "[green]●[/]" if endpoint.healthy else f"[red]● {endpoint.error}[/]"
+            latency = f"{endpoint.latency_ms:.0f}ms" if endpoint.latency_ms is not None else "-"
+            loaded = ", ".join(sorted(endpoint.loaded)) or "ninguno"
+            console.print(f"  {state} {endpoint.host}: {endpoint.requests} peticiones, {endpoint.failures} fallos, "
+                          f"{endpoint.inflight} en curso, latencia {latency}, en memoria: {loaded}")
+
+    cache = tool_cache.stats()
+    console.print(f"[bold cyan]Caché:[/] {cache['hits']} aciertos, {cache['misses']} fallos "
+                  f"({cache['hit_rate']:.0%})")
+    if telemetry.path:
+        console.print(f"[dim]Tramos en {telemetry.path}[/]")
+    console.print()
+
+_input_thread: Optional[threading.Thread] = None
+
+async def _read_input(prompt: str) -> Optional[str]:
+    """Lee una línea sin bloquear el event loop; None si se cerró la entrada"""
+    global _input_thread
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def reader():
+        try:
+            value = console.input(prompt)
+        except (EOFError, KeyboardInterrupt):
+            value = None
+        loop.call_soon_threadsafe(lambda: future.done() or future.set_result(value))
+
+    # Hilo daemon: si se sale con Ctrl-C no hay que esperar a que el usuario pulse Enter
+    _input_thread = threading.Thread(target=reader, daemon=True)
+    _input_thread.start()
+    return await future
+
+def check_ollama() -> Optional[str]:
+    """Verifica que Ollama responda y tenga modelos; devuelve el problema encontrado o None"""
+    if ollama_pool:
+        healthy = ollama_pool.check()
+        ollama_pool.start()
+        if not healthy:
+            errors = "; ".join(f"{e.host}: {e.error}" for e in ollama_pool.endpoints)
+            return f"Ningún servidor de VIBE_HOSTS responde ({errors})\nAsegúrate de que Ollama esté corriendo: ollama serve"
+        if not ollama_pool.list()['models']:
+            return "No hay modelos disponibles en Ollama.\nInstala un modelo con: ollama pull qwen2.5-coder:7b"
+        return None
+    try:
+        if not ollama.list().get('models'):
+            return "No hay modelos disponibles en Ollama.\nInstala un modelo con: ollama pull qwen2.5-coder:7b"
+    except Exception as e:
+        return f"Error al conectar con Ollama: {str(e)}\nAsegúrate de que Ollama esté corriendo: ollama serve"
+    return None
 
-                    messages.append({"role": "assistant", "content": assistant_msg})
-                    # El loop continúa para procesar la nueva respuesta
+async def vibe_chat_async():
+    """Loop principal del chat sobre asyncio; Ctrl-C cancela la generación en curso"""
+    global MODEL
+
+    # Ollama se verifica mientras se muestra el banner y se analiza el proyecto
+    health = asyncio.ensure_future(asyncio.to_thread(check_ollama))
+
+    # Banner inicial
+    from rich.panel import Panel
+    console.print(Panel.fit(
+        "[bold cyan]VIBE[/] - Tu Programador Personal para PHP\n"
+        f"Modelo: [yellow]{MODEL}[/]" +
+        (f" · herramientas: [yellow]{SMALL_MODEL}[/]" if SMALL_MODEL and MODEL_ROUTING != "off" else ""),
+        border_style="cyan"
+    ))
+
+    # El modelo se carga mientras se analiza el proyecto
+    model_warmer.warm(MODEL)
+    if SMALL_MODEL and MODEL_ROUTING != "off":
+        model_warmer.warm(SMALL_MODEL)
+    pending_model: Optional[str] = None
+
+    # Detectar framework (el perfil guardado se usa al instante y se revalida en segundo plano)
+    profile = ProjectProfile()
+    cached = profile.load()
+    if cached:
+        framework_info, project_context, fresh = cached
+    else:
+        console.print("\n[dim]Detectando framework...[/]")
+        framework_info, project_context = await asyncio.to_thread(profile.build)
+        fresh = True
+
+    console.print(f"[green]✓[/] Framework: [bold]{framework_info['name']}[/]")
+    if framework_info['features']:
+        console.print(f"  Características: {', '.join(framework_info['features'])}")
+
+    engine = ChatEngine(build_system_prompt(framework_info, project_context, native=NATIVE_TOOLS != "off"),
+                        text_prompt=build_system_prompt(framework_info, project_context))
+
+    async def revalidate_profile():
+        nonlocal framework_info, project_context
+        new_info, new_context = await asyncio.to_thread(profile.build)
+        if (new_info, new_context) != (framework_info, project_context):
+            framework_info, project_context = new_info, new_context
+            engine.update_prompts(build_system_prompt(new_info, new_context, native=True),
+                                  build_system_prompt(new_info, new_context))
+            console.print(f"[dim]Perfil del proyecto actualizado: {new_info['name']}[/]")
+
+    revalidation = None if fresh else asyncio.ensure_future(revalidate_profile())
+
+    # Gestor de tareas
+    task_manager = TaskManager()
+
+    # Ctrl-C cancela el turno en curso; en el prompt, sale de VIBE
+    loop = asyncio.get_running_loop()
+    current: Dict[str, Optional[asyncio.Future]] = {"task": None}
+
+    def interrupt():
+        task = current["task"]
+        if task is not None and not task.done():
+            task.cancel()
+
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: loop.call_soon_threadsafe(interrupt))
+
+    def health_checked(task: asyncio.Future):
+        # Sin Ollama no hay nada que hacer: se avisa y se corta lo que esté esperando
+        if not task.cancelled() and task.result():
+            problem, hint = (task.result() + "\n").split("\n", 1)
+            console.print(f"\n[red]{problem}[/]")
+            console.print(f"[yellow]{hint.strip()}[/]")
+            interrupt()
+
+    health.add_done_callback(health_checked)
+
+    console.print("\n[dim]Escribe tu tarea o 'exit' para salir (Ctrl-C cancela la respuesta en curso)[/]\n")
+
+    try:
+        while True:
+            # Input del usuario
+            current["task"] = asyncio.ensure_future(_read_input("[bold yellow]Tú:[/] "))
+            try:
+                user_input = await current["task"]
+            except asyncio.CancelledError:
+                user_input = None
+            if health.done() and not health.cancelled() and health.result():
+                break
+            if user_input is None:
+                console.print("\n[red]¡Hasta luego! 👋[/]")
+                break
+            user_input = user_input.strip()
+
+            if user_input.lower() in ['exit', 'quit', 'salir']:
+                console.print("[red]¡Hasta luego! 👋[/]")
+                break
+
+            if not user_input:
+                continue
+
+            # Comandos especiales
+            if user_input.lower() == '/models':
+                try:
+                    models_list = await engine.client.list()
+                    console.print("\n[bold cyan]Modelos disponibles en Ollama:[/]")
+                    for model in models_list.get('models', []):
+                        name = model.get('name', 'unknown')
+                        size_gb = model.get('size', 0) / (1024**3)
+                        console.print(f"  • {name} ({size_gb:.2f} GB)")
+                    console.print(f"\n[dim]Modelo actual: {MODEL}[/]")
+                    console.print("[dim]Cambia con: /model nombre_modelo[/]\n")
                 except Exception as e:
-                    console.print(f"[red]Error al procesar resultados: {e}[/]")
+                    console.print(f"[red]Error: {e}[/]")
+                continue
+
+            if user_input.lower().startswith('/model '):
+                # El modelo nuevo se precarga mientras el actual sigue respondiendo
+                pending_model = user_input[7:].strip()
+                model_warmer.warm(pending_model)
+                console.print(f"[dim]Precargando {pending_model}; {MODEL} responde hasta que esté listo[/]\n")
+                continue
+
+            if pending_model and model_warmer.error(pending_model):
+                console.print(f"[red]No se pudo cargar {pending_model}: {model_warmer.error(pending_model)}[/]")
+                pending_model = None
+            elif pending_model and model_warmer.is_ready(pending_model):
+                MODEL, pending_model = pending_model, None
+                engine.model = MODEL
+                console.print(f"[green]✓ Modelo cambiado a: {MODEL}[/]")
+                console.print("[yellow]Reinicia la conversación para que surta efecto completo[/]\n")
+
+            if user_input.lower() == '/cache':
+                stats = tool_cache.stats()
+                console.print(f"\n[bold cyan]Caché de herramientas:[/] {stats['hits']} aciertos, "
+                              f"{stats['misses']} fallos ({stats['hit_rate']:.0%}), "
+                              f"{stats['invalidations']} invalidaciones, {stats['entries']} entradas, "
+                              f"{stats['bytes'] / 1024:.0f} KB\n")
+                continue
+
+            if user_input.lower() == '/stats':
+                show_stats(engine)
+                continue
+
+            if user_input.lower() == '/help':
+                console.print("\n[bold cyan]Comandos especiales:[/]")
+                console.print("  /models - Lista modelos disponibles")
+                console.print("  /model <nombre> - Cambia de modelo (lo precarga en segundo plano)")
+                console.print("  /cache - Estadísticas de la caché de herramientas")
+                console.print("  /stats - Rendimiento de la sesión (modelo, herramientas, caché)")
+                console.print("  /help - Muestra esta ayuda")
+                console.print("  Ctrl-C - Cancela la respuesta en curso")
+                console.print("  exit/quit/salir - Salir\n")
+                continue
+
+            # Llamar a Ollama
+            console.print("\n[bold blue]🤔 Vibe pensando...[/]\n")
+
+            current["task"] = asyncio.ensure_future(engine.run_turn(user_input))
+            try:
+                await current["task"]
+                console.print("\n" + "─" * 60 + "\n")
+                # Un composer require o un cambio de rutas durante el turno renueva el perfil
+                if (revalidation is None or revalidation.done()) and profile.stale():
+                    revalidation = asyncio.ensure_future(revalidate_profile())
+            except asyncio.CancelledError:
+                if not current["task"].cancelled():
+                    raise
+                if health.done() and not health.cancelled() and health.result():
                     break
+                console.print("\n[yellow]⏹ Respuesta cancelada[/]\n")
+            except Exception as e:
+                console.print(f"[red]Error: {str(e)}[/]")
+                console.print("[yellow]¿El modelo está disponible? Verifica con 'ollama list'[/]")
+                break
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        health.cancel()
+        if revalidation:
+            revalidation.cancel()
+        engine.close()
+        telemetry.close()
+        if ollama_pool:
+            ollama_pool.close()
 
-            if iteration >= max_iterations:
-                console.print(f"[yellow]⚠ Se alcanzó el límite de {max_iterations} iteraciones[/]")
+def vibe_chat():
+    """Loop principal del chat (envoltorio bloqueante del motor asíncrono)"""
+    asyncio.run(vibe_chat_async())
+    if _input_thread is not None and _input_thread.is_alive():
+        # Un hilo bloqueado leyendo stdin hace abortar el cierre normal del intérprete
+        if _search_pool is not None:
+            _search_pool.shutdown(wait=True, cancel_futures=True)
+        sys.stdout.flush()
+        os._exit(0)
 
-            console.print("\n" + "─" * 60 + "\n")
+# ═══════════════════════════════════════════════════════════════════════════
+# MODO POR LOTES
+# ═══════════════════════════════════════════════════════════════════════════
 
-        except Exception as e:
-            console.print(f"[red]Error: {str(e)}[/]")
-            console.print("[yellow]¿El modelo está disponible? Verifica con 'ollama list'[/]")
-            break
+def _batch_items(path: str) -> List[Dict]:
+    """Lee el JSONL de prompts: objetos con "prompt" (e "id" y "model" opcionales) o textos sueltos"""
+    items, seen = [], set()
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: JSON inválido ({e.msg})")
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not str(item.get("prompt") or "").strip():
+                raise ValueError(f"{path}:{number}: falta \"prompt\"")
+            # Sin id se usa el número de línea, estable mientras no se reordene el archivo
+            item["id"] = str(item.get("id", number))
+            if item["id"] in seen:
+                raise ValueError(f"{path}:{number}: id repetido {item['id']!r}")
+            seen.add(item["id"])
+            items.append(item)
+    return items
+
+def _batch_finished(path: str) -> set:
+    """Ids que ya terminaron bien en ejecuciones anteriores (los fallidos se reintentan)"""
+    finished = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Línea cortada por una caída a mitad de escritura
+                if isinstance(record, dict) and record.get("status") == "ok":
+                    finished.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return finished
+
+async def run_batch(prompts_path: str, out_path: str, concurrency: int = BATCH_CONCURRENCY,
+                    client=None) -> Dict[str, int]:
+    """Ejecuta cada prompt como una conversación independiente, hasta `concurrency` a la vez.
+
+    Cada resultado se agrega a `out_path` en cuanto termina; al repetir el comando se
+    saltan los ids que ya terminaron bien.
+    """
+    items = _batch_items(prompts_path)
+    finished = _batch_finished(out_path)
+    pending = [item for item in items if item["id"] not in finished]
+    summary = {"total": len(items), "skipped": len(items) - len(pending), "ok": 0, "error": 0}
+    progress = Console(stderr=True)
+    if summary["skipped"]:
+        progress.print(f"[dim]{summary['skipped']} prompt(s) ya resueltos en {out_path}[/]")
+    if not pending:
+        return summary
+
+    profile = ProjectProfile()
+    cached = profile.load()
+    if cached and cached[2]:
+        framework_info, project_context = cached[0], cached[1]
+    else:
+        framework_info, project_context = await asyncio.to_thread(profile.build)
+    native_prompt = build_system_prompt(framework_info, project_context, native=NATIVE_TOOLS != "off")
+    text_prompt = build_system_prompt(framework_info, project_context)
+    # Con varios servidores cada conversación crea su cliente del pool y se fija a uno
+    client = client or (None if ollama_pool else ollama.AsyncClient())
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'a+b') as f:
+        # Si la ejecución anterior se cortó a mitad de línea, el siguiente registro empieza en otra
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    async def run(item: Dict, out) -> None:
+        async with semaphore:
+            engine = ChatEngine(native_prompt, model=item.get("model"), client=client, stream=False,
+                                text_prompt=text_prompt)
+            record = {"id": item["id"], "prompt": item["prompt"], "model": engine.model}
+            start = time.perf_counter()
+            try:
+                record.update(status="ok", response=await engine.run_turn(item["prompt"]))
+            except Exception as e:
+                record.update(status="error", error=str(e) or type(e).__name__)
+            finally:
+                engine.close()
+            record.update(tool_calls=engine.tool_runs, duration_ms=round((time.perf_counter() - start) * 1000, 1))
+
+        # Un solo hilo escribe: cada registro es una línea completa y se vuelca al disco al momento
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        summary[record["status"]] += 1
+        done = summary["ok"] + summary["error"]
+        mark = "[green]✓[/]" if record["status"] == "ok" else f"[red]✗ {record.get('error', '')[:80]}[/]"
+        progress.print(f"[dim]{done}/{len(pending)}[/] {item['id']} ({record['duration_ms'] / 1000:.1f}s) {mark}",
+                       highlight=False)
+
+    # Las conversaciones no escriben en la consola; solo se muestra el progreso en stderr
+    quiet = console.quiet
+    console.quiet = True
+    start = time.perf_counter()
+    try:
+        with open(out_path, 'a', encoding='utf-8') as out:
+            await asyncio.gather(*(run(item, out) for item in pending))
+    finally:
+        console.quiet = quiet
+        telemetry.close()
+    progress.print(f"[bold]{summary['ok']} bien, {summary['error']} con error, {summary['skipped']} saltados[/] "
+                   f"en {time.perf_counter() - start:.1f}s → {out_path}")
+    return summary
 
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN
 # ═══════════════════════════════════════════════════════════════════════════
 
-if __name__ == "__main__":
+def main(argv: Optional[List[str]] = None) -> int:
+    """Chat interactivo o, con --batch, ejecución desatendida de un JSONL de prompts"""
+    global MODEL
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        # La conexión con Ollama se verifica dentro del chat, sin retrasar el prompt
+        vibe_chat()
+        return 0
+
+    import argparse
+    parser = argparse.ArgumentParser(prog="vibe.py", description="VIBE - Tu Programador Personal para PHP")
+    parser.add_argument("--model", help=f"modelo de Ollama (por defecto: {MODEL})")
+    parser.add_argument("--batch", metavar="PROMPTS.jsonl", help="ejecuta cada prompt del JSONL sin interacción")
+    parser.add_argument("--out", metavar="RESULTADOS.jsonl",
+                        help="resultados del lote (por defecto: PROMPTS.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"conversaciones simultáneas (por defecto: {BATCH_CONCURRENCY})")
+    args = parser.parse_args(argv)
+    if args.model:
+        MODEL = args.model
+
+    if not args.batch:
+        vibe_chat()
+        return 0
+
+    problem = check_ollama()
+    if problem:
+        problem, hint = (problem + "\n").split("\n", 1)
+        console.print(f"[red]{problem}[/]")
+        console.print(f"[yellow]{hint.strip()}[/]")
+        return 1
+    model_warmer.warm(MODEL)
+    if SMALL_MODEL and MODEL_ROUTING != "off":
+        model_warmer.warm(SMALL_MODEL)
+
+    out_path = args.out or str(Path(args.batch).with_suffix(".results.jsonl"))
     try:
-        # Verificar que Ollama está disponible
-        models = ollama.list()
-        if not models.get('models'):
-            console.print("[red]No hay modelos disponibles en Ollama.[/]")
-            console.print("[yellow]Instala un modelo con: ollama pull qwen2.5-coder:7b[/]")
-        else:
-            vibe_chat()
-    except Exception as e:
-        console.print(f"[red]Error al conectar con Ollama: {str(e)}[/]")
-        console.print("[yellow]Asegúrate de que Ollama esté corriendo: ollama serve[/]")
+        summary = asyncio.run(run_batch(args.batch, out_path, args.concurrency))
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error: {e}[/]")
+        return 1
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]Lote interrumpido; repite el comando para continuar desde {out_path}[/]")
+        return 130
+    return 1 if summary["error"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())